@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+1644 mod 工具集
+
+各脚本既可以直接运行（python tools/scale_pops.py ...），也可以通过
+统一入口运行（python -m tools <命令> ...）。脚本之间按同目录模块互相导入，
+因此这里把 tools 目录加入 sys.path。
+"""
+
+import os
+import sys
+
+_TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _TOOLS_DIR not in sys.path:
+    sys.path.insert(0, _TOOLS_DIR)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+统一命令行入口：python -m tools <命令> [参数...]
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+from typing import List, Optional
+
+_TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _TOOLS_DIR not in sys.path:
+    sys.path.insert(0, _TOOLS_DIR)
+
+# 命令名 -> (模块名 或 "模块名:函数名", 说明)；缺省函数为 main
+COMMANDS = {
+    "where": ("vfs", "显示逻辑路径由 VFS 的哪一层提供"),
+    "transform": ("pop_transform", "按规则文件批量变换人口（转换、拆分、缩放）"),
+    "check-pops": ("pop_consistency", "检查 location_culture_religion.csv 与 06_pops.txt 的一致性"),
+    "rollup": ("pop_rollup", "查询或导出各级人口汇总"),
+    "find": ("name_index", "按标识符或中英文名称模糊查找"),
+    "diff": ("semantic_diff", "比较两个版本 setup 文件的实体级语义差异"),
+    "roundtrip": ("roundtrip", "校验全部脚本逐字节往返并检查解析吞吐基线"),
+    "fmt": ("pdx_writer", "按规范格式重写 PDX 脚本文件，--check 只做检查"),
+    "xref": ("script_index", "scripted effect/trigger、事件与 on_action 的交叉引用查询"),
+    "balance": ("production_balance", "按开局建筑计算各市场与全世界的商品盈余与缺口"),
+    "starting-tech": ("starting_tech", "由查找表生成开局科技等级 effect 并校验行为不变"),
+    "patch-stats": ("patch_character_stats", "按三围表格原地改写 05_* 中人物的 adm/dip/mil"),
+    "load-profile": ("load_profile", "按文件、顶层 key 与加载阶段统计解析开销，--check 与基线比较"),
+    "build": ("build", "按 tools/build.txt 增量重建派生文件，--explain 说明原因"),
+    "undo": ("snapshots:undo_main", "按快照撤销最近一次（或多次）工具写入"),
+    "snapshots": ("snapshots", "列出写入前快照，或按保留策略清理"),
+    "loc-usage": ("localization_usage", "本地化 key 的未引用、跨文件重复与取值冲突检查，prune 清理未引用的 key"),
+    "setup": ("setup_view", "按实体名读取 setup 文件中的单个块（mmap + 实体索引，不解析整个文件）"),
+    "names": ("chinese_names", "由 docs/chinese_names.csv 生成汉语名字列表与逐字本地化，并核对列表项的本地化"),
+    "politics": ("political_graph", "附属、同盟、宿敌、战争与国际组织的关系图：附属树查询、全图一致性检查与导出"),
+    "workbooks": ("workbook_cache", "为 docs/ 下的 xlsx 建立按内容哈希校验的列式缓存（转换一次，之后免去 openpyxl 解析）"),
+}
+
+
+def print_usage() -> None:
+    print("用法: python -m tools <命令> [参数...]\n")
+    print("可用命令:")
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, help_text) in COMMANDS.items():
+        print(f"  {name:<{width}}  {help_text}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in {"-h", "--help"}:
+        print_usage()
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"未知命令：{command}\n")
+        print_usage()
+        return 2
+    module_name, _, function = COMMANDS[command][0].partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, function or "main")(rest) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,6 +23,8 @@ import os
 import sys
 from pathlib import Path
 
+from pdx_writer import atomic_write
+
 BOM = b"\xef\xbb\xbf"
 ALLOWED_SUFFIXES = {".yml", ".yaml", ".txt"}
 
@@ -33,7 +35,8 @@ def ensure_bom(path: Path) -> bool:
     data = path.read_bytes()
     if data.startswith(BOM):
         return False
-    path.write_bytes(BOM + data)
+    with atomic_write(path) as f:
+        f.write(BOM + data)
     return True
 
 
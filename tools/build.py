@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+派生文件增量构建
+
+mod 中有一批由工具生成的文件（开局科技 effect、补全的本地化、BOM……），
+以前靠手工逐个重跑脚本。tools/build.txt 以声明式的 step（命令、inputs、outputs）
+描述这些步骤，本工具：
+
+- 由"上游 outputs 命中下游 inputs"推出依赖关系（有环时报错）；
+- 对每个步骤的输入（含命令对应的工具脚本）与输出计算内容哈希，与
+  tools/.cache/build_state.json 中上次成功构建的记录比较，只运行过期的步骤；
+- 互不依赖的步骤并行运行；某步失败时跳过其下游；
+- 文件大小与修改时间未变时沿用缓存的哈希，没有变化时整个构建在一秒内结束。
+
+用法：
+    python -m tools build                   # 运行所有过期步骤
+    python -m tools build --explain         # 同时说明每个步骤为什么（不）运行
+    python -m tools build --dry-run         # 只列出会运行的步骤
+    python -m tools build starting_tech     # 只构建指定步骤（及其上游）
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import runpy
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+from pdx_script import Block, parse_file, unquote
+from vfs import MOD_ROOT, SCRIPT_DIR, cache_path
+
+GRAPH_FILE = SCRIPT_DIR / "build.txt"
+STATE_FILE = "build_state.json"
+STATE_VERSION = 1
+# --explain 中每类变化最多列出的文件数
+EXPLAIN_FILES = 3
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+@dataclass
+class Step:
+    name: str
+    command: List[str]
+    inputs: List[str]
+    outputs: List[str]
+    exclude: List[str] = field(default_factory=list)
+    enabled: bool = True
+    line: int = 0
+
+    @property
+    def command_text(self) -> str:
+        return " ".join(self.command)
+
+
+# ---- 构建图 ----
+
+def _patterns(block: Block, key: str) -> List[str]:
+    value = block.get(key)
+    if value is None:
+        return []
+    if isinstance(value, Block):
+        return [unquote(item) for item in value.values() if isinstance(item, str)]
+    return [unquote(value)]
+
+
+def load_graph(path: Path = GRAPH_FILE) -> List[Step]:
+    document = parse_file(path)
+    if document.errors:
+        raise ValueError(f"{path.name}：{document.errors[0]}")
+    steps: List[Step] = []
+    names: Set[str] = set()
+    for entry in document:
+        if entry.key != "step" or not isinstance(entry.value, Block):
+            raise ValueError(f"{path.name} 第 {entry.line} 行：只允许 step = {{ ... }}")
+        block = entry.value
+        name = block.get("name")
+        command = block.get("command")
+        if not isinstance(name, str) or not isinstance(command, str):
+            raise ValueError(f"{path.name} 第 {entry.line} 行：step 缺少 name 或 command")
+        if name in names:
+            raise ValueError(f"{path.name} 第 {entry.line} 行：重复的步骤名 {name}")
+        names.add(name)
+        outputs = _patterns(block, "outputs")
+        if not outputs:
+            raise ValueError(f"{path.name} 第 {entry.line} 行：步骤 {name} 没有 outputs")
+        steps.append(Step(
+            name=name,
+            command=shlex.split(unquote(command)),
+            inputs=_patterns(block, "inputs"),
+            outputs=outputs,
+            exclude=_patterns(block, "exclude"),
+            enabled=block.get("enabled", "yes") != "no",
+            line=entry.line,
+        ))
+    return steps
+
+
+def glob_regex(pattern: str) -> Pattern[str]:
+    """把 a/**/b/*.yml 形式的通配符转成匹配相对路径的正则"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+def _matches(path: str, patterns: Iterable[str]) -> bool:
+    return any(glob_regex(pattern).match(path) for pattern in patterns)
+
+
+def expand(patterns: Iterable[str], exclude: Iterable[str] = (), root: Path = MOD_ROOT) -> List[str]:
+    """展开为相对 root 的文件列表；不含通配符的路径即使不存在也保留"""
+    exclude = list(exclude)
+    files: Set[str] = set()
+    for pattern in patterns:
+        if _GLOB_CHARS.search(pattern):
+            files.update(p.relative_to(root).as_posix() for p in root.glob(pattern) if p.is_file())
+        else:
+            files.add(pattern)
+    return sorted(path for path in files if not _matches(path, exclude))
+
+
+def tool_source(command: List[str]) -> Optional[str]:
+    """命令对应的工具脚本（相对 mod 根目录）"""
+    if len(command) >= 2 and command[0] == "tools":
+        commands = runpy.run_path(str(SCRIPT_DIR / "__main__.py"))["COMMANDS"]
+        if command[1] in commands:
+            return f"tools/{commands[command[1]][0].partition(':')[0]}.py"
+    if len(command) >= 2 and command[0] == "python" and command[1].endswith(".py"):
+        return command[1]
+    return None
+
+
+def link(steps: List[Step]) -> Dict[str, Set[str]]:
+    """步骤 -> 上游步骤集合；有环时抛出 ValueError"""
+    upstream: Dict[str, Set[str]] = {step.name: set() for step in steps}
+    produced = {step.name: expand(step.outputs) for step in steps}
+    for consumer in steps:
+        for producer in steps:
+            if producer is consumer or not producer.enabled:
+                continue
+            candidates = produced[producer.name] + [p for p in producer.outputs if not _GLOB_CHARS.search(p)]
+            if any(_matches(path, consumer.inputs) and not _matches(path, consumer.exclude) for path in candidates):
+                upstream[consumer.name].add(producer.name)
+    # 原地修改的步骤互为上下游时按声明顺序打破：后声明的依赖先声明的
+    order = {step.name: index for index, step in enumerate(steps)}
+    for name, parents in upstream.items():
+        for parent in list(parents):
+            if name in upstream[parent] and order[parent] > order[name]:
+                parents.discard(parent)
+    _check_acyclic(upstream)
+    return upstream
+
+
+def _check_acyclic(upstream: Dict[str, Set[str]]) -> None:
+    state: Dict[str, int] = {}
+
+    def visit(name: str, path: List[str]) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError("构建图中有环：" + " -> ".join(path + [name]))
+        state[name] = 1
+        for parent in sorted(upstream[name]):
+            visit(parent, path + [name])
+        state[name] = 2
+
+    for name in upstream:
+        visit(name, [])
+
+
+# ---- 哈希与状态 ----
+
+class BuildState:
+    """上次成功构建的记录，以及按 (大小, 修改时间) 缓存的文件哈希"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.steps: Dict[str, Dict] = {}
+        self.files: Dict[str, List] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                self.steps = data.get("steps", {})
+                self.files = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def digest(self, relative: str) -> Optional[str]:
+        path = MOD_ROOT / relative
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        cached = self.files.get(relative)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()
+        self.files[relative] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digests(self, files: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {relative: self.digest(relative) for relative in files}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(self.path.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "steps": self.steps, "files": self.files}, f)
+        os.replace(temp, self.path)
+
+
+def step_inputs(step: Step) -> List[str]:
+    files = expand(step.inputs, step.exclude)
+    tool = tool_source(step.command)
+    if tool and tool not in files:
+        files.append(tool)
+    return files
+
+
+def _changed(label: str, paths: List[str]) -> str:
+    shown = "、".join(paths[:EXPLAIN_FILES])
+    more = f" 等 {len(paths)} 个" if len(paths) > EXPLAIN_FILES else ""
+    return f"{label}：{shown}{more}"
+
+
+def stale_reasons(step: Step, state: BuildState) -> List[str]:
+    """步骤需要重新运行的原因；空列表表示已是最新"""
+    record = state.steps.get(step.name)
+    if record is None:
+        return ["没有成功构建的记录"]
+    reasons = []
+    if record.get("command") != step.command_text:
+        reasons.append("命令改变")
+    before: Dict[str, Optional[str]] = record.get("inputs", {})
+    now = state.digests(step_inputs(step))
+    added = [p for p in now if p not in before]
+    removed = [p for p in before if p not in now]
+    modified = [p for p in now if p in before and now[p] != before[p]]
+    for label, paths in (("新增输入", added), ("移除输入", removed), ("输入改变", modified)):
+        if paths:
+            reasons.append(_changed(label, paths))
+    outputs: Dict[str, Optional[str]] = record.get("outputs", {})
+    missing = [p for p in expand(step.outputs) if p not in outputs or state.digest(p) is None]
+    missing += [p for p in outputs if state.digest(p) is None]
+    # 原地修改的文件已作为输入变化报告过
+    seen = set(added) | set(modified) | set(missing)
+    touched = [p for p, digest in outputs.items() if p not in seen and state.digest(p) != digest]
+    for label, paths in (("输出缺失", missing), ("输出在构建之外被修改", touched)):
+        if paths:
+            reasons.append(_changed(label, sorted(set(paths))))
+    return reasons
+
+
+def record_success(step: Step, state: BuildState) -> None:
+    state.steps[step.name] = {
+        "command": step.command_text,
+        "inputs": state.digests(step_inputs(step)),
+        "outputs": {p: d for p, d in state.digests(expand(step.outputs)).items() if d is not None},
+    }
+
+
+# ---- 执行 ----
+
+def command_line(step: Step) -> List[str]:
+    head, rest = step.command[0], step.command[1:]
+    if head == "tools":
+        return [sys.executable, "-m", "tools"] + rest
+    if head == "python":
+        return [sys.executable] + rest
+    return list(step.command)
+
+
+def run_step(step: Step) -> Tuple[int, str, float]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        command_line(step), cwd=MOD_ROOT, capture_output=True, text=True,
+        encoding="utf-8", errors="replace",
+    )
+    return result.returncode, result.stdout + result.stderr, time.perf_counter() - started
+
+
+def select(steps: List[Step], upstream: Dict[str, Set[str]], targets: List[str]) -> List[Step]:
+    """指定目标及其全部上游；不指定时为全部步骤"""
+    by_name = {step.name: step for step in steps}
+    unknown = [name for name in targets if name not in by_name]
+    if unknown:
+        raise ValueError(f"未知的步骤：{'、'.join(unknown)}（可用：{'、'.join(by_name)}）")
+    if not targets:
+        return steps
+    wanted: Set[str] = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(upstream[name])
+    return [step for step in steps if step.name in wanted]
+
+
+def build(
+    steps: List[Step],
+    upstream: Dict[str, Set[str]],
+    state: BuildState,
+    jobs: int,
+    explain: bool = False,
+    dry_run: bool = False,
+    verbose: bool = False,
+) -> Tuple[List[str], List[str]]:
+    """返回 (运行过的步骤, 失败的步骤)"""
+    pending = {step.name: step for step in steps}
+    finished: Set[str] = set()
+    would_run: Set[str] = set()
+    ran: List[str] = []
+    failed: List[str] = []
+    running: Dict[Future, Step] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in list(pending):
+                step = pending[name]
+                parents = upstream[name] & ({s.name for s in steps})
+                if not parents <= finished:
+                    continue
+                del pending[name]
+                broken = sorted(parents & set(failed))
+                if broken:
+                    print(f"[跳过] {name}：上游 {'、'.join(broken)} 失败")
+                    failed.append(name)
+                    finished.add(name)
+                    continue
+                if not step.enabled:
+                    if explain:
+                        print(f"[停用] {name}")
+                    finished.add(name)
+                    continue
+                reasons = stale_reasons(step, state)
+                if dry_run:
+                    reasons += [f"上游 {parent} 将重新运行" for parent in sorted(parents & would_run)]
+                if not reasons:
+                    if explain:
+                        print(f"[最新] {name}")
+                    finished.add(name)
+                    continue
+                if explain or dry_run:
+                    print(f"[{'将运行' if dry_run else '运行'}] {name}：" + "；".join(reasons))
+                else:
+                    print(f"[运行] {name}")
+                if dry_run:
+                    would_run.add(name)
+                    finished.add(name)
+                    continue
+                running[pool.submit(run_step, step)] = step
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                code, output, seconds = future.result()
+                if code == 0:
+                    record_success(step, state)
+                    ran.append(step.name)
+                    print(f"[完成] {step.name}（{seconds:.1f}s）")
+                    if verbose and output.strip():
+                        print(output.rstrip())
+                else:
+                    failed.append(step.name)
+                    print(f"[失败] {step.name}：返回码 {code}")
+                    print(output.rstrip())
+                finished.add(step.name)
+    return ran, failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools build",
+        description="按 tools/build.txt 增量重建派生文件，只运行输入有变化的步骤。",
+    )
+    parser.add_argument("targets", nargs="*", help="只构建这些步骤（及其上游）")
+    parser.add_argument("--explain", action="store_true", help="说明每个步骤运行或跳过的原因")
+    parser.add_argument("--dry-run", action="store_true", help="只列出会运行的步骤")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行运行的步骤数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="显示成功步骤的输出")
+    parser.add_argument("--graph", type=Path, default=GRAPH_FILE, help="构建图文件（默认 tools/build.txt）")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        steps = load_graph(args.graph)
+        upstream = link(steps)
+        selected = select(steps, upstream, args.targets)
+    except (OSError, ValueError) as e:
+        print(f"[错误] {e}")
+        return 1
+
+    state = BuildState(cache_path(STATE_FILE))
+    try:
+        ran, failed = build(selected, upstream, state, args.jobs, args.explain, args.dry_run, args.verbose)
+        if ran and not failed and not args.dry_run:
+            # 下游的原地步骤（如 bom）可能改写了上游的输入输出；全部成功时以最终状态为准
+            for step in selected:
+                if step.enabled:
+                    record_success(step, state)
+    finally:
+        if not args.dry_run:
+            state.save()
+
+    elapsed = time.perf_counter() - started
+    if args.dry_run:
+        print(f"\n[预览] 共 {len(selected)} 个步骤（{elapsed:.2f}s）")
+    elif failed:
+        print(f"\n[失败] {len(failed)} 个步骤失败：{'、'.join(failed)}")
+        return 1
+    elif ran:
+        print(f"\n[完成] 运行了 {len(ran)} 个步骤（{elapsed:.2f}s）")
+    else:
+        print(f"\n[最新] 没有需要运行的步骤（{elapsed:.2f}s）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
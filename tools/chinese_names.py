@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汉语名字表编译器
+
+in_game/common/languages/00_china.txt 中"作者：言"一段的名字（name_ai4_827e 这类
+"拼音+声调+繁体码位"的 key，以及 name_an1_5b89.name_ren2_4ec1 这类复名），连同
+main_menu/localization/*/00_character_names_dynamic_l_*.yml 中每个字的本地化，
+原先分几处手工维护。现在以 docs/chinese_names.csv 为唯一数据源，每行一个名字：
+
+    name         简体写法（本地化中文值），如 安仁
+    traditional  繁体写法，决定 key 中的码位；与 name 相同时留空
+    pinyin       每字拼音，空格分隔，ü 写作 v，如 an ren
+    tone         每字声调，空格分隔；0 表示 key 中不带声调数字
+    list         male / female / dynasty / lowborn，对应 male_names 等名字列表
+    language     语言或方言，如 mandarin_language、southern_mandarin_dialect
+    note         备注
+
+生成：
+- 每个目标列表中以 "# 作者：言" 开头的一段（或整个列表都是码位 key、没有标记时的整个列表）
+  按表中顺序排列；已有的行连同缩进、注释逐字节沿用，标记行与其余手写内容不动，
+  新增的行照已有行的缩进写出；顺序与表一致的列表整段不动；
+- 两个语言的 dynamic 本地化文件就地更新：表中用到的每个字一条，英文为首字母大写的拼音，
+  中文为简体字，取值不同时只改这一行的值，缺少的按 key 顺序插入；同一 key 对应不同简体字时报错；
+  文件头、注释与表中不产生的 key（如 00_china_extended.txt 的逐字本地化）原样保留；
+- 名字文件中的全部列表项逐段核对本地化，缺失的列出；没有原版游戏目录时，
+  非码位 key（多由原版提供）只计数不逐条列出。
+
+用法：
+    python -m tools names generate [--dry-run] [--check]
+    python -m tools names check                  # 只核对列表项的本地化
+    python -m tools names extract                # 从当前文件反推源表（一次性迁移用；表已存在时需加 --force）
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from localization import (
+    LocalizationWriter,
+    LocLine,
+    dump_localization,
+    localization_files,
+    parse_localization,
+    parse_localization_lines,
+)
+from pdx_script import Block, Entry, parse_bytes
+from pdx_writer import atomic_text, atomic_write
+from vfs import MOD_ROOT, VirtualFileSystem, get_vfs
+
+TABLE_CSV = MOD_ROOT / "docs" / "chinese_names.csv"
+NAMES_FILE = "in_game/common/languages/00_china.txt"
+# 源表只有汉字与拼音，动态名字文件只生成这两种语言
+NAME_LANGUAGES = ("english", "simp_chinese")
+DYNAMIC_FILE = "main_menu/localization/{language}/00_character_names_dynamic_l_{language}.yml"
+COLUMNS = ["name", "traditional", "pinyin", "tone", "list", "language", "note"]
+LISTS = {"male": "male_names", "female": "female_names", "dynasty": "dynasty_names", "lowborn": "lowborn"}
+MARKER = "# 作者：言"
+GENERATED_NOTE = "以下由 python -m tools names 按 docs/chinese_names.csv 生成，请勿手工修改"
+
+CODE_KEY_RE = re.compile(r"^name_([a-z]+?)([0-4]?)_([0-9a-f]{4,6})$")
+PINYIN_RE = re.compile(r"^[a-z]+$")
+
+
+@dataclass(frozen=True)
+class Syllable:
+    simplified: str
+    traditional: str
+    pinyin: str
+    tone: str  # "0" 表示不带声调
+
+    @property
+    def key(self) -> str:
+        tone = "" if self.tone == "0" else self.tone
+        return f"name_{self.pinyin}{tone}_{ord(self.traditional):04x}"
+
+    @property
+    def english(self) -> str:
+        return self.pinyin.capitalize()
+
+
+@dataclass
+class NameRow:
+    syllables: Tuple[Syllable, ...]
+    list: str
+    language: str
+    note: str
+    line: int
+
+    @property
+    def key(self) -> str:
+        return ".".join(syllable.key for syllable in self.syllables)
+
+    @property
+    def name(self) -> str:
+        return "".join(syllable.simplified for syllable in self.syllables)
+
+
+# ---- 源表读写 ----
+
+def load_table(path: Path = TABLE_CSV) -> List[NameRow]:
+    rows: List[NameRow] = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for number, row in enumerate(csv.DictReader(f), start=2):
+            where = f"{path.name} 第 {number} 行"
+            name = (row.get("name") or "").strip()
+            traditional = (row.get("traditional") or "").strip() or name
+            pinyin = (row.get("pinyin") or "").split()
+            tones = (row.get("tone") or "").split()
+            kind = (row.get("list") or "").strip()
+            language = (row.get("language") or "").strip()
+            if not name:
+                raise ValueError(f"{where}：缺少 name")
+            if not (len(name) == len(traditional) == len(pinyin) == len(tones)):
+                raise ValueError(f"{where}：{name} 的字数与 traditional / pinyin / tone 的个数不一致")
+            if kind not in LISTS:
+                raise ValueError(f"{where}：未知的 list '{kind}'（可用 {'、'.join(LISTS)}）")
+            if not language:
+                raise ValueError(f"{where}：缺少 language")
+            for syllable, tone in zip(pinyin, tones):
+                if not PINYIN_RE.match(syllable):
+                    raise ValueError(f"{where}：拼音只能是小写字母（ü 写作 v）：{syllable}")
+                if tone not in {"0", "1", "2", "3", "4"}:
+                    raise ValueError(f"{where}：声调必须是 0-4：{tone}")
+            syllables = tuple(Syllable(*parts) for parts in zip(name, traditional, pinyin, tones))
+            rows.append(NameRow(syllables, kind, language, (row.get("note") or "").strip(), number))
+    return rows
+
+
+def save_table(rows: List[NameRow], path: Path = TABLE_CSV) -> None:
+    with atomic_text(path, encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        for row in rows:
+            traditional = "".join(s.traditional for s in row.syllables)
+            writer.writerow([
+                row.name,
+                "" if traditional == row.name else traditional,
+                " ".join(s.pinyin for s in row.syllables),
+                " ".join(s.tone for s in row.syllables),
+                row.list,
+                row.language,
+                row.note,
+            ])
+
+
+def character_index(rows: List[NameRow]) -> Dict[str, Syllable]:
+    """每个字的 key -> 音节；同一 key 对应不同简体字时报错"""
+    index: Dict[str, Syllable] = {}
+    first: Dict[str, int] = {}
+    for row in rows:
+        for syllable in row.syllables:
+            known = index.get(syllable.key)
+            if known is None:
+                index[syllable.key] = syllable
+                first[syllable.key] = row.line
+            elif known.simplified != syllable.simplified:
+                raise ValueError(
+                    f"第 {row.line} 行：{syllable.key} 写作 {syllable.simplified}，"
+                    f"与第 {first[syllable.key]} 行的 {known.simplified} 冲突"
+                )
+    return index
+
+
+# ---- 名字文件中的目标列表 ----
+
+@dataclass
+class ListBlock:
+    language: str
+    list: str
+    entry: Entry
+    # 生成区域 [start, end)：从标记行（或整个列表的第一行）到右花括号所在行的行首
+    start: int
+    end: int
+    indent: str
+    marked: bool
+
+
+def _line_start(source: bytes, offset: int) -> int:
+    return source.rfind(b"\n", 0, offset) + 1
+
+
+def _indent(source: bytes, offset: int) -> str:
+    return re.match(rb"[ \t]*", source[_line_start(source, offset):offset]).group().decode()
+
+
+def _is_code_key(value: str) -> bool:
+    return all(CODE_KEY_RE.match(part) for part in value.split("."))
+
+
+def find_lists(source: bytes, document: Block) -> Dict[Tuple[str, str], ListBlock]:
+    """(语言或方言, list) -> 列表块；方言在 `dialects = { ... }` 中"""
+    found: Dict[Tuple[str, str], ListBlock] = {}
+    kinds = {value: kind for kind, value in LISTS.items()}
+
+    def visit(owner: str, block: Block) -> None:
+        for entry in block:
+            if not entry.is_block or entry.key is None:
+                continue
+            if entry.key == "dialects":
+                for dialect in entry.value:
+                    if dialect.is_block and dialect.key:
+                        visit(dialect.key, dialect.value)
+                continue
+            kind = kinds.get(entry.key)
+            if kind is None:
+                continue
+            body = entry.value
+            end = _line_start(source, body.end - 1)
+            marker = source.find(MARKER.encode("utf-8"), body.start, body.end)
+            if marker >= 0:
+                start = _line_start(source, marker)
+                found[(owner, kind)] = ListBlock(owner, kind, entry, start, end, _indent(source, marker), True)
+            elif len(body) and all(e.key is None and isinstance(e.value, str) and _is_code_key(e.value) for e in body):
+                start = source.find(b"\n", body.start) + 1
+                indent = _indent(source, body.entries[0].start)
+                found[(owner, kind)] = ListBlock(owner, kind, entry, start, end, indent, False)
+            else:
+                # 没有生成区域：需要时插在右花括号之前
+                indent = _indent(source, entry.start) + "\t"
+                found[(owner, kind)] = ListBlock(owner, kind, entry, end, end, indent, False)
+
+    for entry in document:
+        if entry.is_block and entry.key:
+            visit(entry.key, entry.value)
+    return found
+
+
+def _item_key(line: bytes) -> Optional[str]:
+    """只有一个码位 key（可带行尾注释）的行返回该 key"""
+    words = line.split(b"#", 1)[0].split()
+    if len(words) != 1:
+        return None
+    key = words[0].decode("utf-8", "replace")
+    return key if _is_code_key(key) else None
+
+
+def render_region(source: bytes, block: ListBlock, rows: List[NameRow]) -> bytes:
+    """按表中顺序重排生成区域；已有的行（含缩进与注释）逐字节沿用，新行照已有行的缩进写"""
+    region = source[block.start:block.end]
+    lines = region.splitlines(keepends=True)
+    items = [number for number, line in enumerate(lines) if _item_key(line)]
+    keys = [_item_key(lines[number]) for number in items]
+    if keys == [row.key for row in rows]:
+        return region
+    existing: Dict[str, bytes] = {}
+    for number, key in zip(items, keys):
+        existing.setdefault(key, lines[number] if lines[number].endswith(b"\n") else lines[number] + b"\n")
+    if items:
+        indent = re.match(rb"[ \t]*", lines[items[0]]).group()
+        head, tail = lines[:items[0]], lines[items[-1] + 1:]
+    else:
+        indent = block.indent.encode()
+        head = lines or [f"{block.indent}{MARKER}（{GENERATED_NOTE}）\n".encode("utf-8")]
+        tail = []
+    body = [existing.get(row.key) or indent + f"{row.key} # {row.name}\n".encode("utf-8") for row in rows]
+    return b"".join(head + body + tail)
+
+
+def render_names_file(source: bytes, rows: List[NameRow]) -> bytes:
+    document = parse_bytes(source)
+    lists = find_lists(source, document)
+    groups: Dict[Tuple[str, str], List[NameRow]] = {}
+    seen = set()
+    for row in rows:
+        target = (row.language, row.list)
+        if target not in lists:
+            raise ValueError(f"第 {row.line} 行：{NAMES_FILE} 中没有 {row.language} 的 {LISTS[row.list]} 列表")
+        if (target, row.key) not in seen:
+            seen.add((target, row.key))
+            groups.setdefault(target, []).append(row)
+    edits = sorted(
+        (block.start, block.end, render_region(source, block, groups.get(target, [])))
+        for target, block in lists.items()
+        if target in groups or block.start != block.end
+    )
+    output = bytearray()
+    position = 0
+    for start, end, text in edits:
+        output += source[position:start]
+        output += text
+        position = end
+    output += source[position:]
+    return bytes(output)
+
+
+def _localized(syllable: Syllable, language: str) -> str:
+    return syllable.simplified if language == "simp_chinese" else syllable.english
+
+
+def render_localization(index: Dict[str, Syllable], language: str, existing: Optional[bytes] = None) -> bytes:
+    """existing 为现有文件内容：表中产生的 key 就地更新取值，缺少的按 key 顺序插入，
+    其余各行（文件头、注释、表中不产生的 key）逐字节保留"""
+    if existing is None:
+        buffer = io.BytesIO()
+        writer = LocalizationWriter(buffer, language)
+        writer.raw(f" # {GENERATED_NOTE}")
+        for key in sorted(index):
+            writer.entry(key, _localized(index[key], language))
+        return buffer.getvalue()
+
+    document = parse_localization_lines(existing)
+    seen = set()
+    for line in document.lines:
+        if line.key in index:
+            line.value = _localized(index[line.key], language)
+            seen.add(line.key)
+    missing = sorted(set(index) - seen)
+    if missing:
+        lines: List[LocLine] = []
+        position = 0
+        for line in document.lines:
+            while position < len(missing) and line.key is not None and line.key > missing[position]:
+                lines.append(_new_line(missing[position], index, language))
+                position += 1
+            lines.append(line)
+        if position < len(missing) and lines and not lines[-1].newline:
+            lines[-1].newline = "\n"
+        lines.extend(_new_line(key, index, language) for key in missing[position:])
+        document.lines = lines
+    return dump_localization(document)
+
+
+def _new_line(key: str, index: Dict[str, Syllable], language: str) -> LocLine:
+    return LocLine(raw="", newline="\n", key=key, indent=" ", value=_localized(index[key], language))
+
+
+# ---- 核对 ----
+
+def list_entries(document: Block) -> List[Entry]:
+    entries: List[Entry] = []
+    names = set(LISTS.values())
+
+    def visit(block: Block, inside: bool) -> None:
+        for entry in block:
+            if entry.is_block:
+                visit(entry.value, entry.key in names)
+            elif inside and entry.key is None:
+                entries.append(entry)
+
+    visit(document, False)
+    return entries
+
+
+def missing_localization(
+    vfs: VirtualFileSystem,
+    document: Block,
+    generated: Dict[str, Dict[str, bytes]],
+) -> Dict[str, List[Tuple[str, int]]]:
+    """语言 -> [(缺少本地化的 key, 行号)]；generated 为将要写入的本地化文件内容"""
+    result: Dict[str, List[Tuple[str, int]]] = {}
+    entries = list_entries(document)
+    for language in NAME_LANGUAGES:
+        dynamic = DYNAMIC_FILE.format(language=language)
+        known = set()
+        for logical in localization_files(vfs, [language]):
+            if logical != dynamic:
+                known.update(entry.key for entry in parse_localization(vfs.read_text(logical)).entries)
+        text = generated[language].decode("utf-8-sig")
+        known.update(entry.key for entry in parse_localization(text).entries)
+        missing = []
+        seen = set()
+        for entry in entries:
+            for part in entry.value.split("."):
+                if part not in known and part not in seen:
+                    seen.add(part)
+                    missing.append((part, entry.line))
+        result[language] = missing
+    return result
+
+
+def report_missing(vfs: VirtualFileSystem, missing: Dict[str, List[Tuple[str, int]]]) -> int:
+    """打印缺失的本地化，返回需要处理的条数（码位 key，或有原版目录时的全部）"""
+    has_vanilla = vfs.layer("vanilla") is not None
+    problems = 0
+    for language, items in missing.items():
+        listed = [item for item in items if has_vanilla or CODE_KEY_RE.match(item[0])]
+        for key, line in listed:
+            print(f"[缺少本地化] {language}：{key}（{NAMES_FILE}:{line}）")
+        problems += len(listed)
+        skipped = len(items) - len(listed)
+        if skipped:
+            print(f"[提示] {language}：另有 {skipped} 个非码位 key 找不到本地化，多由原版提供；未找到原版游戏目录，无法核对")
+    return problems
+
+
+# ---- 反推源表 ----
+
+def extract_rows(vfs: VirtualFileSystem) -> Tuple[List[NameRow], List[str]]:
+    """由当前的生成区域与中文本地化反推源表；返回 (行, 警告)"""
+    source = vfs.read_bytes(NAMES_FILE)
+    lists = find_lists(source, parse_bytes(source))
+    chinese = {
+        entry.key: entry.value
+        for entry in parse_localization(vfs.read_text(DYNAMIC_FILE.format(language="simp_chinese"))).entries
+    }
+    rows: List[NameRow] = []
+    warnings: List[str] = []
+    for block in sorted(lists.values(), key=lambda b: b.start):
+        if block.start == block.end:
+            continue
+        region = parse_bytes(source[block.start:block.end])
+        for entry in region:
+            if entry.key is not None or not isinstance(entry.value, str):
+                continue
+            syllables = []
+            for part in entry.value.split("."):
+                match = CODE_KEY_RE.match(part)
+                if match is None:
+                    warnings.append(f"{block.language} {LISTS[block.list]}：{part} 不是码位 key，未收入源表")
+                    syllables = []
+                    break
+                pinyin, tone, code = match.groups()
+                traditional = chr(int(code, 16))
+                simplified = chinese.get(part)
+                if simplified is None or len(simplified) != 1:
+                    warnings.append(f"{part} 没有单字的中文本地化，按繁体 {traditional} 收入")
+                    simplified = traditional
+                syllables.append(Syllable(simplified, traditional, pinyin, tone or "0"))
+            if syllables:
+                rows.append(NameRow(tuple(syllables), block.list, block.language, "", 0))
+    return rows, warnings
+
+
+# ---- 命令行 ----
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools names",
+        description="由 docs/chinese_names.csv 生成汉语名字列表与逐字本地化，并核对列表项的本地化。",
+    )
+    parser.add_argument("--table", type=Path, default=TABLE_CSV, help="源表 CSV（默认 docs/chinese_names.csv）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    generate = sub.add_parser("generate", help="生成名字列表与本地化文件")
+    generate.add_argument("--dry-run", action="store_true", help="只报告变化，不写文件")
+    generate.add_argument("--check", action="store_true", help="文件与生成结果不一致时返回码为 1")
+    sub.add_parser("check", help="只核对名字列表项是否都有本地化")
+    extract = sub.add_parser("extract", help="从当前文件反推源表并写入 --table")
+    extract.add_argument("--force", action="store_true", help="覆盖已有的源表")
+    args = parser.parse_args(argv)
+
+    vfs = get_vfs()
+    if args.command == "extract":
+        if args.table.exists() and not args.force:
+            print(f"[错误] {args.table} 已存在，它是手工维护的源表；确认要用反推结果覆盖时加 --force")
+            return 1
+        rows, warnings = extract_rows(vfs)
+        for warning in warnings:
+            print(f"[警告] {warning}")
+        save_table(rows, args.table)
+        print(f"[完成] {len(rows)} 个名字写入 {args.table}")
+        return 0
+
+    started = time.perf_counter()
+    try:
+        rows = load_table(args.table)
+        index = character_index(rows)
+        source = vfs.read_bytes(NAMES_FILE)
+        names_output = render_names_file(source, rows)
+    except (OSError, ValueError) as e:
+        print(f"[错误] {e}")
+        return 1
+    outputs: Dict[str, bytes] = {NAMES_FILE: names_output}
+    localized: Dict[str, bytes] = {}
+    try:
+        for language in NAME_LANGUAGES:
+            dynamic = DYNAMIC_FILE.format(language=language)
+            existing = vfs.read_bytes(dynamic) if vfs.exists(dynamic) else None
+            localized[language] = render_localization(index, language, existing)
+            outputs[dynamic] = localized[language]
+    except (OSError, ValueError) as e:
+        print(f"[错误] {e}")
+        return 1
+    missing = missing_localization(vfs, parse_bytes(names_output), localized)
+    elapsed = time.perf_counter() - started
+
+    print(f"[源表] {len(rows)} 个名字，{len(index)} 个字，编译 {elapsed * 1000:.0f} ms")
+    problems = report_missing(vfs, missing)
+    if args.command == "check":
+        return 1 if problems else 0
+
+    changed = [
+        logical for logical, data in outputs.items()
+        if not vfs.exists(logical) or vfs.read_bytes(logical) != data
+    ]
+    for logical in changed:
+        print(f"[{'需要重新生成' if args.check else '变化'}] {logical}")
+    if args.check:
+        return 1 if changed or problems else 0
+    if args.dry_run or not changed:
+        print("\n[未写入] " + ("--dry-run" if args.dry_run else "文件已是最新"))
+        return 0
+    for logical in changed:
+        with atomic_write(vfs.mod_path(logical)) as f:
+            f.write(outputs[logical])
+        vfs.invalidate(logical)
+    print(f"\n[已写入] {len(changed)} 个文件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
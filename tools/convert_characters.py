@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import argparse
 import datetime as _dt
+import io
 import sys
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional
 
-from openpyxl import load_workbook
+from pdx_writer import ScriptWriter, open_script
+from workbook_cache import format_date, open_workbook
 
 
 COLUMN_MAP = {
@@ -55,39 +57,44 @@ def cast_scalar(value: Any) -> Optional[str]:
             return str(int(value))
         return str(value)
     if isinstance(value, (_dt.datetime, _dt.date)):
-        return f"{value.year}.{value.month}.{value.day}"
+        return format_date(value)
     text = str(value).strip()
     return text or None
 
 
-def render_field(key: str, value: str) -> Optional[str]:
+def write_field(writer: ScriptWriter, key: str, value: Optional[str]) -> None:
     if value is None:
-        return None
+        return
     if key in {"first_name", "last_name"}:
-        return f"\t\t{key} = {{ name = {value} }}"
-    if key in {"adm", "dip", "mil"}:
-        return f"\t\t{key} = {value}"
-    return f"\t\t{key} = {value}"
+        writer.inline(key, [("name", value)])
+    else:
+        writer.field(key, value)
 
 
-def render_entry(record: Dict[str, Optional[str]]) -> str:
-    lines: List[str] = []
+def write_entry(writer: ScriptWriter, record: Dict[str, Optional[str]]) -> None:
+    identifier = record.get("identifier")
+    if not identifier:
+        raise ValueError("记录缺少 identifier，无法生成条目。")
     comment = record.get("comment")
     note = record.get("note")
     if comment:
-        lines.append(f"\t# {comment}")
+        writer.comment(comment)
     if note:
-        lines.append(f"\t# 备注：{note}")
-    identifier = record.get("identifier")
-    if not identifier:
-        raise ValueError("记录缺少 identifier，无法生成条目。")
-    lines.append(f"\t{identifier} = {{")
+        writer.comment(f"备注：{note}")
+    writer.open(identifier)
     for field in FIELD_ORDER:
-        rendered = render_field(field, record.get(field))
-        if rendered:
-            lines.append(rendered)
-    lines.append("\t}\n")
-    return "\n".join(lines)
+        write_field(writer, field, record.get(field))
+    writer.close()
+    writer.blank()
+
+
+def render_entry(record: Dict[str, Optional[str]]) -> str:
+    """单个条目的文本（位于 character_db 内一层缩进）"""
+    buffer = io.BytesIO()
+    writer = ScriptWriter(buffer, depth=1)
+    write_entry(writer, record)
+    writer.finish()
+    return buffer.getvalue().decode("utf-8")
 
 
 def prepare_records(rows: Iterable[Iterable[Any]]) -> List[Dict[str, Optional[str]]]:
@@ -166,20 +173,27 @@ def main() -> None:
     if not args.input.exists():
         parser.error(f"找不到输入文件：{args.input}")
 
-    workbook = load_workbook(args.input, data_only=True)
+    workbook = open_workbook(args.input)
     worksheet = workbook[args.sheet] if args.sheet else workbook.active
 
-    records = prepare_records(worksheet.iter_rows(values_only=True))
+    records = prepare_records(worksheet.rows())
     slug_counter: Dict[str, int] = {}
     for idx, record in enumerate(records, start=1):
         record["identifier"] = build_identifier(record, idx, slug_counter)
-    rendered_entries = "\n".join(render_entry(record) for record in records)
-    output_text = "character_db={\n" + rendered_entries + "}\n"
+
+    def write_all(writer: ScriptWriter) -> None:
+        writer.open("character_db")
+        for record in records:
+            write_entry(writer, record)
+        writer.close()
 
     if args.output:
-        args.output.write_text(output_text, encoding="utf-8")
+        with open_script(args.output) as writer:
+            write_all(writer)
     else:
-        sys.stdout.write(output_text)
+        writer = ScriptWriter(sys.stdout.buffer)
+        write_all(writer)
+        writer.finish()
 
 
 if __name__ == "__main__":
@@ -10,6 +10,9 @@ import re
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+from localization import LocalizationWriter
+from pdx_writer import atomic_write
+
 # Mod根目录
 MOD_ROOT = Path(__file__).parent.parent
 
@@ -129,14 +132,14 @@ def generate_opposite_language_file(source_file: Path, target_file: Path,
     
     language, entries = parse_localization_file(source_file)
     
-    # 准备输出内容
-    output_lines = [f"{target_lang}:\n"]
-    
-    for line, key, version, value in entries:
-        if key is None:
-            # 保留注释和空行
-            output_lines.append(line + '\n')
-        else:
+    # 逐行写入文件（带BOM）
+    with atomic_write(target_file) as f:
+        writer = LocalizationWriter(f, target_lang[len("l_"):])
+        for line, key, version, value in entries:
+            if key is None:
+                # 保留注释和空行
+                writer.raw(line)
+                continue
             # 生成翻译值
             if target_lang == "l_english":
                 # 中文 -> 英文
@@ -150,17 +153,8 @@ def generate_opposite_language_file(source_file: Path, target_file: Path,
                 # 英文 -> 中文：直接使用英文原文
                 trans_value = value
             
-            # 构造输出行（保持原有缩进和版本号格式）
-            if version is not None:
-                # 有版本号格式
-                output_lines.append(f' {key}:{version} "{trans_value}"\n')
-            else:
-                # 无版本号格式
-                output_lines.append(f' {key}: "{trans_value}"\n')
-    
-    # 写入文件（带BOM）
-    with open(target_file, 'w', encoding='utf-8-sig') as f:
-        f.writelines(output_lines)
+            # 保持原有版本号格式
+            writer.entry(key, trans_value, version)
     
     print(f"  ✓ 已生成 {len([e for e in entries if e[1] is not None])} 个条目")
 
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态加载开销分析
+
+游戏加载时间大致与要解析的内容量成正比。本工具遍历 mod 中游戏会读取的
+.txt / .gui / .yml 文件，按文件与顶层 key 统计字节数、令牌数、条目数、
+块数与最大嵌套深度，并按加载阶段（主菜单 setup、common、事件、本地化、gui ……）
+汇总，输出排行报告与 JSON。
+
+JSON 基线 load_profile_baseline.json 随仓库提交；--check 时，最重的若干文件、
+或任一阶段的令牌数比基线增长超过容差即返回码为 1，
+在玩家感受到加载变慢之前就能在 diff 中看到。
+
+本地化文件没有块结构，每个条目按 key 与值两个令牌计。
+
+用法：
+    python -m tools load-profile                    # 排行报告
+    python -m tools load-profile --json profile.json
+    python -m tools load-profile --check            # 与基线比较
+    python -m tools load-profile --update-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from localization import parse_localization_lines
+from pdx_script import BOM, Block, parse_bytes, tokenize
+from pdx_writer import atomic_text
+from vfs import MOD_ROOT, SCRIPT_DIR
+
+BASELINE_FILE = SCRIPT_DIR / "load_profile_baseline.json"
+DEFAULT_TOLERANCE = 0.10
+# 增长少于这么多令牌的文件不算回退，避免小文件的百分比噪声
+MIN_TOKEN_DELTA = 2000
+DEFAULT_TOP = 20
+# JSON 中每个文件保留的顶层 key 数
+KEYS_PER_FILE = 5
+
+SUFFIXES = (".txt", ".gui", ".yml")
+# 游戏不会读取的目录
+SKIP_DIRS = {".git", ".cache", "__pycache__", "tools", "docs"}
+
+# (阶段, 说明, 路径前缀)；按顺序匹配，.yml 与 .gui 先按后缀归类
+PHASES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("localization", "本地化", ()),
+    ("gui", "界面", ()),
+    ("main_menu_setup", "主菜单 setup（开局数据）", ("main_menu/setup/",)),
+    ("main_menu_common", "主菜单 common", ("main_menu/common/",)),
+    ("in_game_setup", "游戏内 setup", ("in_game/setup/",)),
+    ("in_game_common", "游戏内 common", ("in_game/common/",)),
+    ("events", "事件", ("in_game/events/",)),
+    ("gfx", "图形定义", ("main_menu/gfx/", "in_game/gfx/")),
+    ("loading_screen", "加载画面", ("loading_screen/",)),
+    ("other", "其他", ()),
+]
+PHASE_LABELS = {name: label for name, label, _ in PHASES}
+
+
+@dataclass
+class Metrics:
+    bytes: int = 0
+    tokens: int = 0
+    entries: int = 0
+    blocks: int = 0
+    depth: int = 0
+
+    def add(self, other: "Metrics") -> None:
+        self.bytes += other.bytes
+        self.tokens += other.tokens
+        self.entries += other.entries
+        self.blocks += other.blocks
+        self.depth = max(self.depth, other.depth)
+
+
+@dataclass
+class FileProfile:
+    path: str
+    phase: str
+    totals: Metrics
+    keys: List[Tuple[str, Metrics]] = field(default_factory=list)
+
+
+def phase_of(logical: str) -> str:
+    suffix = os.path.splitext(logical)[1].lower()
+    if suffix == ".yml" or "/localization/" in f"/{logical}":
+        return "localization"
+    if suffix == ".gui" or "/gui/" in f"/{logical}":
+        return "gui"
+    for name, _, prefixes in PHASES:
+        if any(logical.startswith(prefix) for prefix in prefixes):
+            return name
+    return "other"
+
+
+def find_files(root: Path) -> List[Path]:
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in SUFFIXES:
+                files.append(Path(dirpath) / name)
+    return files
+
+
+def block_metrics(block: Block, depth: int = 1) -> Metrics:
+    """块内（不含块本身）的条目数、子块数与最大嵌套深度"""
+    metrics = Metrics(depth=depth)
+    stack = [(block, depth)]
+    while stack:
+        current, level = stack.pop()
+        metrics.depth = max(metrics.depth, level)
+        for entry in current.entries:
+            metrics.entries += 1
+            if isinstance(entry.value, Block):
+                metrics.blocks += 1
+                stack.append((entry.value, level + 1))
+    return metrics
+
+
+def profile_script(data: bytes) -> Tuple[Metrics, List[Tuple[str, Metrics]]]:
+    document = parse_bytes(data)
+    starts = [token[2] for token in tokenize(data, len(BOM) if data.startswith(BOM) else 0)]
+    totals = Metrics(bytes=len(data), tokens=len(starts))
+    keys: Dict[str, Metrics] = {}
+    for entry in document.entries:
+        tokens = bisect.bisect_left(starts, entry.end) - bisect.bisect_left(starts, entry.start)
+        if isinstance(entry.value, Block):
+            inner = block_metrics(entry.value)
+            metrics = Metrics(entry.end - entry.start, tokens, inner.entries + 1, inner.blocks + 1, inner.depth)
+        else:
+            metrics = Metrics(entry.end - entry.start, tokens, 1, 0, 0)
+        totals.entries += metrics.entries
+        totals.blocks += metrics.blocks
+        totals.depth = max(totals.depth, metrics.depth)
+        # 同名顶层 key（如多个 character_db）合并统计
+        keys.setdefault(entry.key or "(列表值)", Metrics()).add(metrics)
+    return totals, sorted(keys.items(), key=lambda item: -item[1].tokens)
+
+
+def profile_localization(data: bytes) -> Tuple[Metrics, List[Tuple[str, Metrics]]]:
+    document = parse_localization_lines(data)
+    entries = sum(1 for line in document.lines if line.key is not None)
+    language = next((line.raw.strip() for line in document.lines if line.raw.strip().startswith("l_")), "(无语言头)")
+    totals = Metrics(bytes=len(data), tokens=entries * 2, entries=entries)
+    return totals, [(language.rstrip(":"), Metrics(len(data), entries * 2, entries))]
+
+
+def profile_tree(root: Path) -> List[FileProfile]:
+    profiles = []
+    for path in find_files(root):
+        logical = path.relative_to(root).as_posix()
+        data = path.read_bytes()
+        if path.suffix.lower() == ".yml":
+            totals, keys = profile_localization(data)
+        else:
+            totals, keys = profile_script(data)
+        profiles.append(FileProfile(logical, phase_of(logical), totals, keys))
+    return profiles
+
+
+def phase_totals(profiles: List[FileProfile]) -> Dict[str, Tuple[int, Metrics]]:
+    totals: Dict[str, Tuple[int, Metrics]] = {}
+    for profile in profiles:
+        count, metrics = totals.get(profile.phase, (0, Metrics()))
+        metrics.add(profile.totals)
+        totals[profile.phase] = (count + 1, metrics)
+    return totals
+
+
+# ---- JSON 与基线 ----
+
+def to_json(profiles: List[FileProfile]) -> Dict:
+    return {
+        "phases": {
+            phase: {"files": count, **asdict(metrics)}
+            for phase, (count, metrics) in sorted(phase_totals(profiles).items())
+        },
+        "files": {
+            profile.path: {
+                "phase": profile.phase,
+                **asdict(profile.totals),
+                "keys": {key: metrics.tokens for key, metrics in profile.keys[:KEYS_PER_FILE]},
+            }
+            for profile in sorted(profiles, key=lambda p: p.path)
+        },
+    }
+
+
+def load_json(path: Path) -> Dict:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(data: Dict, path: Path) -> None:
+    """每个阶段、每个文件各占一行，基线的 diff 按文件逐行可读"""
+    def section(name: str) -> str:
+        lines = [
+            f"  {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+            for key, value in data[name].items()
+        ]
+        return f' "{name}": {{\n' + ",\n".join(lines) + "\n }"
+
+    with atomic_text(path) as f:
+        f.write("{\n" + ",\n".join(section(name) for name in ("phases", "files")) + "\n}\n")
+
+
+def compare_baseline(current: Dict, baseline: Dict, tolerance: float, top: int) -> List[str]:
+    """返回比基线明显变重的阶段与最重的 top 个文件"""
+    regressions = []
+
+    def grown(before: int, after: int) -> bool:
+        return after - before >= MIN_TOKEN_DELTA and after > before * (1 + tolerance)
+
+    for phase, metrics in current["phases"].items():
+        before = baseline.get("phases", {}).get(phase, {}).get("tokens", 0)
+        if grown(before, metrics["tokens"]):
+            regressions.append(
+                f"阶段 {PHASE_LABELS.get(phase, phase)}：令牌 {before} -> {metrics['tokens']}"
+            )
+    heaviest = sorted(current["files"].items(), key=lambda item: -item[1]["tokens"])[:top]
+    for path, metrics in heaviest:
+        before = baseline.get("files", {}).get(path, {}).get("tokens", 0)
+        if grown(before, metrics["tokens"]):
+            regressions.append(f"{path}：令牌 {before} -> {metrics['tokens']}")
+    return regressions
+
+
+# ---- 报告 ----
+
+def _row(label: str, metrics: Metrics, width: int = 56) -> str:
+    return (
+        f"{label:<{width}}{metrics.bytes / 1024:>10.0f}{metrics.tokens:>10}"
+        f"{metrics.entries:>9}{metrics.blocks:>8}{metrics.depth:>5}"
+    )
+
+
+def _header(title: str, width: int = 56) -> str:
+    return f"{title:<{width}}{'KB':>10}{'令牌':>8}{'条目':>7}{'块':>7}{'深度':>3}"
+
+
+def print_report(profiles: List[FileProfile], top: int) -> None:
+    totals = phase_totals(profiles)
+    grand = sum(metrics.tokens for _, metrics in totals.values()) or 1
+    print(_header("加载阶段"))
+    for phase, (count, metrics) in sorted(totals.items(), key=lambda item: -item[1][1].tokens):
+        label = f"{PHASE_LABELS.get(phase, phase)}（{count} 个文件，{metrics.tokens / grand:.0%}）"
+        print(_row(label, metrics))
+
+    print("\n" + _header(f"最重的 {top} 个文件"))
+    for profile in sorted(profiles, key=lambda p: -p.totals.tokens)[:top]:
+        print(_row(profile.path, profile.totals))
+
+    print("\n" + _header(f"最重的 {top} 个顶层 key"))
+    keys = [(f"{key} @ {profile.path.rsplit('/', 1)[-1]}", metrics) for profile in profiles for key, metrics in profile.keys]
+    for label, metrics in sorted(keys, key=lambda item: -item[1].tokens)[:top]:
+        print(_row(label, metrics))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools load-profile",
+        description="按文件、顶层 key 与加载阶段统计 mod 的解析开销。",
+    )
+    parser.add_argument("--root", type=Path, default=MOD_ROOT, help="要统计的目录（默认 mod 根目录）")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help=f"排行显示的条数（默认 {DEFAULT_TOP}）")
+    parser.add_argument("--json", type=Path, help="把完整统计写入 JSON 文件")
+    parser.add_argument("--check", action="store_true", help="与基线比较，明显变重时返回码为 1")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help=f"允许增长的比例（默认 {DEFAULT_TOLERANCE}）",
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="把本次统计写入基线文件")
+    args = parser.parse_args(argv)
+
+    if not args.root.is_dir():
+        print(f"[错误] 目录不存在：{args.root}")
+        return 1
+    profiles = profile_tree(args.root)
+    print_report(profiles, args.top)
+    current = to_json(profiles)
+
+    if args.json:
+        save_json(current, args.json)
+        print(f"\n[JSON] 已写入 {args.json}")
+    if args.update_baseline:
+        save_json(current, BASELINE_FILE)
+        print(f"\n[基线] 已写入 {BASELINE_FILE}")
+        return 0
+    if args.check:
+        baseline = load_json(BASELINE_FILE)
+        if not baseline:
+            print(f"\n[提示] 尚无基线文件 {BASELINE_FILE}，使用 --update-baseline 生成")
+            return 1
+        regressions = compare_baseline(current, baseline, args.tolerance, args.top)
+        for message in regressions:
+            print(f"[变重] {message}")
+        if regressions:
+            print(f"\n[失败] {len(regressions)} 项超过基线 {args.tolerance:.0%}")
+            return 1
+        print("\n[通过] 没有明显变重的阶段或文件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
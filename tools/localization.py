@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地化（.yml）文件读取
+
+PDX 本地化文件并不是真正的 YAML：首行为 `l_<语言>:`，其后每行一个
+` key:版本 "值"`，值内部可以出现未转义的引号，行尾可以跟 `# 注释`。
+这里按行解析，供各工具共享。
+
+parse_localization_lines() / dump_localization() 是保留格式的读写：每一行
+拆成缩进、key、版本、值、行尾注释等片段，写回时重新拼接，换行符与 BOM
+原样保留，用于需要改写本地化文件又不能扰动其余内容的场合。
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, List, Optional
+
+LOCALIZATION_DIRS = ("main_menu/localization", "in_game/localization")
+# mod 提供本地化的语言（japanese 目录下只有国家名）
+LANGUAGES = ("english", "simp_chinese", "japanese")
+BOM = b"\xef\xbb\xbf"
+
+LANGUAGE_RE = re.compile(r"^\s*l_([a-z_]+)\s*:\s*$")
+ENTRY_RE = re.compile(r'^\s*([^\s:#"]+)\s*:\s*(\d+)?\s*"(.*)"\s*(?:#.*)?$')
+# 保留格式用：缩进、key、冒号、版本、空白、值、行尾
+LINE_RE = re.compile(r'^(\s*)([^\s:#"]+)(\s*:\s*)(\d*)(\s*)"(.*)"(\s*(?:#.*)?)$')
+
+
+@dataclass
+class LocEntry:
+    key: str
+    version: Optional[str]
+    value: str
+    line: int
+
+
+@dataclass
+class LocalizationFile:
+    language: Optional[str]
+    entries: List[LocEntry] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, str]:
+        return {entry.key: entry.value for entry in self.entries}
+
+
+def parse_localization(text: str) -> LocalizationFile:
+    """解析本地化文本；无法识别的行（注释、空行）被忽略"""
+    if text.startswith("﻿"):
+        text = text[1:]
+    result = LocalizationFile(language=None)
+    for number, line in enumerate(text.splitlines(), start=1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if result.language is None:
+            match = LANGUAGE_RE.match(line)
+            if match:
+                result.language = match.group(1)
+                continue
+        match = ENTRY_RE.match(line)
+        if match:
+            result.entries.append(LocEntry(match.group(1), match.group(2), match.group(3), number))
+    return result
+
+
+@dataclass
+class LocLine:
+    """保留格式的一行；key 为 None 时（语言头、注释、空行等）按 raw 原样写回"""
+
+    raw: str
+    newline: str
+    key: Optional[str] = None
+    indent: str = ""
+    separator: str = ":"
+    version: str = ""
+    spacing: str = " "
+    value: str = ""
+    trailing: str = ""
+
+    def render(self) -> str:
+        if self.key is None:
+            return self.raw + self.newline
+        return (
+            f'{self.indent}{self.key}{self.separator}{self.version}{self.spacing}'
+            f'"{self.value}"{self.trailing}{self.newline}'
+        )
+
+
+@dataclass
+class LocalizationDocument:
+    bom: bool
+    lines: List[LocLine] = field(default_factory=list)
+
+    def entries(self) -> Dict[str, LocLine]:
+        return {line.key: line for line in self.lines if line.key is not None}
+
+
+def parse_localization_lines(data: bytes) -> LocalizationDocument:
+    """按行拆分本地化文件，保留每行的全部细节"""
+    bom = data.startswith(BOM)
+    text = data[len(BOM):].decode("utf-8") if bom else data.decode("utf-8")
+    document = LocalizationDocument(bom=bom)
+    for chunk in text.splitlines(keepends=True):
+        body = chunk.rstrip("\r\n")
+        newline = chunk[len(body):]
+        match = LINE_RE.match(body)
+        if match is None or LANGUAGE_RE.match(body):
+            document.lines.append(LocLine(raw=body, newline=newline))
+            continue
+        indent, key, separator, version, spacing, value, trailing = match.groups()
+        document.lines.append(
+            LocLine(body, newline, key, indent, separator, version, spacing, value, trailing)
+        )
+    return document
+
+
+def dump_localization(document: LocalizationDocument) -> bytes:
+    data = "".join(line.render() for line in document.lines).encode("utf-8")
+    return BOM + data if document.bom else data
+
+
+class LocalizationWriter:
+    """逐行写出本地化文件：`l_<语言>:` 头，其后每行 ` key:版本 "值"`"""
+
+    def __init__(self, sink: BinaryIO, language: str, bom: bool = True):
+        self.sink = sink
+        if bom:
+            sink.write(BOM)
+        self._write(f"l_{language}:")
+
+    def _write(self, line: str) -> None:
+        self.sink.write(line.encode("utf-8") + b"\n")
+
+    def entry(self, key: str, value: str, version: Optional[str] = None) -> None:
+        if version is not None:
+            self._write(f' {key}:{version} "{value}"')
+        else:
+            self._write(f' {key}: "{value}"')
+
+    def raw(self, line: str) -> None:
+        """注释、空行等原样写出"""
+        self._write(line)
+
+
+def language_of_path(logical: str) -> Optional[str]:
+    """按文件名后缀 `_l_<语言>.yml` 推断语言"""
+    name = logical.rsplit("/", 1)[-1]
+    match = re.search(r"_l_([a-z_]+)\.yml$", name)
+    return match.group(1) if match else None
+
+
+def localization_files(vfs, languages: Optional[Iterable[str]] = None) -> List[str]:
+    """mod（及下层）中的本地化文件逻辑路径"""
+    wanted = set(languages) if languages else None
+    files = []
+    for directory in LOCALIZATION_DIRS:
+        for logical in vfs.walk(directory, (".yml",)):
+            language = language_of_path(logical)
+            if wanted is None or language in wanted:
+                files.append(logical)
+    return files
+
+
+def load_localization(vfs, language: str) -> Dict[str, str]:
+    """某一语言的全部 key -> 值；后加载的文件覆盖先加载的"""
+    result: Dict[str, str] = {}
+    for logical in localization_files(vfs, [language]):
+        result.update(parse_localization(vfs.read_text(logical)).as_dict())
+    return result
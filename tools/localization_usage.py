@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地化 key 使用情况：未引用的 key、跨文件重复与取值冲突，以及清理
+
+游戏会把全部 .yml 中的 key 按语言载入并常驻内存，其中有些从未被脚本引用，
+有些在多个文件中重复定义（游戏只保留其一，且不报错）。本工具：
+
+- 引用集：扫描 VFS 合并视图下 in_game / main_menu / loading_screen 的全部
+  .txt 与 .gui（本地化目录除外）的词与字符串，连同 `c:TAG`、`special_status:x`
+  等前缀形式拆出的标识符；每个文件的词集合按内容哈希缓存在 tools/.cache/ 中；
+- 定义集：全部本地化文件的 key -> [(语言, 文件, 行号, 值)]；
+- 一个 key 视为"被引用"，当它满足其一：
+    1. 本身出现在引用集中；
+    2. 去掉至多两个派生后缀（_desc、_ADJ、_tt、_modifier 等）后出现在引用集中，
+       或加上一个派生后缀后出现在引用集中（如 modifier 类型
+       levy_combat_efficiency 由脚本中的 levy_combat_efficiency_modifier 引用）；
+       去掉引擎拼接用的前缀（MODIFIER_TYPE_NAME_、country_history_ 等）同理；
+    3. 带点的 key（如 `ns.1.title`）的任一前缀出现在引用集中；
+    4. 被某个已被引用的 key 的值以 `$key$` 引用；
+    5. 同一 key 也定义在原版本地化中（覆盖原版文本）；
+    6. 匹配 docs/localization_keep.txt 中的通配符（引擎按规则拼接、脚本中看不到的 key）；
+- 未被引用的 key 在所有语言中一并报告、一并清理。
+
+没有找到原版游戏目录时，无法判断 key 是否覆盖原版文本，清理需要 --force。
+
+用法：
+    python -m tools loc-usage                     # 汇总
+    python -m tools loc-usage dead [--file 通配符]
+    python -m tools loc-usage duplicates [--conflicts]
+    python -m tools loc-usage prune [--dry-run] [--force] [--file 通配符]
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import hashlib
+import pickle
+import re
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from localization import (
+    dump_localization,
+    language_of_path,
+    localization_files,
+    parse_localization,
+    parse_localization_lines,
+)
+from pdx_script import STRING, WORD, tokenize
+from pdx_writer import atomic_write
+from vfs import MOD_ROOT, VirtualFileSystem, cache_path, get_vfs
+
+CACHE_FILE = "localization_usage.pickle"
+CACHE_VERSION = 2
+
+SCRIPT_DIRS = ("in_game", "main_menu", "loading_screen")
+SCRIPT_SUFFIXES = (".txt", ".gui")
+KEEP_FILE = MOD_ROOT / "docs" / "localization_keep.txt"
+
+# 由数据库条目名派生出的本地化 key 后缀
+DERIVED_SUFFIXES = (
+    "_desc", "_ADJ", "_adj", "_tt", "_title", "_name", "_modifier",
+    "_short", "_long", "_plural", "_flavor", "_info", "_effect", "_trigger",
+)
+# 引擎按 "前缀 + 名字" 拼接的 key，如 MODIFIER_TYPE_NAME_<modifier>、country_history_<TAG>
+DERIVED_PREFIXES = ("MODIFIER_TYPE_NAME_", "MODIFIER_TYPE_DESC_", "country_history_", "age_format_")
+MAX_STRIPPED_SUFFIXES = 2
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z0-9_][\w.\-']*")
+VARIABLE_RE = re.compile(r"\$([\w.\-']+)\$")
+
+
+@dataclass(frozen=True)
+class Definition:
+    key: str
+    language: str
+    path: str
+    line: int
+    value: str
+    in_mod: bool
+
+
+@dataclass
+class Usage:
+    definitions: Dict[str, List[Definition]] = field(default_factory=dict)
+    referenced: Set[str] = field(default_factory=set)
+    # key -> 判定理由（只记录被引用的 key）
+    reasons: Dict[str, str] = field(default_factory=dict)
+    # 文件头 `l_<语言>:` 与文件名后缀不一致的文件：(路径, 文件头语言, 文件名语言)
+    mislabeled: List[Tuple[str, str, str]] = field(default_factory=list)
+    has_vanilla: bool = False
+
+    @property
+    def dead(self) -> List[str]:
+        return sorted(key for key in self.definitions if key not in self.reasons)
+
+    def duplicates(self) -> Dict[Tuple[str, str], List[Definition]]:
+        """(key, 语言) -> 不同 mod 文件中的多处定义"""
+        result = {}
+        for key, definitions in self.definitions.items():
+            by_language: Dict[str, List[Definition]] = defaultdict(list)
+            for definition in definitions:
+                by_language[definition.language].append(definition)
+            for language, group in by_language.items():
+                if len({d.path for d in group}) > 1 and any(d.in_mod for d in group):
+                    result[(key, language)] = group
+        return result
+
+
+# ---- 引用集 ----
+
+def identifiers(text: str) -> Iterable[str]:
+    yield text
+    for identifier in IDENTIFIER_RE.findall(text):
+        yield identifier
+        # 复合名 `name_fu21.name_tong1` 的每一段各自是一个 key
+        if "." in identifier:
+            yield from identifier.split(".")
+
+
+def file_words(data: bytes) -> FrozenSet[str]:
+    words: Set[str] = set()
+    for kind, text, _start, _end, _line in tokenize(data):
+        if kind == WORD:
+            words.update(identifiers(text))
+        elif kind == STRING:
+            words.update(identifiers(text.strip('"')))
+    return frozenset(words)
+
+
+def script_files(vfs: VirtualFileSystem) -> List[str]:
+    files = []
+    for directory in SCRIPT_DIRS:
+        for logical in vfs.walk(directory, SCRIPT_SUFFIXES):
+            if "/localization/" not in logical:
+                files.append(logical)
+    return files
+
+
+def load_references(vfs: VirtualFileSystem, rebuild: bool = False) -> Tuple[Set[str], int, int]:
+    """返回 (引用集, 扫描的文件数, 重新切分的文件数)；每个文件的词集合按内容哈希缓存"""
+    path = cache_path(CACHE_FILE)
+    cached: Dict[str, Tuple[str, FrozenSet[str]]] = {}
+    if path.exists() and not rebuild:
+        try:
+            with open(path, "rb") as f:
+                version, data = pickle.load(f)
+            if version == CACHE_VERSION:
+                cached = data
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            pass
+    files = script_files(vfs)
+    current: Dict[str, Tuple[str, FrozenSet[str]]] = {}
+    rescanned = 0
+    for logical in files:
+        data = vfs.read_bytes(logical)
+        digest = hashlib.sha1(data).hexdigest()
+        entry = cached.get(logical)
+        if entry is None or entry[0] != digest:
+            entry = (digest, file_words(data))
+            rescanned += 1
+        current[logical] = entry
+    if rescanned or len(current) != len(cached):
+        with open(path, "wb") as f:
+            pickle.dump((CACHE_VERSION, current), f, protocol=pickle.HIGHEST_PROTOCOL)
+    references: Set[str] = set()
+    for _digest, words in current.values():
+        references |= words
+    return references, len(files), rescanned
+
+
+# ---- 定义集 ----
+
+def load_definitions(vfs: VirtualFileSystem, usage: Usage) -> None:
+    """语言以文件头为准（游戏按文件头归类），与文件名后缀不一致的记入 mislabeled"""
+    definitions: Dict[str, List[Definition]] = defaultdict(list)
+    for logical in localization_files(vfs):
+        in_mod = vfs.resolve(logical) is vfs.mod_layer
+        parsed = parse_localization(vfs.read_text(logical))
+        named = language_of_path(logical)
+        language = parsed.language or named or "?"
+        if named and parsed.language and named != parsed.language:
+            usage.mislabeled.append((logical, parsed.language, named))
+        for entry in parsed.entries:
+            definitions[entry.key].append(Definition(entry.key, language, logical, entry.line, entry.value, in_mod))
+    usage.definitions = dict(definitions)
+
+
+def load_keep_patterns() -> List[str]:
+    if not KEEP_FILE.exists():
+        return []
+    patterns = []
+    for line in KEEP_FILE.read_text(encoding="utf-8-sig").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            patterns.append(line)
+    return patterns
+
+
+def stems(key: str) -> Iterable[str]:
+    """去掉至多 MAX_STRIPPED_SUFFIXES 个派生后缀后的名字"""
+    frontier = [key]
+    for _ in range(MAX_STRIPPED_SUFFIXES):
+        stripped = []
+        for name in frontier:
+            for suffix in DERIVED_SUFFIXES:
+                if name.endswith(suffix) and len(name) > len(suffix):
+                    stripped.append(name[:-len(suffix)])
+        yield from stripped
+        frontier = stripped
+
+
+def reference_reason(key: str, references: Set[str]) -> Optional[str]:
+    if key in references:
+        return "脚本引用"
+    for stem in stems(key):
+        if stem in references:
+            return f"派生自 {stem}"
+    for prefix in DERIVED_PREFIXES:
+        if key.startswith(prefix):
+            stem = key[len(prefix):]
+            if stem in references or any(name in references for name in stems(stem)):
+                return f"派生自 {stem}"
+            for suffix in DERIVED_SUFFIXES:
+                if stem + suffix in references:
+                    return f"由 {stem + suffix} 派生"
+    for suffix in DERIVED_SUFFIXES:
+        if key + suffix in references:
+            return f"由 {key + suffix} 派生"
+    prefix = key
+    while "." in prefix:
+        prefix = prefix.rsplit(".", 1)[0]
+        if prefix in references:
+            return f"属于 {prefix}"
+    return None
+
+
+def analyze(vfs: Optional[VirtualFileSystem] = None, rebuild: bool = False) -> Tuple[Usage, int, int]:
+    """返回 (使用情况, 扫描的脚本文件数, 重新切分的文件数)"""
+    vfs = vfs or get_vfs()
+    references, scanned, rescanned = load_references(vfs, rebuild)
+    usage = Usage(referenced=references, has_vanilla=vfs.layer("vanilla") is not None)
+    load_definitions(vfs, usage)
+    keep = load_keep_patterns()
+
+    pending: List[str] = []
+    for key, definitions in usage.definitions.items():
+        reason = None
+        if any(not definition.in_mod for definition in definitions):
+            reason = "覆盖原版"
+        elif any(fnmatch.fnmatchcase(key, pattern) for pattern in keep):
+            reason = "保留列表"
+        else:
+            reason = reference_reason(key, references)
+        if reason:
+            usage.reasons[key] = reason
+            pending.append(key)
+
+    # 已被引用的 key 的值中以 $key$ 嵌入的其他 key 也被引用
+    while pending:
+        key = pending.pop()
+        for definition in usage.definitions[key]:
+            for name in VARIABLE_RE.findall(definition.value):
+                if name in usage.definitions and name not in usage.reasons:
+                    usage.reasons[name] = f"被 {key} 嵌入"
+                    pending.append(name)
+    return usage, scanned, rescanned
+
+
+# ---- 清理 ----
+
+def prune(usage: Usage, keys: Set[str], dry_run: bool = False) -> Dict[str, int]:
+    """从全部语言的 mod 本地化文件中删除 keys；返回 文件 -> 删除的行数"""
+    vfs = get_vfs()
+    files = sorted({d.path for key in keys for d in usage.definitions[key] if d.in_mod})
+    removed: Dict[str, int] = {}
+    for logical in files:
+        document = parse_localization_lines(vfs.read_bytes(logical))
+        kept = [line for line in document.lines if line.key not in keys]
+        count = len(document.lines) - len(kept)
+        if not count:
+            continue
+        removed[logical] = count
+        if dry_run:
+            continue
+        document.lines = kept
+        with atomic_write(vfs.mod_path(logical)) as f:
+            f.write(dump_localization(document))
+    return removed
+
+
+# ---- 命令行 ----
+
+def _filtered(usage: Usage, keys: Iterable[str], pattern: Optional[str]) -> List[str]:
+    if not pattern:
+        return list(keys)
+    return [
+        key for key in keys
+        if any(fnmatch.fnmatch(d.path.rsplit("/", 1)[-1], pattern) for d in usage.definitions[key])
+    ]
+
+
+def print_summary(usage: Usage, scanned: int, rescanned: int) -> None:
+    languages = sorted({d.language for definitions in usage.definitions.values() for d in definitions})
+    dead = usage.dead
+    duplicates = usage.duplicates()
+    conflicts = [group for group in duplicates.values() if len({d.value for d in group}) > 1]
+    print(f"[引用] 扫描 {scanned} 个脚本文件（重新切分 {rescanned} 个），{len(usage.referenced)} 个不同的词")
+    print(f"[定义] {len(usage.definitions)} 个 key，语言：{', '.join(languages)}\n")
+    lines_by_file: Dict[str, int] = defaultdict(int)
+    for key in dead:
+        for definition in usage.definitions[key]:
+            lines_by_file[definition.path] += 1
+    print(f"未引用的 key：{len(dead)} 个（共 {sum(lines_by_file.values())} 行）")
+    for path, count in sorted(lines_by_file.items(), key=lambda item: (-item[1], item[0]))[:10]:
+        print(f"  {count:>5}  {path}")
+    print(f"跨文件重复：{len(duplicates)} 处，其中取值冲突 {len(conflicts)} 处")
+    if usage.mislabeled:
+        print(f"文件头语言与文件名不一致：{len(usage.mislabeled)} 个文件（其中的 key 会载入到文件头所写的语言）")
+        for path, header, named in usage.mislabeled:
+            print(f"  l_{header}  {path}")
+    if not usage.has_vanilla:
+        print("\n[提示] 未找到原版游戏目录，覆盖原版文本的 key 也会显示为未引用")
+
+
+def print_duplicates(usage: Usage, conflicts_only: bool) -> int:
+    shown = 0
+    for (key, language), group in sorted(usage.duplicates().items()):
+        conflict = len({d.value for d in group}) > 1
+        if conflicts_only and not conflict:
+            continue
+        shown += 1
+        print(f"{key}  [{language}]{'  取值冲突' if conflict else ''}")
+        for definition in group:
+            print(f"    {definition.path}:{definition.line}  \"{definition.value}\"")
+    print(f"\n共 {shown} 处")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools loc-usage",
+        description="检查本地化 key 是否被脚本引用、是否跨文件重复，并清理未引用的 key。",
+    )
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存重新切分脚本文件")
+    sub = parser.add_subparsers(dest="command")
+    dead = sub.add_parser("dead", help="列出未引用的 key")
+    dead.add_argument("--file", help="只看文件名匹配该通配符的 key，如 00_character_names_dynamic_*")
+    duplicates = sub.add_parser("duplicates", help="列出同一语言中跨文件重复定义的 key")
+    duplicates.add_argument("--conflicts", action="store_true", help="只看取值不同的")
+    prune_parser = sub.add_parser("prune", help="从全部语言中删除未引用的 key（可用 tools undo 撤销）")
+    prune_parser.add_argument("--file", help="只清理文件名匹配该通配符的 key")
+    prune_parser.add_argument("--dry-run", action="store_true", help="只显示将删除的行数")
+    prune_parser.add_argument("--force", action="store_true", help="没有原版游戏目录时仍然清理")
+    args = parser.parse_args(argv)
+
+    usage, scanned, rescanned = analyze(rebuild=args.rebuild)
+
+    if args.command is None:
+        print_summary(usage, scanned, rescanned)
+        return 0
+
+    if args.command == "duplicates":
+        return print_duplicates(usage, args.conflicts)
+
+    keys = _filtered(usage, usage.dead, args.file)
+    if args.command == "dead":
+        for key in keys:
+            places = ", ".join(f"{d.path.rsplit('/', 1)[-1]}:{d.line}" for d in usage.definitions[key])
+            print(f"{key:<48} {places}")
+        print(f"\n共 {len(keys)} 个未引用的 key")
+        return 0
+
+    if not usage.has_vanilla and not args.force and not args.dry_run:
+        print("[错误] 未找到原版游戏目录，无法排除覆盖原版文本的 key；确认后使用 --force")
+        return 1
+    removed = prune(usage, set(keys), args.dry_run)
+    for path, count in sorted(removed.items()):
+        print(f"  {'将删除' if args.dry_run else '已删除'} {count:>5} 行  {path}")
+    print(f"\n[{'预览' if args.dry_run else '完成'}] {len(keys)} 个 key，{sum(removed.values())} 行，{len(removed)} 个文件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
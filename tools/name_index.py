@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标识符模糊搜索索引
+
+为 location / province / area / region、人物、王朝、国家 tag 以及本地化 key
+建立统一的名称索引，每个标识符同时以其英文、简体中文与日文本地化名称作为别名；
+docs/prefecture_to_location_mapping.csv 中的府名也作为对应 province 的别名。
+
+索引由两部分组成：
+    - n-gram 倒排表：拉丁字母按三元组、汉字按单字与二元组切分，用于容错的模糊匹配；
+    - 排序后的名称表：二分查找得到前缀匹配（相当于一棵压平的 trie）。
+构建结果按源文件的大小与修改时间缓存在 tools/.cache 中，热启动后查询只需几毫秒。
+
+用法：
+    python -m tools find 临江
+    python -m tools find jiangxi --kind area
+    python -m tools find eng_charles --prefix
+
+其他工具可调用 did_you_mean() 给出"您是否想找"提示。
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import pickle
+import re
+import sys
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from localization import LANGUAGES, language_of_path, localization_files, parse_localization
+from pop_rollup import build_geography
+from vfs import MOD_ROOT, VirtualFileSystem, cache_path, get_vfs
+
+CACHE_FILE = "name_index.pickle"
+CACHE_VERSION = 2
+
+DEFINITIONS_FILE = "in_game/map_data/definitions.txt"
+SETUP_DIR = "main_menu/setup/start"
+COUNTRY_SETUP_DIR = "in_game/setup/countries"
+PREFECTURE_CSV = MOD_ROOT / "docs" / "prefecture_to_location_mapping.csv"
+
+# 过长的本地化值（事件正文等）不作为别名
+MAX_ALIAS_LENGTH = 40
+FORMATTING_RE = re.compile(r"#[A-Za-z_]+\s|#!|\$[^$]*\$|\[[^\]]*\]")
+
+KINDS = ("region", "area", "province", "location", "country", "character", "dynasty", "loc")
+
+
+@dataclass
+class NameMatch:
+    identifier: str
+    kind: str
+    score: float
+    matched: str
+    aliases: Tuple[str, ...]
+
+
+def normalize(text: str) -> str:
+    """小写并把下划线视作空格，使 `charles stuart` 能匹配 `eng_charles_i_stuart`"""
+    return text.strip().lower().replace("_", " ")
+
+
+def _is_ascii(text: str) -> bool:
+    return text.isascii()
+
+
+def grams(text: str) -> Set[str]:
+    """拉丁字母用带边界的三元组，其他文字（汉字等）用单字与二元组"""
+    if not text:
+        return set()
+    if _is_ascii(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    result = set(text)
+    result.update(text[i:i + 2] for i in range(len(text) - 1))
+    return result
+
+
+class NameIndex:
+    def __init__(self) -> None:
+        # 条目：标识符、种类、别名
+        self.identifiers: List[str] = []
+        self.kinds: List[str] = []
+        self.aliases: List[List[str]] = []
+        self._entry_of: Dict[Tuple[str, str], int] = {}
+        # 名称（标识符或别名，已规范化）-> 条目
+        self.names: List[str] = []
+        self.name_entry = array("i")
+        self.gram_count = array("H")
+        self.postings: Dict[str, array] = {}
+        # 前缀查找用的排序表
+        self.sorted_names: List[str] = []
+        self.sorted_ids = array("i")
+
+    def add(self, identifier: str, kind: str, aliases: Iterable[str] = ()) -> int:
+        key = (identifier, kind)
+        entry = self._entry_of.get(key)
+        if entry is None:
+            entry = len(self.identifiers)
+            self._entry_of[key] = entry
+            self.identifiers.append(identifier)
+            self.kinds.append(kind)
+            self.aliases.append([])
+        for alias in aliases:
+            alias = alias.strip()
+            if alias and alias != identifier and alias not in self.aliases[entry]:
+                self.aliases[entry].append(alias)
+        return entry
+
+    def entry(self, identifier: str, kind: str) -> Optional[int]:
+        return self._entry_of.get((identifier, kind))
+
+    def finalize(self) -> None:
+        """生成 n-gram 倒排表与排序名称表"""
+        postings: Dict[str, List[int]] = defaultdict(list)
+        self.names = []
+        self.name_entry = array("i")
+        self.gram_count = array("H")
+        for entry, identifier in enumerate(self.identifiers):
+            seen = set()
+            for name in [identifier] + self.aliases[entry]:
+                norm = normalize(name)
+                if not norm or norm in seen:
+                    continue
+                seen.add(norm)
+                name_id = len(self.names)
+                self.names.append(norm)
+                self.name_entry.append(entry)
+                name_grams = grams(norm)
+                self.gram_count.append(min(len(name_grams), 65535))
+                for gram in name_grams:
+                    postings[gram].append(name_id)
+        self.postings = {gram: array("i", ids) for gram, ids in postings.items()}
+        order = sorted(range(len(self.names)), key=self.names.__getitem__)
+        self.sorted_names = [self.names[i] for i in order]
+        self.sorted_ids = array("i", order)
+
+    def _accept(self, entry: int, kinds: Optional[Set[str]]) -> bool:
+        return kinds is None or self.kinds[entry] in kinds
+
+    def prefix(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> List[NameMatch]:
+        """按前缀查找，结果按名称长度升序"""
+        kinds = set(kinds) if kinds else None
+        norm = normalize(query)
+        start = bisect.bisect_left(self.sorted_names, norm)
+        best: Dict[int, Tuple[float, str]] = {}
+        for position in range(start, len(self.sorted_names)):
+            name = self.sorted_names[position]
+            if not name.startswith(norm):
+                break
+            entry = self.name_entry[self.sorted_ids[position]]
+            if not self._accept(entry, kinds):
+                continue
+            score = len(norm) / len(name)
+            if entry not in best or score > best[entry][0]:
+                best[entry] = (score, name)
+        return self._ranked(best, limit)
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> List[NameMatch]:
+        """模糊查找：n-gram Dice 相似度，精确、前缀、子串匹配额外加分"""
+        kinds = set(kinds) if kinds else None
+        norm = normalize(query)
+        query_grams = grams(norm)
+        if not query_grams:
+            return []
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for name_id in self.postings.get(gram, ()):
+                shared[name_id] += 1
+        best: Dict[int, Tuple[float, str]] = {}
+        total = len(query_grams)
+        for name_id, count in shared.items():
+            entry = self.name_entry[name_id]
+            if not self._accept(entry, kinds):
+                continue
+            name = self.names[name_id]
+            score = 2.0 * count / (total + self.gram_count[name_id])
+            if name == norm:
+                score += 3.0
+            elif name.startswith(norm):
+                score += 1.0
+            elif norm in name:
+                score += 0.5
+            if entry not in best or score > best[entry][0]:
+                best[entry] = (score, name)
+        return self._ranked(best, limit)
+
+    def _ranked(self, best: Dict[int, Tuple[float, str]], limit: int) -> List[NameMatch]:
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], KINDS.index(self.kinds[item[0]]), self.identifiers[item[0]]))
+        return [
+            NameMatch(
+                identifier=self.identifiers[entry],
+                kind=self.kinds[entry],
+                score=score,
+                matched=name,
+                aliases=tuple(self.aliases[entry]),
+            )
+            for entry, (score, name) in ranked[:limit]
+        ]
+
+
+def _clean_alias(value: str) -> Optional[str]:
+    value = FORMATTING_RE.sub("", value).strip()
+    if not value or len(value) > MAX_ALIAS_LENGTH:
+        return None
+    return value
+
+
+def _top_level_keys(vfs: VirtualFileSystem, logical: str, container: str) -> List[str]:
+    document = vfs.parse(logical)
+    keys = []
+    for entry in document:
+        if entry.key == container and entry.is_block:
+            block = entry.value
+            # 10_countries.txt 为 countries = { countries = { TAG = {...} } }
+            inner = block.get(container)
+            if container == "countries" and inner is not None and hasattr(inner, "entries"):
+                block = inner
+            keys.extend(child.key for child in block if child.is_block and child.key)
+    return keys
+
+
+def _setup_files(vfs: VirtualFileSystem, prefix: str) -> List[str]:
+    return [p for p in vfs.listdir(SETUP_DIR, (".txt",)) if p.rsplit("/", 1)[-1].startswith(prefix)]
+
+
+def source_files(vfs: VirtualFileSystem) -> List[str]:
+    files = []
+    if vfs.exists(DEFINITIONS_FILE):
+        files.append(DEFINITIONS_FILE)
+    files.extend(_setup_files(vfs, "04_"))
+    files.extend(_setup_files(vfs, "05_"))
+    files.extend(_setup_files(vfs, "10_"))
+    files.extend(vfs.listdir(COUNTRY_SETUP_DIR, (".txt",)))
+    files.extend(localization_files(vfs, LANGUAGES))
+    return files
+
+
+def source_signature(vfs: VirtualFileSystem, files: Sequence[str]) -> Tuple:
+    signature = []
+    for logical in files:
+        stat = vfs.stat(logical)
+        signature.append((logical, stat.st_size, stat.st_mtime_ns))
+    if PREFECTURE_CSV.exists():
+        stat = PREFECTURE_CSV.stat()
+        signature.append((str(PREFECTURE_CSV), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def build_index(vfs: VirtualFileSystem, files: Sequence[str]) -> NameIndex:
+    index = NameIndex()
+
+    if DEFINITIONS_FILE in files:
+        parents = build_geography(vfs.parse(DEFINITIONS_FILE))
+        for location, (province, area, region) in parents.items():
+            index.add(location, "location")
+            for kind, name in (("province", province), ("area", area), ("region", region)):
+                if name:
+                    index.add(name, kind)
+
+    if PREFECTURE_CSV.exists():
+        with open(PREFECTURE_CSV, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                index.add(row["Province"], "province", [row["Prefecture"]])
+
+    for logical in files:
+        name = logical.rsplit("/", 1)[-1]
+        if logical.startswith(SETUP_DIR):
+            if name.startswith("04_"):
+                for key in _top_level_keys(vfs, logical, "dynasty_manager"):
+                    index.add(key, "dynasty")
+            elif name.startswith("05_"):
+                for key in _top_level_keys(vfs, logical, "character_db"):
+                    index.add(key, "character")
+            elif name.startswith("10_"):
+                for key in _top_level_keys(vfs, logical, "countries"):
+                    index.add(key, "country")
+        elif logical.startswith(COUNTRY_SETUP_DIR):
+            for entry in vfs.parse(logical):
+                if entry.key and entry.is_block:
+                    index.add(entry.key, "country")
+
+    # 本地化：已知标识符添加别名，其余 key 作为 loc 条目
+    by_identifier: Dict[str, List[int]] = defaultdict(list)
+    for entry, identifier in enumerate(index.identifiers):
+        by_identifier[identifier].append(entry)
+    for logical in files:
+        if language_of_path(logical) not in LANGUAGES:
+            continue
+        for loc in parse_localization(vfs.read_text(logical)).entries:
+            alias = _clean_alias(loc.value)
+            targets = by_identifier.get(loc.key)
+            if targets:
+                for entry in targets:
+                    index.add(index.identifiers[entry], index.kinds[entry], [alias] if alias else [])
+            else:
+                entry = index.add(loc.key, "loc", [alias] if alias else [])
+                by_identifier[loc.key].append(entry)
+
+    index.finalize()
+    return index
+
+
+_INDEX: Optional[NameIndex] = None
+
+
+def get_index(vfs: Optional[VirtualFileSystem] = None, rebuild: bool = False) -> NameIndex:
+    """读取缓存的索引；源文件有变化时重新构建"""
+    global _INDEX
+    if _INDEX is not None and not rebuild:
+        return _INDEX
+    vfs = vfs or get_vfs()
+    files = source_files(vfs)
+    signature = source_signature(vfs, files)
+    path = cache_path(CACHE_FILE)
+    if not rebuild:
+        try:
+            with open(path, "rb") as f:
+                version, cached_signature, index = pickle.load(f)
+            if version == CACHE_VERSION and cached_signature == signature:
+                _INDEX = index
+                return index
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            pass
+    index = build_index(vfs, files)
+    with open(path, "wb") as f:
+        pickle.dump((CACHE_VERSION, signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+    _INDEX = index
+    return index
+
+
+def find(query: str, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> List[NameMatch]:
+    return get_index().search(query, kinds, limit)
+
+
+def did_you_mean(name: str, kinds: Optional[Iterable[str]] = None, limit: int = 5) -> List[str]:
+    """给出与 name 最接近的若干标识符"""
+    return [match.identifier for match in find(name, kinds, limit)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools find",
+        description="按标识符或中英文名称模糊查找 location/area/region/人物等。",
+    )
+    parser.add_argument("query", help="查询文本，如 临江、jiangxi、eng_charles")
+    parser.add_argument("--kind", action="append", choices=KINDS, help="只查找指定种类（可重复）")
+    parser.add_argument("--prefix", action="store_true", help="只做前缀匹配")
+    parser.add_argument("--limit", type=int, default=10, help="最多显示的结果数")
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存重新构建索引")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    index = get_index(rebuild=args.rebuild)
+    loaded = time.perf_counter()
+    if args.prefix:
+        matches = index.prefix(args.query, args.kind, args.limit)
+    else:
+        matches = index.search(args.query, args.kind, args.limit)
+    finished = time.perf_counter()
+
+    for match in matches:
+        aliases = " / ".join(match.aliases[:3])
+        print(f"{match.score:5.2f}  {match.kind:<9} {match.identifier:<36} {aliases}")
+    if not matches:
+        print("未找到匹配项")
+    print(
+        f"\n索引 {len(index.identifiers)} 个条目（加载 {(loaded - started) * 1000:.1f} ms，"
+        f"查询 {(finished - loaded) * 1000:.2f} ms）"
+    )
+    return 0 if matches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
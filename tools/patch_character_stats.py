@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+人物三围批量回填
+
+docs/eu5_1644人物三围 v0.1 / v0.2.xlsx 中是修订后的 adm / dip / mil，
+对应的人物已经手写在 05_characters.txt 等文件里（不是 convert_characters 的输出）。
+本工具按表中 script 列的人物标识符，在 mod 的全部 05_* 文件中建立
+"标识符 -> 人物块" 索引，只改写每个人物块内 adm / dip / mil 的值：
+
+- 已有的字段只替换值本身，行尾注释、缩进与字段顺序保持不变；
+- 缺少的字段追加在已有三围字段之后；三项都没有时在 religion（或 culture、
+  first_name）所在行之后新起一行 `adm = .. dip = .. mil = ..`；
+- 其余内容按偏移逐段原样写出，git diff 中只出现真正改动的行。
+
+表中留空的单元格不修改；多个表格按命令行顺序读取，后面的覆盖前面的。
+没有 script 列、或标识符在 05_* 中找不到的行列在汇总中。
+
+用法：
+    python -m tools patch-stats --dry-run            # 只列出会改动的人物
+    python -m tools patch-stats                      # 写回 05_* 文件
+    python -m tools patch-stats "docs/eu5_1644人物三围 v0.2.xlsx"
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pdx_script import Block, Entry
+from pdx_writer import atomic_write
+from vfs import MOD_ROOT, VirtualFileSystem, get_vfs
+from workbook_cache import open_workbook
+
+DEFAULT_INPUTS = [
+    MOD_ROOT / "docs" / "eu5_1644人物三围 v0.1.xlsx",
+    MOD_ROOT / "docs" / "eu5_1644人物三围 v0.2.xlsx",
+]
+SETUP_DIR = "main_menu/setup/start"
+CHARACTER_FILE_PREFIX = "05_"
+CONTAINER = "character_db"
+
+STATS = ("adm", "dip", "mil")
+STAT_RANGE = (0, 100)
+NAME_HEADER = "人名"
+ID_HEADER = "script"
+# 没有三围字段时，新行插在这些字段之后（按优先级）
+ANCHOR_KEYS = ("religion", "culture", "last_name", "first_name")
+# 表头所在行最多出现在前几行
+HEADER_SCAN_ROWS = 5
+
+_HEADER_RE = re.compile(r"[a-z_]+")
+
+
+@dataclass
+class StatRow:
+    source: str
+    row: int
+    name: str
+    identifier: Optional[str]
+    stats: Dict[str, int]
+
+    @property
+    def label(self) -> str:
+        return f"{self.source} 第 {self.row} 行（{self.name or '无名'}）"
+
+
+@dataclass
+class CharacterRef:
+    logical: str
+    entry: Entry
+
+
+@dataclass
+class Change:
+    identifier: str
+    logical: str
+    line: int
+    before: Dict[str, Optional[str]]
+    after: Dict[str, int]
+
+    def describe(self) -> str:
+        parts = [
+            f"{stat} {self.before.get(stat) or '-'}→{value}"
+            for stat, value in self.after.items()
+            if self.before.get(stat) != str(value)
+        ]
+        return "  ".join(parts)
+
+
+@dataclass
+class PatchPlan:
+    # logical -> [(start, end, 替换内容)]
+    edits: Dict[str, List[Tuple[int, int, bytes]]] = field(default_factory=dict)
+    changes: List[Change] = field(default_factory=list)
+    unchanged: int = 0
+    unmatched: List[StatRow] = field(default_factory=list)
+    duplicates: Dict[str, int] = field(default_factory=dict)
+
+
+# ---- 读取表格 ----
+
+def _header_key(value: Any) -> Optional[str]:
+    """`adm(行政)` -> adm；中文表头原样返回"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if text == NAME_HEADER:
+        return text
+    match = _HEADER_RE.match(text)
+    return match.group() if match else None
+
+
+def _stat_value(value: Any) -> Optional[int]:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"三围必须是整数：{value}")
+    number = int(number)
+    low, high = STAT_RANGE
+    if not low <= number <= high:
+        raise ValueError(f"三围超出 {low}-{high}：{value}")
+    return number
+
+
+def parse_rows(rows: Iterable[Sequence[Any]], source: str) -> Tuple[List[StatRow], List[str]]:
+    """表头可能占两行（第一行"人名"、第二行 adm/dip/mil/script），自动定位"""
+    rows = iter(rows)
+    columns: Dict[str, int] = {}
+    number = 0
+    for raw in rows:
+        number += 1
+        for index, value in enumerate(raw):
+            key = _header_key(value)
+            if key and key not in columns:
+                columns[key] = index
+        if all(stat in columns for stat in STATS):
+            break
+        if number >= HEADER_SCAN_ROWS:
+            raise ValueError(f"{source}：前 {HEADER_SCAN_ROWS} 行中找不到 adm / dip / mil 表头")
+    else:
+        raise ValueError(f"{source}：找不到 adm / dip / mil 表头")
+
+    def cell(raw: Sequence[Any], key: str) -> Any:
+        index = columns.get(key)
+        return raw[index] if index is not None and index < len(raw) else None
+
+    records: List[StatRow] = []
+    errors: List[str] = []
+    for raw in rows:
+        number += 1
+        name = str(cell(raw, NAME_HEADER) or "").strip()
+        identifier = str(cell(raw, ID_HEADER) or "").strip() or None
+        try:
+            stats = {stat: _stat_value(cell(raw, stat)) for stat in STATS}
+        except ValueError as e:
+            errors.append(f"{source} 第 {number} 行（{name or identifier}）：{e}")
+            continue
+        stats = {stat: value for stat, value in stats.items() if value is not None}
+        if stats:
+            records.append(StatRow(source, number, name, identifier, stats))
+    return records, errors
+
+
+def read_workbook(path: Path) -> Tuple[List[StatRow], List[str]]:
+    return parse_rows(open_workbook(path).active.rows(), path.name)
+
+
+def merge_rows(tables: Iterable[List[StatRow]]) -> Tuple[Dict[str, StatRow], List[StatRow]]:
+    """标识符 -> 最后一次出现的行；没有标识符的行单独返回"""
+    by_identifier: Dict[str, StatRow] = {}
+    anonymous: List[StatRow] = []
+    for rows in tables:
+        for row in rows:
+            if row.identifier:
+                by_identifier[row.identifier] = row
+            else:
+                anonymous.append(row)
+    return by_identifier, anonymous
+
+
+# ---- 人物索引 ----
+
+def character_files(vfs: VirtualFileSystem) -> List[str]:
+    """mod 层中的 05_* 文件（只有 mod 中的文件可以改写）"""
+    mod = vfs.mod_layer
+    return [
+        logical for logical in vfs.listdir(SETUP_DIR, (".txt",))
+        if logical.rsplit("/", 1)[-1].startswith(CHARACTER_FILE_PREFIX) and mod.has_file(logical)
+    ]
+
+
+def build_character_index(vfs: VirtualFileSystem, files: Iterable[str]) -> Dict[str, List[CharacterRef]]:
+    index: Dict[str, List[CharacterRef]] = {}
+    for logical in files:
+        document = vfs.mod_layer.tree(logical)
+        for container in document.get_all(CONTAINER):
+            if not isinstance(container, Block):
+                continue
+            for entry in container:
+                if entry.is_block and entry.key:
+                    index.setdefault(entry.key, []).append(CharacterRef(logical, entry))
+    return index
+
+
+# ---- 生成改动 ----
+
+def _line_end(source: bytes, offset: int) -> int:
+    """offset 所在行换行符之后的位置"""
+    newline = source.find(b"\n", offset)
+    return len(source) if newline < 0 else newline + 1
+
+
+def _indent_of(source: bytes, offset: int) -> bytes:
+    line_start = source.rfind(b"\n", 0, offset) + 1
+    match = re.match(rb"[ \t]*", source[line_start:offset])
+    return match.group()
+
+
+def _newline_of(source: bytes, offset: int) -> bytes:
+    end = source.find(b"\n", offset)
+    return b"\r\n" if end > 0 and source[end - 1:end] == b"\r" else b"\n"
+
+
+def _pairs(stats: Dict[str, int], keys: Iterable[str]) -> bytes:
+    return " ".join(f"{key} = {stats[key]}" for key in keys).encode("ascii")
+
+
+def block_edits(source: bytes, entry: Entry, stats: Dict[str, int]) -> List[Tuple[int, int, bytes]]:
+    """一个人物块内需要的最小改动"""
+    block = entry.value
+    edits: List[Tuple[int, int, bytes]] = []
+    present: List[Entry] = []
+    missing: List[str] = []
+    for stat in STATS:
+        if stat not in stats:
+            continue
+        found = block.find(stat)
+        if found is None or isinstance(found.value, Block):
+            missing.append(stat)
+            continue
+        present.append(found)
+        new = str(stats[stat])
+        if found.value != new:
+            edits.append((found.end - len(found.value.encode("utf-8")), found.end, new.encode("ascii")))
+    if not missing:
+        return edits
+
+    inserted = _pairs(stats, missing)
+    if present:
+        # 追加在最后一个已有三围字段之后（同一行，位于行尾注释之前）
+        last = max(present, key=lambda e: e.end)
+        edits.append((last.end, last.end, b" " + inserted))
+        return edits
+
+    anchor = next((block.find(key) for key in ANCHOR_KEYS if block.find(key) is not None), None)
+    first = block.entries[0] if block.entries else None
+    if b"\n" not in source[block.start:block.end]:
+        # 单行人物块：插在 `}` 之前
+        close = block.end - 1
+        edits.append((close, close, inserted + b" "))
+        return edits
+    position = _line_end(source, anchor.end if anchor is not None else block.start)
+    if position >= block.end:
+        position = block.end - 1
+    if first is not None:
+        indent = _indent_of(source, first.start)
+    else:
+        indent = _indent_of(source, entry.start) + b"\t"
+    edits.append((position, position, indent + inserted + _newline_of(source, block.start)))
+    return edits
+
+
+def plan_patch(
+    rows: Dict[str, StatRow],
+    index: Dict[str, List[CharacterRef]],
+    sources: Dict[str, bytes],
+) -> PatchPlan:
+    plan = PatchPlan()
+    for identifier, row in rows.items():
+        refs = index.get(identifier)
+        if not refs:
+            plan.unmatched.append(row)
+            continue
+        if len(refs) > 1:
+            plan.duplicates[identifier] = len(refs)
+        for ref in refs:
+            edits = block_edits(sources[ref.logical], ref.entry, row.stats)
+            if not edits:
+                plan.unchanged += 1
+                continue
+            block = ref.entry.value
+            before = {}
+            for stat in row.stats:
+                found = block.find(stat)
+                before[stat] = found.value if found is not None and not found.is_block else None
+            plan.edits.setdefault(ref.logical, []).extend(edits)
+            plan.changes.append(Change(identifier, ref.logical, ref.entry.line, before, row.stats))
+    return plan
+
+
+def apply_edits(source: bytes, edits: List[Tuple[int, int, bytes]], sink) -> None:
+    """按偏移顺序写出：未改动的部分原样分段写入"""
+    position = 0
+    for start, end, data in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        sink.write(source[position:start])
+        sink.write(data)
+        position = end
+    sink.write(source[position:])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools patch-stats",
+        description="按三围表格原地改写 05_* 中人物的 adm / dip / mil。",
+    )
+    parser.add_argument("inputs", nargs="*", type=Path, help="三围表格（默认 docs 中的 v0.1 与 v0.2，后者优先）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出会改动的人物，不写文件")
+    parser.add_argument("--limit", type=int, default=50, help="最多列出多少条改动（默认 50，0 表示全部）")
+    args = parser.parse_args(argv)
+
+    inputs = args.inputs or [path for path in DEFAULT_INPUTS if path.exists()]
+    if not inputs:
+        print("[错误] 没有找到三围表格")
+        return 1
+    tables: List[List[StatRow]] = []
+    for path in inputs:
+        try:
+            rows, errors = read_workbook(path)
+        except (OSError, ValueError) as e:
+            print(f"[错误] {path}: {e}")
+            return 1
+        for error in errors:
+            print(f"[跳过] {error}")
+        tables.append(rows)
+    rows_by_id, anonymous = merge_rows(tables)
+
+    vfs = get_vfs()
+    files = character_files(vfs)
+    index = build_character_index(vfs, files)
+    sources = {logical: vfs.mod_layer.tree(logical).source for logical in files}
+    plan = plan_patch(rows_by_id, index, sources)
+
+    shown = plan.changes if args.limit <= 0 else plan.changes[:args.limit]
+    for change in shown:
+        print(f"{change.identifier:<40} {change.describe():<36} {change.logical.rsplit('/', 1)[-1]}:{change.line}")
+    if len(shown) < len(plan.changes):
+        print(f"……另有 {len(plan.changes) - len(shown)} 个人物未列出")
+    for row in plan.unmatched:
+        from name_index import did_you_mean
+        hint = "、".join(did_you_mean(row.identifier, ["character"], 3))
+        print(f"[找不到] {row.label}：{row.identifier}" + (f"（您是否想找：{hint}）" if hint else ""))
+    for identifier, count in sorted(plan.duplicates.items()):
+        print(f"[重复定义] {identifier} 在 05_* 中定义了 {count} 次，全部改写")
+
+    print(
+        f"\n表格 {sum(len(rows) for rows in tables)} 行：改动 {len(plan.changes)} 个人物，"
+        f"已一致 {plan.unchanged} 个，找不到 {len(plan.unmatched)} 个，"
+        f"没有 script 标识符 {len(anonymous)} 行"
+    )
+    if args.dry_run or not plan.edits:
+        return 0
+
+    for logical, edits in plan.edits.items():
+        with atomic_write(vfs.mod_path(logical)) as f:
+            apply_edits(sources[logical], edits, f)
+        vfs.invalidate(logical)
+        print(f"[已写入] {logical}（{len(edits)} 处）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDX 脚本解析器
+
+把 EU5 的 `key = value` / `key = { ... }` 脚本解析成 Block/Entry 树。
+解析直接在字节流上进行，因此每个 Entry 都带有准确的字节偏移（start/end）
+与起始行号，方便后续按偏移原地改写文件。
+
+解析是宽松的：多余的 `}`、未闭合的块等问题不会抛异常，而是记录在
+Document.errors 中，交由调用方决定如何处理。
+
+dump_preserving() 按树中的 key/运算符/值重新写出文件，只有空白与注释
+取自原文，因此"解析 -> 写回"逐字节相同即证明解析树没有丢失任何内容。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterator, List, Optional, Tuple, Union
+
+BOM = b"\xef\xbb\xbf"
+
+_TOKEN_RE = re.compile(
+    rb"""
+      (?P<ws>[ \t\r\n]+)
+    | (?P<comment>\#[^\n]*)
+    | (?P<string>"(?:[^"\\]|\\.)*"|"[^\n]*)
+    | (?P<op>[<>!?]=|==|[={}<>])
+    | (?P<word>(?:[^\s={}<>"\#!?]|[!?](?!=))+)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# 令牌种类
+WORD = "word"
+STRING = "string"
+OPEN = "{"
+CLOSE = "}"
+OP = "op"
+OTHER = "other"
+
+# 空白与注释（写回时原样保留的部分）
+TRIVIA_RE = re.compile(rb"(?:[ \t\r\n]+|\#[^\n]*)*")
+
+Value = Union[str, "Block"]
+Token = Tuple[str, str, int, int, int]
+
+
+class Entry:
+    """块中的一个条目：`key op value`，或列表里的裸值（key 为 None）"""
+
+    __slots__ = ("key", "op", "value", "line", "start", "end")
+
+    def __init__(
+        self,
+        key: Optional[str],
+        op: Optional[str],
+        value: Value,
+        line: int,
+        start: int,
+        end: int,
+    ):
+        self.key = key
+        self.op = op
+        self.value = value
+        self.line = line
+        self.start = start
+        self.end = end
+
+    @property
+    def is_block(self) -> bool:
+        return isinstance(self.value, Block)
+
+    def __repr__(self) -> str:
+        if self.key is None:
+            return f"Entry({self.value!r})"
+        return f"Entry({self.key} {self.op} {self.value!r})"
+
+
+class Block:
+    """`{ ... }` 块；tag 记录 `rgb { ... }` 这类带前缀的块"""
+
+    __slots__ = ("entries", "tag", "start", "end", "closed")
+
+    def __init__(self, tag: Optional[str] = None, start: int = 0, end: int = 0):
+        self.entries: List[Entry] = []
+        self.tag = tag
+        self.start = start
+        self.end = end
+        self.closed = True
+
+    def __iter__(self) -> Iterator[Entry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return any(entry.key == key for entry in self.entries)
+
+    def __getitem__(self, key: str) -> Value:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Optional[Value] = None) -> Optional[Value]:
+        """返回 key 最后一次出现的值（与游戏中后写覆盖前写的规则一致）"""
+        for entry in reversed(self.entries):
+            if entry.key == key:
+                return entry.value
+        return default
+
+    def get_all(self, key: str) -> List[Value]:
+        return [entry.value for entry in self.entries if entry.key == key]
+
+    def find(self, key: str) -> Optional[Entry]:
+        for entry in reversed(self.entries):
+            if entry.key == key:
+                return entry
+        return None
+
+    def items(self) -> Iterator[Tuple[str, Value]]:
+        for entry in self.entries:
+            if entry.key is not None:
+                yield entry.key, entry.value
+
+    def values(self) -> List[Value]:
+        """列表形式块中的裸值，如 `{ name_an name_bai }`"""
+        return [entry.value for entry in self.entries if entry.key is None]
+
+    def __repr__(self) -> str:
+        prefix = f"{self.tag} " if self.tag else ""
+        return f"{prefix}Block({len(self.entries)} entries)"
+
+
+class Document(Block):
+    """文件根块，额外记录原文、BOM 与解析过程中发现的问题"""
+
+    __slots__ = ("bom", "errors", "source", "stray")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.bom = False
+        self.errors: List[str] = []
+        self.source = b""
+        # 无法归入树中的令牌（多余的 `}`、孤立运算符等）的字节区间
+        self.stray: List[Tuple[int, int]] = []
+
+
+def unquote(value: Value) -> Value:
+    """去掉字符串两端的引号；块原样返回"""
+    if isinstance(value, str) and len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def tokenize(data: bytes, offset: int = 0, end: Optional[int] = None, line: int = 1) -> List[Token]:
+    """切分有效令牌（跳过空白与注释），返回 (kind, text, start, end, line)
+
+    end 限定只切分 data[offset:end]，line 为 offset 处的行号；data 也可以是 mmap。
+    """
+    tokens: List[Token] = []
+    append = tokens.append
+    for match in _TOKEN_RE.finditer(data, offset, len(data) if end is None else end):
+        kind = match.lastgroup
+        if kind == "ws":
+            line += match.group().count(b"\n")
+            continue
+        if kind == "comment":
+            continue
+        text = match.group()
+        start, end = match.span()
+        if kind == "op":
+            if text == b"{":
+                append((OPEN, "{", start, end, line))
+            elif text == b"}":
+                append((CLOSE, "}", start, end, line))
+            else:
+                append((OP, text.decode("ascii"), start, end, line))
+        elif kind == STRING:
+            append((STRING, text.decode("utf-8", "replace"), start, end, line))
+            line += text.count(b"\n")
+        elif kind == OTHER:
+            append((OTHER, text.decode("utf-8", "replace"), start, end, line))
+        else:
+            append((WORD, text.decode("utf-8", "replace"), start, end, line))
+    return tokens
+
+
+def comments(data: bytes) -> List[bytes]:
+    """按出现顺序返回全部注释（含 `#`，去掉行尾空白）；字符串中的 `#` 不算注释"""
+    return [match.group().rstrip() for match in _TOKEN_RE.finditer(data) if match.lastgroup == "comment"]
+
+
+def parse_bytes(data: bytes) -> Document:
+    """解析字节流，返回根 Document"""
+    document = Document()
+    document.source = data
+    offset = 0
+    if data.startswith(BOM):
+        document.bom = True
+        offset = len(BOM)
+    document.start = offset
+    document.end = len(data)
+    _build(document, tokenize(data, offset), len(data))
+    return document
+
+
+def parse_span(data: bytes, start: int, end: int, line: int = 1) -> Document:
+    """只解析 data[start:end]（data 可以是 mmap），Entry 的偏移与行号仍是整个文件中的值"""
+    document = Document()
+    document.source = data
+    document.start = start
+    document.end = end
+    _build(document, tokenize(data, start, end, line), end)
+    return document
+
+
+def _build(document: Document, tokens: List[Token], data_end: int) -> None:
+    """由令牌序列建立 document 下的树"""
+    count = len(tokens)
+    block: Block = document
+    # 栈中保存 (外层块, 当前块对应的 Entry)
+    stack: List[Tuple[Block, Entry]] = []
+    i = 0
+    while i < count:
+        kind, text, start, end, line = tokens[i]
+
+        if kind == CLOSE:
+            if not stack:
+                document.errors.append(f"第 {line} 行：多余的 '}}'")
+                document.stray.append((start, end))
+            else:
+                block.end = end
+                parent, entry = stack.pop()
+                entry.end = end
+                block = parent
+            i += 1
+            continue
+
+        if kind == OPEN:
+            child = Block(start=start)
+            entry = Entry(None, None, child, line, start, end)
+            block.entries.append(entry)
+            stack.append((block, entry))
+            block = child
+            i += 1
+            continue
+
+        if kind == OP or kind == OTHER:
+            document.errors.append(f"第 {line} 行：无法识别的 '{text}'")
+            document.stray.append((start, end))
+            i += 1
+            continue
+
+        nxt = tokens[i + 1][0] if i + 1 < count else None
+        if nxt == OP:
+            op = tokens[i + 1][1]
+            if i + 2 >= count:
+                document.errors.append(f"第 {line} 行：'{text} {op}' 缺少值")
+                document.stray.append((start, tokens[i + 1][3]))
+                break
+            vkind, vtext, vstart, vend, _ = tokens[i + 2]
+            if vkind == OPEN:
+                child = Block(start=vstart)
+                entry = Entry(text, op, child, line, start, vend)
+                block.entries.append(entry)
+                stack.append((block, entry))
+                block = child
+                i += 3
+            elif vkind == WORD and i + 3 < count and tokens[i + 3][0] == OPEN:
+                child = Block(tag=vtext, start=tokens[i + 3][2])
+                entry = Entry(text, op, child, line, start, tokens[i + 3][3])
+                block.entries.append(entry)
+                stack.append((block, entry))
+                block = child
+                i += 4
+            elif vkind in (WORD, STRING):
+                block.entries.append(Entry(text, op, vtext, line, start, vend))
+                i += 3
+            else:
+                document.errors.append(f"第 {line} 行：'{text} {op}' 缺少值")
+                document.stray.append((start, tokens[i + 1][3]))
+                i += 2
+            continue
+
+        if kind == WORD and nxt == OPEN:
+            # 列表中的带前缀块，如 `rgb { 1 2 3 }`
+            open_start, open_end = tokens[i + 1][2], tokens[i + 1][3]
+            child = Block(tag=text, start=open_start)
+            entry = Entry(None, None, child, line, start, open_end)
+            block.entries.append(entry)
+            stack.append((block, entry))
+            block = child
+            i += 2
+            continue
+
+        block.entries.append(Entry(None, None, text, line, start, end))
+        i += 1
+
+    if stack:
+        document.errors.append(f"文件结束时仍有 {len(stack)} 个块未闭合")
+        while stack:
+            block.end = data_end
+            block.closed = False
+            parent, entry = stack.pop()
+            entry.end = data_end
+            block = parent
+
+
+def parse_text(text: str) -> Document:
+    return parse_bytes(text.encode("utf-8"))
+
+
+def parse_file(path) -> Document:
+    with open(path, "rb") as f:
+        return parse_bytes(f.read())
+
+
+class RoundTripError(ValueError):
+    """写回时发现解析树与原文对不上"""
+
+
+class _PreservingWriter:
+    def __init__(self, document: Document):
+        self.source = document.source
+        self.stray = sorted(document.stray)
+        self.out: List[bytes] = []
+        self.pos = len(BOM) if document.bom else 0
+
+    def gap(self, end: int) -> None:
+        """输出 [pos, end) 之间的原文，这段只允许是空白、注释或已记录的杂散令牌"""
+        if end < self.pos:
+            raise RoundTripError(f"偏移 {end} 早于当前写入位置 {self.pos}")
+        chunk_start = self.pos
+        for stray_start, stray_end in self.stray:
+            if stray_end <= chunk_start or stray_start >= end:
+                continue
+            self._check_trivia(chunk_start, stray_start)
+            chunk_start = stray_end
+        self._check_trivia(chunk_start, end)
+        self.out.append(self.source[self.pos:end])
+        self.pos = end
+
+    def _check_trivia(self, start: int, end: int) -> None:
+        if start >= end:
+            return
+        match = TRIVIA_RE.match(self.source, start, end)
+        if match.end() != end:
+            raise RoundTripError(f"偏移 {match.end()} 处有未进入解析树的内容")
+
+    def emit(self, text: str, start: int) -> None:
+        self.gap(start)
+        data = text.encode("utf-8")
+        self.out.append(data)
+        self.pos = start + len(data)
+
+    def next_token(self) -> int:
+        return TRIVIA_RE.match(self.source, self.pos).end()
+
+    def block(self, block: "Block") -> None:
+        self.emit("{", block.start)
+        for entry in block.entries:
+            self.entry(entry)
+        if block.closed:
+            self.emit("}", block.end - 1)
+
+    def entry(self, entry: Entry) -> None:
+        value = entry.value
+        if entry.key is not None:
+            self.emit(entry.key, entry.start)
+            self.emit(entry.op, self.next_token())
+            if isinstance(value, Block):
+                if value.tag:
+                    self.emit(value.tag, self.next_token())
+                self.block(value)
+            else:
+                self.emit(value, entry.end - len(value.encode("utf-8")))
+        elif isinstance(value, Block):
+            if value.tag:
+                self.emit(value.tag, entry.start)
+            self.block(value)
+        else:
+            self.emit(value, entry.start)
+
+
+def dump_preserving(document: Document) -> bytes:
+    """保留原有格式写回：结构取自解析树，空白与注释取自原文"""
+    writer = _PreservingWriter(document)
+    for entry in document.entries:
+        writer.entry(entry)
+    writer.gap(len(document.source))
+    prefix = BOM if document.bom else b""
+    return prefix + b"".join(writer.out)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDX 脚本流式序列化
+
+所有生成脚本的工具共用同一套规范格式：
+
+- 制表符缩进，`key = value`；多行块写成 `key = {` ... `}`；
+- INLINE_KEYS 中的块（define_pop）写成制表符对齐的单行：
+      define_pop = {	type = peasants	size = 27.900	culture = x	religion = y }
+- 纯值列表（如 definitions.txt 中的 location 列表）总是写成单行 `{ a b c }`；
+- 其他只含标量、单行不超过 INLINE_WIDTH 列的块写成 `first_name = { name = name_x }`；
+- Python float 按 precision 位小数输出；从已有文件读入的值保持原文写法。
+
+ScriptWriter 逐节点写入带缓冲的二进制流，不在内存中拼接整份输出。
+写回解析树时，原文中的注释与空行（连续空行合并为一行）会被保留。
+
+用法：
+    python -m tools fmt main_menu/setup/start/06_pops.txt
+    python -m tools fmt --check main_menu/setup     # 只检查，有需要格式化的文件时返回码为 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import re
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from pdx_script import BOM, Block, Document, Entry, comments, parse_bytes
+
+DEFAULT_PRECISION = 3
+INLINE_KEYS = {"define_pop"}
+INLINE_WIDTH = 80
+TAB_WIDTH = 4
+BUFFER_SIZE = 1 << 16
+FMT_SUFFIXES = (".txt",)
+
+# 空白中需要关心的部分：换行与注释
+_TRIVIA_ITEM_RE = re.compile(rb"\n|#[^\n]*")
+
+Scalar = Union[str, int, float, bool]
+Field = Union[Tuple[Optional[str], Scalar], Scalar]
+# 写解析树时的钩子：返回 True 表示条目已由调用方写出
+Visitor = Callable[["ScriptWriter", Entry], bool]
+
+
+class ScriptWriter:
+    """把节点按规范格式写入二进制流"""
+
+    def __init__(
+        self,
+        sink: BinaryIO,
+        precision: int = DEFAULT_PRECISION,
+        bom: bool = False,
+        depth: int = 0,
+    ):
+        """depth 为起始缩进层数：只写出外层块中的一段（如 character_db 中的一个人物）时使用"""
+        self.sink = sink
+        self.precision = precision
+        self.depth = depth
+        self._base_depth = depth
+        self._line_open = False
+        # 上一行的种类：start / open / close / line，用于避免多余的空行
+        self._last = "start"
+        # 空行延迟到下一行写出时才输出，块末尾与文件末尾的空行因此被丢弃
+        self._blank_pending = False
+        if bom:
+            sink.write(BOM)
+
+    # ---- 基本输出 ----
+
+    def _line(self, text: str, kind: str = "line") -> None:
+        if self._line_open:
+            self.sink.write(b"\n")
+        if self._blank_pending and kind != "close":
+            self.sink.write(b"\n")
+        self._blank_pending = False
+        self.sink.write(("\t" * self.depth + text).encode("utf-8"))
+        self._line_open = True
+        self._last = kind
+
+    def finish(self) -> None:
+        if self._line_open:
+            self.sink.write(b"\n")
+            self._line_open = False
+        self.sink.flush()
+
+    def format_value(self, value: Scalar) -> str:
+        if isinstance(value, bool):
+            return "yes" if value else "no"
+        if isinstance(value, float):
+            return f"{value:.{self.precision}f}"
+        return str(value)
+
+    def _pair(self, key: Optional[str], value: Scalar, op: str = "=") -> str:
+        if key is None:
+            return self.format_value(value)
+        return f"{key} {op} {self.format_value(value)}"
+
+    @staticmethod
+    def _prefix(key: Optional[str], op: Optional[str], tag: Optional[str]) -> str:
+        prefix = f"{key} {op or '='} " if key is not None else ""
+        return f"{prefix}{tag} " if tag else prefix
+
+    # ---- 生成器使用的接口 ----
+
+    def field(self, key: str, value: Scalar, op: str = "=") -> None:
+        self._line(self._pair(key, value, op))
+
+    def value(self, value: Scalar) -> None:
+        self._line(self.format_value(value))
+
+    def comment(self, text: str = "") -> None:
+        self._line(f"# {text}" if text else "#")
+
+    def blank(self) -> None:
+        """空行；紧跟在块开头、或位于块末尾时忽略，连续多个只保留一个"""
+        if self._last not in ("start", "open"):
+            self._blank_pending = True
+
+    def open(self, key: Optional[str] = None, op: str = "=", tag: Optional[str] = None) -> None:
+        self._line(self._prefix(key, op, tag) + "{", "open")
+        self.depth += 1
+
+    def close(self) -> None:
+        if self.depth == self._base_depth:
+            raise ValueError("没有可以闭合的块")
+        self.depth -= 1
+        self._line("}", "close")
+
+    def inline(
+        self,
+        key: Optional[str],
+        fields: Iterable[Field],
+        op: str = "=",
+        tag: Optional[str] = None,
+    ) -> None:
+        """单行块；INLINE_KEYS 中的 key 用制表符分隔，其余用空格"""
+        parts = [
+            self._pair(*item) if isinstance(item, tuple) else self.format_value(item)
+            for item in fields
+        ]
+        self._line(self._prefix(key, op, tag) + self._inline_body(key, parts))
+
+    @staticmethod
+    def _inline_body(key: Optional[str], parts: Sequence[str]) -> str:
+        if not parts:
+            return "{ }"
+        if key in INLINE_KEYS:
+            return "{" + "".join(f"\t{part}" for part in parts) + " }"
+        return "{ " + " ".join(parts) + " }"
+
+    # ---- 写回解析树 ----
+
+    def document(self, document: Document, visit: Optional[Visitor] = None) -> None:
+        source = document.source or None
+        self.block_body(document, source, document.start, len(document.source), visit)
+        self.finish()
+
+    def block_body(
+        self,
+        block: Block,
+        source: Optional[bytes],
+        start: int,
+        end: int,
+        visit: Optional[Visitor] = None,
+    ) -> None:
+        """写出块内全部条目；给出 source 时一并保留条目之间的注释与空行"""
+        pos = start
+        for entry in block.entries:
+            if source is not None:
+                self._trivia(source, pos, entry.start)
+            if visit is None or not visit(self, entry):
+                self.entry(entry, source, visit)
+            pos = entry.end
+        if source is not None:
+            self._trivia(source, pos, end)
+
+    def entry(self, entry: Entry, source: Optional[bytes] = None, visit: Optional[Visitor] = None) -> None:
+        value = entry.value
+        if not isinstance(value, Block):
+            self._line(value if entry.key is None else f"{entry.key} {entry.op} {value}")
+            return
+        parts = self._inline_parts(value, source)
+        if parts is not None:
+            prefix = self._prefix(entry.key, entry.op, value.tag)
+            line = prefix + self._inline_body(entry.key, parts)
+            is_list = all(child.key is None for child in value.entries)
+            if entry.key in INLINE_KEYS or is_list or self._width(line) <= INLINE_WIDTH:
+                self._line(line)
+                return
+        self.open(entry.key, entry.op or "=", value.tag)
+        end = value.end - 1 if value.closed else value.end
+        self.block_body(value, source, value.start + 1, end, visit)
+        self.close()
+
+    def _inline_parts(self, block: Block, source: Optional[bytes]) -> Optional[List[str]]:
+        """只含标量且内部没有注释的块可以写成单行"""
+        parts = []
+        for entry in block.entries:
+            if isinstance(entry.value, Block):
+                return None
+            parts.append(entry.value if entry.key is None else f"{entry.key} {entry.op} {entry.value}")
+        if source is not None and b"#" in source[block.start:block.end]:
+            return None
+        return parts
+
+    def _width(self, line: str) -> int:
+        return self.depth * TAB_WIDTH + len(line)
+
+    def _trivia(self, source: bytes, start: int, end: int) -> None:
+        """把原文 [start, end) 中的注释与空行写出"""
+        newlines = 0
+        for match in _TRIVIA_ITEM_RE.finditer(source, start, end):
+            token = match.group()
+            if token == b"\n":
+                newlines += 1
+                continue
+            text = token.decode("utf-8", "replace").rstrip()
+            if newlines == 0 and self._line_open:
+                # 与上一条目同一行的行尾注释
+                self.sink.write(f" {text}".encode("utf-8"))
+            else:
+                if newlines >= 2:
+                    self.blank()
+                self._line(text)
+            newlines = 0
+        if newlines >= 2:
+            self.blank()
+
+
+@contextmanager
+def atomic_write(path: Union[str, Path], snapshot: bool = True) -> Iterator[BinaryIO]:
+    """先写临时文件，成功后替换目标，避免写到一半的文件
+
+    snapshot 为真时，替换前把目标原来的内容记入快照库，可用 `tools undo` 恢复。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + ".tmp")
+    try:
+        with open(temp, "wb", buffering=BUFFER_SIZE) as f:
+            yield f
+        if snapshot:
+            import snapshots
+            snapshots.record(path)
+        os.replace(temp, path)
+        if snapshot:
+            snapshots.written(path)
+    except BaseException:
+        if temp.exists():
+            temp.unlink()
+        raise
+
+
+@contextmanager
+def atomic_text(path: Union[str, Path], encoding: str = "utf-8", snapshot: bool = True) -> Iterator[TextIO]:
+    """atomic_write 的文本版本（用于 CSV 等表格）；newline="" 由调用方决定行尾"""
+    with atomic_write(path, snapshot) as f:
+        text = io.TextIOWrapper(f, encoding=encoding, newline="")
+        try:
+            yield text
+        finally:
+            text.flush()
+            text.detach()
+
+
+@contextmanager
+def open_script(
+    path: Union[str, Path],
+    precision: int = DEFAULT_PRECISION,
+    bom: bool = False,
+    snapshot: bool = True,
+) -> Iterator[ScriptWriter]:
+    with atomic_write(path, snapshot) as f:
+        writer = ScriptWriter(f, precision=precision, bom=bom)
+        yield writer
+        writer.finish()
+
+
+def format_document(document: Document, visit: Optional[Visitor] = None) -> bytes:
+    buffer = io.BytesIO()
+    ScriptWriter(buffer, bom=document.bom).document(document, visit)
+    return buffer.getvalue()
+
+
+def _structure_digest(document: Document) -> bytes:
+    from semantic_diff import block_digest
+    return block_digest(document, {})
+
+
+def format_bytes(data: bytes) -> bytes:
+    """规范化一个文件的内容；有解析错误、或格式化会改变结构或丢失注释时抛出 ValueError"""
+    document = parse_bytes(data)
+    if document.errors:
+        raise ValueError(f"存在解析错误：{document.errors[0]}")
+    output = format_document(document)
+    if _structure_digest(parse_bytes(output)) != _structure_digest(document):
+        raise ValueError("格式化后结构发生变化，已放弃")
+    if comments(output) != comments(data):
+        raise ValueError("有注释位于无法保留的位置（如 key 与 { 之间），已放弃")
+    return output
+
+
+def collect_files(paths: Iterable[str]) -> List[Path]:
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in FMT_SUFFIXES))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools fmt",
+        description="按规范格式原地重写 PDX 脚本文件（保留注释）。",
+    )
+    parser.add_argument("paths", nargs="+", help="文件或目录（目录下递归处理 .txt）")
+    parser.add_argument("--check", action="store_true", help="只检查，不写文件；有需要格式化的文件时返回码为 1")
+    args = parser.parse_args(argv)
+
+    changed: List[Path] = []
+    failed = 0
+    files = collect_files(args.paths)
+    for path in files:
+        if not path.is_file():
+            print(f"[错误] 文件不存在：{path}")
+            failed += 1
+            continue
+        data = path.read_bytes()
+        try:
+            output = format_bytes(data)
+        except ValueError as e:
+            print(f"[跳过] {path}: {e}")
+            failed += 1
+            continue
+        if output == data:
+            continue
+        changed.append(path)
+        if args.check:
+            print(f"[需要格式化] {path}")
+        else:
+            with atomic_write(path) as f:
+                f.write(output)
+            print(f"[已格式化] {path}")
+
+    verb = "需要格式化" if args.check else "已格式化"
+    print(f"\n共 {len(files)} 个文件，{verb} {len(changed)} 个，失败 {failed} 个")
+    if failed or (args.check and changed):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
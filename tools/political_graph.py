@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开局政治关系图
+
+把 setup 中分散的政治关系载入一张按国家索引的图：
+    12_*diplomacy.txt / 20_zzz_rivals.txt  diplomacy_manager 中的 dependency（附属）、
+                                           scripted_mutual（同盟等）与 rival（宿敌）
+    16_*wars.txt                           war_manager 中的 war / civil_war 及各方参战者
+    15_*international_organizations.txt    国际组织的成员、领袖与成员身份（选帝侯等）
+国家 tag 取自 10_*countries.txt（经 setup_view 的实体索引，不解析整个文件）；
+其中不是 tag 形状的实体（多为上一个国家块的括号写错，把块内字段漏到了 countries 中）不算国家，作为结构问题报告。
+
+邻接表全部是 dict / set，传递查询（完整的附属树、所有上级宗主）与全图检查都只遍历内存中的图：
+    - 附属关系的自我附属、重复声明、一国多宗主与环；
+    - 参战者同时出现在两方、与自己的（间接）宗主或盟友交战、以 Subject 理由加入却与召集者没有附属关系；
+    - 宿敌同时是宗主 / 附属或盟友；
+    - 国际组织的领袖或成员身份不在成员中、成员重复；
+    - 10_*countries.txt 的 countries 中出现不是国家 tag 的块；
+    - 引用了不存在的国家 tag（没有原版游戏目录时只计数）。
+
+用法：
+    python -m tools politics check
+    python -m tools politics tree SPA             # SPA 的完整附属树
+    python -m tools politics show ARA             # ARA 的宗主链、附属、盟友、宿敌、战争与组织
+    python -m tools politics export --format dot --root SPA -o spa.dot
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from pdx_script import Block, parse_bytes, unquote
+from pdx_writer import atomic_write
+from setup_view import SETUP_DIR, open_setup
+from vfs import VirtualFileSystem, get_vfs
+
+SOURCE_PATTERNS = ("12_*", "15_*", "16_*", "20_*")
+COUNTRY_PATTERNS = ("10_*",)
+COUNTRIES_BLOCK = "countries"
+TAG_RE = re.compile(r"^[A-Z][A-Z0-9]{2}$")
+WAR_KINDS = ("war", "civil_war")
+SIDES = ("attacker", "defender")
+# 国际组织中以成员列表形式出现的身份；其余块（areas、regions 等）不是国家
+ORGANIZATION_ROLES = (
+    "emperor", "elector", "archbishop_elector", "free_city",
+    "imperial_peasant_republic", "imperial_prelate", "imperial_prince",
+)
+
+
+@dataclass
+class Dependency:
+    overlord: str
+    subject: str
+    type: str
+    file: str
+    line: int
+
+
+@dataclass
+class Participant:
+    country: str
+    side: str
+    reason: str
+    caller: Optional[str]
+    line: int
+
+
+@dataclass
+class War:
+    name: str
+    kind: str
+    file: str
+    line: int
+    participants: List[Participant] = field(default_factory=list)
+
+    def side_of(self, country: str) -> Set[str]:
+        return {p.side for p in self.participants if p.country == country}
+
+
+@dataclass
+class Organization:
+    type: str
+    file: str
+    line: int
+    leader: Optional[str] = None
+    members: List[str] = field(default_factory=list)
+    roles: Dict[str, List[str]] = field(default_factory=dict)
+
+
+@dataclass
+class Problem:
+    category: str
+    message: str
+    file: str
+    line: int
+
+
+@dataclass
+class PoliticalGraph:
+    countries: Set[str] = field(default_factory=set)
+    dependencies: List[Dependency] = field(default_factory=list)
+    # 国家 -> 作为附属 / 宗主的 dependency
+    overlords: Dict[str, List[Dependency]] = field(default_factory=lambda: defaultdict(list))
+    subjects: Dict[str, List[Dependency]] = field(default_factory=lambda: defaultdict(list))
+    # scripted_mutual 的类型 -> 国家 -> 对方（双向）
+    mutual: Dict[str, Dict[str, Set[str]]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(set)))
+    # rival 是单向声明：国家 -> 它视为宿敌的国家
+    rivals: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    wars: List[War] = field(default_factory=list)
+    organizations: List[Organization] = field(default_factory=list)
+    # 国家 -> wars / organizations 中的下标
+    wars_of: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+    organizations_of: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+    # (关系, 国家, 国家) -> (文件, 行号)：scripted_mutual 以其 type 为关系名，宿敌为 "rival"
+    declared: Dict[Tuple[str, str, str], Tuple[str, int]] = field(default_factory=dict)
+    # (国家, 文件, 行号)：记录所有引用，用于核对 tag
+    references: List[Tuple[str, str, int]] = field(default_factory=list)
+    # (key, 文件, 行号)：10_* 的 countries 中不是 tag 的块
+    strays: List[Tuple[str, str, int]] = field(default_factory=list)
+
+    # ---- 查询 ----
+
+    def knows(self, country: str) -> bool:
+        """在 10_* 中定义，或在政治关系中被引用过（原版定义的 tag）"""
+        return country in self.countries or any(country == reference[0] for reference in self.references)
+
+    def allies(self, country: str) -> Set[str]:
+        return self.mutual["alliance"].get(country, set())
+
+    def all_subjects(self, country: str) -> List[str]:
+        """全部直接与间接附属，按广度优先顺序；遇到环时每个国家只出现一次"""
+        found: List[str] = []
+        seen = {country}
+        queue = [country]
+        for current in queue:
+            for dependency in self.subjects.get(current, ()):
+                if dependency.subject not in seen:
+                    seen.add(dependency.subject)
+                    found.append(dependency.subject)
+                    queue.append(dependency.subject)
+        return found
+
+    def all_overlords(self, country: str) -> List[str]:
+        """全部直接与间接宗主，由近及远"""
+        found: List[str] = []
+        seen = {country}
+        queue = [country]
+        for current in queue:
+            for dependency in self.overlords.get(current, ()):
+                if dependency.overlord not in seen:
+                    seen.add(dependency.overlord)
+                    found.append(dependency.overlord)
+                    queue.append(dependency.overlord)
+        return found
+
+    def subject_tree(self, country: str) -> Iterator[Tuple[int, Dependency]]:
+        """(深度, dependency)，按深度优先顺序；环上的国家不重复展开"""
+        seen = {country}
+        stack = [(1, dependency) for dependency in reversed(self.subjects.get(country, ()))]
+        while stack:
+            depth, dependency = stack.pop()
+            yield depth, dependency
+            if dependency.subject in seen:
+                continue
+            seen.add(dependency.subject)
+            stack.extend((depth + 1, child) for child in reversed(self.subjects.get(dependency.subject, ())))
+
+    def cycles(self) -> List[List[str]]:
+        """附属关系中的环，每个环从其中字典序最小的国家开始"""
+        found: Set[Tuple[str, ...]] = set()
+        state: Dict[str, int] = {}  # 1 = 在当前路径上，2 = 已完成
+        for root in list(self.subjects):
+            if root in state:
+                continue
+            path: List[str] = []
+            stack: List[Tuple[str, Iterator[Dependency]]] = [(root, iter(self.subjects.get(root, ())))]
+            state[root] = 1
+            path.append(root)
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    path.pop()
+                    state[node] = 2
+                    continue
+                target = child.subject
+                if state.get(target) == 1:
+                    cycle = path[path.index(target):]
+                    start = cycle.index(min(cycle))
+                    found.add(tuple(cycle[start:] + cycle[:start]))
+                elif target not in state:
+                    state[target] = 1
+                    path.append(target)
+                    stack.append((target, iter(self.subjects.get(target, ()))))
+        return [list(cycle) for cycle in sorted(found)]
+
+
+# ---- 载入 ----
+
+def _matches(logical: str, patterns: Tuple[str, ...]) -> bool:
+    name = logical.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def _word(block: Block, key: str) -> Optional[str]:
+    value = unquote(block.get(key))
+    return value if isinstance(value, str) else None
+
+
+def _words(value) -> List[str]:
+    if not isinstance(value, Block):
+        return []
+    return [entry.value for entry in value if entry.key is None and isinstance(entry.value, str)]
+
+
+def _load_diplomacy(graph: PoliticalGraph, block: Block, file: str) -> None:
+    for entry in block:
+        if not entry.is_block:
+            continue
+        body = entry.value
+        first, second = _word(body, "first"), _word(body, "second")
+        if first is None or second is None:
+            continue
+        graph.references.extend([(first, file, entry.line), (second, file, entry.line)])
+        if entry.key == "dependency":
+            dependency = Dependency(first, second, _word(body, "subject_type") or "", file, entry.line)
+            graph.dependencies.append(dependency)
+            graph.overlords[second].append(dependency)
+            graph.subjects[first].append(dependency)
+        elif entry.key == "scripted_mutual":
+            kind = _word(body, "type") or ""
+            graph.mutual[kind][first].add(second)
+            graph.mutual[kind][second].add(first)
+            graph.declared[(kind, first, second)] = (file, entry.line)
+        elif entry.key == "rival":
+            graph.rivals[first].add(second)
+            graph.declared[("rival", first, second)] = (file, entry.line)
+
+
+def _load_wars(graph: PoliticalGraph, block: Block, file: str) -> None:
+    for entry in block:
+        if entry.key not in WAR_KINDS or not entry.is_block:
+            continue
+        body = entry.value
+        war_name = body.get("war_name")
+        name = _word(war_name, "name") if isinstance(war_name, Block) else None
+        war = War(name or f"{file}:{entry.line}", entry.key, file, entry.line)
+        for side_entry in body:
+            if side_entry.key not in SIDES or not side_entry.is_block:
+                continue
+            country = _word(side_entry.value, "country")
+            if country is None:
+                continue
+            request = side_entry.value.get("request")
+            reason = (_word(request, "reason") if isinstance(request, Block) else None) or ""
+            caller = _word(request, "caller") if isinstance(request, Block) else None
+            war.participants.append(Participant(country, side_entry.key, reason, caller, side_entry.line))
+            graph.references.append((country, file, side_entry.line))
+            if caller:
+                graph.references.append((caller, file, side_entry.line))
+        index = len(graph.wars)
+        graph.wars.append(war)
+        for country in dict.fromkeys(p.country for p in war.participants):
+            graph.wars_of[country].append(index)
+
+
+def _load_organizations(graph: PoliticalGraph, block: Block, file: str) -> None:
+    for entry in block:
+        if entry.key != "add_international_organization" or not entry.is_block:
+            continue
+        body = entry.value
+        organization = Organization(_word(body, "type") or "", file, entry.line, _word(body, "leader"))
+        for member_entry in body:
+            if member_entry.key == "members":
+                organization.members.extend(_words(member_entry.value))
+            elif member_entry.key in ORGANIZATION_ROLES:
+                organization.roles.setdefault(member_entry.key, []).extend(_words(member_entry.value))
+        for country in organization.members + [organization.leader or ""]:
+            if country:
+                graph.references.append((country, file, entry.line))
+        index = len(graph.organizations)
+        graph.organizations.append(organization)
+        for country in dict.fromkeys(organization.members):
+            graph.organizations_of[country].append(index)
+
+
+LOADERS = {
+    "diplomacy_manager": _load_diplomacy,
+    "war_manager": _load_wars,
+    "international_organization_manager": _load_organizations,
+}
+
+
+def load_graph(vfs: Optional[VirtualFileSystem] = None) -> PoliticalGraph:
+    vfs = vfs or get_vfs()
+    graph = PoliticalGraph()
+    for logical in vfs.listdir(SETUP_DIR, (".txt",)):
+        if _matches(logical, COUNTRY_PATTERNS):
+            view = open_setup(logical, vfs)
+            for key in view:
+                if TAG_RE.match(key):
+                    graph.countries.add(key)
+                elif key != COUNTRIES_BLOCK:
+                    file = logical.rsplit("/", 1)[-1]
+                    graph.strays.extend((key, file, line) for _start, _end, line in view.index[key])
+        elif _matches(logical, SOURCE_PATTERNS):
+            file = logical.rsplit("/", 1)[-1]
+            for entry in parse_bytes(vfs.read_bytes(logical)):
+                loader = LOADERS.get(entry.key)
+                if loader is not None and entry.is_block:
+                    loader(graph, entry.value, file)
+    return graph
+
+
+# ---- 检查 ----
+
+def check_dependencies(graph: PoliticalGraph) -> List[Problem]:
+    problems: List[Problem] = []
+    seen: Dict[Tuple[str, str], Dependency] = {}
+    for dependency in graph.dependencies:
+        pair = (dependency.overlord, dependency.subject)
+        if dependency.overlord == dependency.subject:
+            problems.append(Problem("附属关系", f"{dependency.subject} 是自己的附属", dependency.file, dependency.line))
+        elif pair in seen:
+            first = seen[pair]
+            problems.append(Problem(
+                "附属关系",
+                f"{dependency.overlord} -> {dependency.subject} 重复声明（{first.file}:{first.line} 为 {first.type}）",
+                dependency.file, dependency.line,
+            ))
+        else:
+            seen[pair] = dependency
+    for subject, dependencies in graph.overlords.items():
+        overlords = dict.fromkeys(d.overlord for d in dependencies if d.overlord != subject)
+        if len(overlords) > 1:
+            listing = "、".join(f"{d.overlord}（{d.type}，{d.file}:{d.line}）" for d in dependencies)
+            problems.append(Problem("一国多宗主", f"{subject} 同时是 {listing} 的附属", dependencies[-1].file, dependencies[-1].line))
+    for cycle in graph.cycles():
+        first = graph.overlords[cycle[0]][0]
+        problems.append(Problem("附属环", " -> ".join(cycle + [cycle[0]]), first.file, first.line))
+    return problems
+
+
+def check_wars(graph: PoliticalGraph) -> List[Problem]:
+    problems: List[Problem] = []
+    for war in graph.wars:
+        sides: Dict[str, Set[str]] = defaultdict(set)
+        for participant in war.participants:
+            sides[participant.country].add(participant.side)
+        for participant in war.participants:
+            where = (war.file, participant.line)
+            country, side = participant.country, participant.side
+            if len(sides[country]) > 1:
+                if participant is next(p for p in war.participants if p.country == country):
+                    problems.append(Problem("战争", f"{war.name}：{country} 同时在进攻方与防守方", *where))
+                continue
+            enemies = {other for other, other_sides in sides.items() if side not in other_sides}
+            for overlord in graph.all_overlords(country):
+                if overlord in enemies:
+                    problems.append(Problem("战争", f"{war.name}：{country} 与自己的宗主 {overlord} 交战", *where))
+            for ally in sorted(graph.allies(country) & enemies):
+                if country < ally:
+                    problems.append(Problem("战争", f"{war.name}：盟友 {country} 与 {ally} 分属两方", *where))
+            caller = participant.caller
+            if caller is None:
+                continue
+            if side not in sides.get(caller, ()):
+                problems.append(Problem("战争", f"{war.name}：{country} 应 {caller} 召集参战，但 {caller} 不在同一方", *where))
+            if participant.reason == "Subject":
+                # 附属应宗主召集，或宗主为保护附属参战
+                related = {d.overlord for d in graph.overlords.get(country, ())}
+                related.update(d.subject for d in graph.subjects.get(country, ()))
+                if caller not in related:
+                    problems.append(Problem("战争", f"{war.name}：{country} 以 Subject 理由应召，但与 {caller} 没有附属关系", *where))
+            elif participant.reason == "Ally" and caller not in graph.allies(country):
+                problems.append(Problem("战争", f"{war.name}：{country} 以 Ally 理由应召，却没有与 {caller} 结盟", *where))
+    return problems
+
+
+def check_rivals(graph: PoliticalGraph) -> List[Problem]:
+    problems: List[Problem] = []
+    pairs = {(d.overlord, d.subject): d for d in graph.dependencies}
+    for country, rivals in graph.rivals.items():
+        for rival in sorted(rivals):
+            where = graph.declared[("rival", country, rival)]
+            relation = pairs.get((country, rival)) or pairs.get((rival, country))
+            if country == rival:
+                problems.append(Problem("宿敌", f"{country} 以自己为宿敌", *where))
+            elif relation is not None:
+                problems.append(Problem(
+                    "宿敌", f"{country} 以 {rival} 为宿敌，但 {relation.subject} 是 {relation.overlord} 的 {relation.type}", *where
+                ))
+            elif rival in graph.allies(country):
+                problems.append(Problem("宿敌", f"{country} 以盟友 {rival} 为宿敌", *where))
+    return problems
+
+
+def check_organizations(graph: PoliticalGraph) -> List[Problem]:
+    problems: List[Problem] = []
+    for organization in graph.organizations:
+        where = (organization.file, organization.line)
+        members = set(organization.members)
+        duplicates = sorted({m for m in organization.members if organization.members.count(m) > 1})
+        if duplicates:
+            problems.append(Problem("国际组织", f"{organization.type}：成员重复 {' '.join(duplicates)}", *where))
+        if organization.leader and organization.leader not in members:
+            problems.append(Problem("国际组织", f"{organization.type}：领袖 {organization.leader} 不是成员", *where))
+        for role, countries in organization.roles.items():
+            outsiders = [c for c in countries if c not in members]
+            if outsiders:
+                problems.append(Problem("国际组织", f"{organization.type}：{role} 中的 {' '.join(outsiders)} 不是成员", *where))
+    return problems
+
+
+def check_countries(graph: PoliticalGraph) -> List[Problem]:
+    return [
+        Problem("国家块结构", f"countries 中的 {key} 不是国家 tag，多半是上一个国家块的括号写错", file, line)
+        for key, file, line in graph.strays
+    ]
+
+
+def check_tags(graph: PoliticalGraph, vfs: VirtualFileSystem) -> Tuple[List[Problem], int]:
+    """引用了不存在的 tag；返回 (问题, 因为没有原版目录而无法核对的个数)"""
+    unknown: Dict[str, Tuple[str, int]] = {}
+    for country, file, line in graph.references:
+        if country not in graph.countries and country not in unknown:
+            unknown[country] = (file, line)
+    if vfs.layer("vanilla") is None:
+        return [], len(unknown)
+    return [Problem("国家 tag", f"{country} 没有在 10_*countries.txt 中定义", *where) for country, where in unknown.items()], 0
+
+
+def check_all(graph: PoliticalGraph, vfs: Optional[VirtualFileSystem] = None) -> Tuple[List[Problem], int]:
+    tag_problems, unchecked = check_tags(graph, vfs or get_vfs())
+    problems = (
+        check_dependencies(graph)
+        + check_wars(graph)
+        + check_rivals(graph)
+        + check_organizations(graph)
+        + check_countries(graph)
+        + tag_problems
+    )
+    return problems, unchecked
+
+
+# ---- 导出 ----
+
+def subgraph_countries(graph: PoliticalGraph, root: Optional[str]) -> Optional[Set[str]]:
+    """--root 时只保留该国的宗主链与完整附属树"""
+    if root is None:
+        return None
+    return {root, *graph.all_subjects(root), *graph.all_overlords(root)}
+
+
+def export_json(graph: PoliticalGraph, keep: Optional[Set[str]]) -> str:
+    def wanted(*countries: str) -> bool:
+        return keep is None or all(country in keep for country in countries)
+
+    data = {
+        "dependencies": [asdict(d) for d in graph.dependencies if wanted(d.overlord, d.subject)],
+        "mutual": {
+            kind: sorted([a, b] for a, others in pairs.items() for b in others if a < b and wanted(a, b))
+            for kind, pairs in graph.mutual.items()
+        },
+        "rivals": sorted([a, b] for a, others in graph.rivals.items() for b in others if wanted(a, b)),
+        "wars": [asdict(w) for w in graph.wars if keep is None or any(p.country in keep for p in w.participants)],
+        "organizations": [asdict(o) for o in graph.organizations if keep is None or keep & set(o.members)],
+    }
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def export_dot(graph: PoliticalGraph, keep: Optional[Set[str]]) -> str:
+    def wanted(*countries: str) -> bool:
+        return keep is None or all(country in keep for country in countries)
+
+    lines = ["digraph politics {", "\trankdir=TB;", "\tnode [shape=box];"]
+    for d in graph.dependencies:
+        if wanted(d.overlord, d.subject):
+            lines.append(f'\t"{d.overlord}" -> "{d.subject}" [label="{d.type}"];')
+    for kind, pairs in sorted(graph.mutual.items()):
+        for a, others in sorted(pairs.items()):
+            for b in sorted(others):
+                if a < b and wanted(a, b):
+                    lines.append(f'\t"{a}" -> "{b}" [dir=none, style=dashed, label="{kind}"];')
+    for a, others in sorted(graph.rivals.items()):
+        for b in sorted(others):
+            if wanted(a, b):
+                lines.append(f'\t"{a}" -> "{b}" [style=dotted, color=red, label="rival"];')
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+# ---- 命令行 ----
+
+def _print_problems(problems: List[Problem], limit: int) -> None:
+    grouped: Dict[str, List[Problem]] = defaultdict(list)
+    for problem in problems:
+        grouped[problem.category].append(problem)
+    for category, items in grouped.items():
+        print(f"\n{category}（{len(items)} 处）:")
+        for problem in items[:limit]:
+            where = f"（{problem.file}:{problem.line}）" if problem.file else ""
+            print(f"  - {problem.message}{where}")
+        if len(items) > limit:
+            print(f"  ... 还有 {len(items) - limit} 处")
+
+
+def _show(graph: PoliticalGraph, country: str) -> None:
+    chain = graph.all_overlords(country)
+    print(f"{country}")
+    print(f"  宗主：{' -> '.join(chain) if chain else '无'}")
+    direct = graph.subjects.get(country, [])
+    print(f"  附属：直接 {len(direct)} 个，共 {len(graph.all_subjects(country))} 个")
+    for dependency in direct:
+        print(f"    {dependency.subject}（{dependency.type}）")
+    for kind, pairs in sorted(graph.mutual.items()):
+        if pairs.get(country):
+            print(f"  {kind}：{' '.join(sorted(pairs[country]))}")
+    rivals = graph.rivals.get(country)
+    if rivals:
+        print(f"  宿敌：{' '.join(sorted(rivals))}")
+    for index in graph.wars_of.get(country, ()):
+        war = graph.wars[index]
+        print(f"  战争：{war.name}（{'、'.join(sorted(war.side_of(country)))}，{war.file}:{war.line}）")
+    for index in graph.organizations_of.get(country, ()):
+        organization = graph.organizations[index]
+        roles = [role for role, countries in organization.roles.items() if country in countries]
+        leader = "，领袖" if organization.leader == country else ""
+        print(f"  组织：{organization.type}{leader}{'，' + '、'.join(roles) if roles else ''}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools politics",
+        description="载入附属、同盟、宿敌、战争与国际组织，查询与检查开局政治关系。",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="全图一致性检查")
+    check.add_argument("--limit", type=int, default=20, help="每类问题最多显示的条目数")
+    tree = sub.add_parser("tree", help="打印一国的完整附属树")
+    tree.add_argument("country")
+    show = sub.add_parser("show", help="一国的全部政治关系")
+    show.add_argument("countries", nargs="+")
+    export = sub.add_parser("export", help="导出关系图")
+    export.add_argument("--format", choices=("json", "dot"), default="json")
+    export.add_argument("--root", help="只导出该国的宗主链与附属树")
+    export.add_argument("-o", "--output", type=Path, help="输出文件（缺省打印）")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    graph = load_graph()
+    loaded = time.perf_counter()
+
+    wanted: List[str] = []
+    if args.command == "tree":
+        wanted = [args.country]
+    elif args.command == "show":
+        wanted = args.countries
+    elif args.command == "export" and args.root:
+        wanted = [args.root]
+    unknown = [country for country in wanted if not graph.knows(country)]
+    if unknown:
+        print(f"[错误] 未知的国家 tag：{' '.join(unknown)}（既没有在 10_*countries.txt 中定义，也没有出现在任何政治关系中）")
+        return 1
+
+    if args.command == "check":
+        problems, unchecked = check_all(graph)
+        checked = time.perf_counter()
+        _print_problems(problems, args.limit)
+        if unchecked:
+            print(f"\n[提示] {unchecked} 个 tag 不在 mod 的 10_*countries.txt 中，多由原版定义；未找到原版游戏目录，无法核对")
+        print(
+            f"\n[完成] {len(graph.countries)} 个国家，{len(graph.dependencies)} 条附属，"
+            f"{len(graph.wars)} 场战争，{len(graph.organizations)} 个组织，发现 {len(problems)} 处问题"
+            f"（载入 {(loaded - started) * 1000:.1f} ms，检查 {(checked - loaded) * 1000:.2f} ms）"
+        )
+        return 1 if problems else 0
+
+    if args.command == "tree":
+        print(args.country)
+        for depth, dependency in graph.subject_tree(args.country):
+            print(f"{'  ' * depth}{dependency.subject}（{dependency.type}）")
+        return 0
+
+    if args.command == "show":
+        for country in args.countries:
+            _show(graph, country)
+        return 0
+
+    keep = subgraph_countries(graph, args.root)
+    text = export_dot(graph, keep) if args.format == "dot" else export_json(graph, keep)
+    if args.output:
+        with atomic_write(args.output) as f:
+            f.write(text.encode("utf-8"))
+        print(f"[完成] 已导出 {args.output}")
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+location_culture_religion.csv 与 06_pops.txt 一致性检查
+
+把 docs/location_culture_religion.csv 与实际的 define_pop 条目各自载入
+以 location 为键的哈希表，做一次全图连接，报告：
+    - pop 使用了 CSV 中未列出的 culture / religion / pop type 的 location；
+    - CSV 的 Primary_Culture / Primary_Religion 并非人口最多者的 location；
+    - CSV 中有记录但没有任何 pop 的 location；
+    - 有 pop 但 CSV 中没有记录的 location。
+
+也可以用 --write-csv 从当前人口一次性重新生成 CSV。
+
+用法：
+    python -m tools check-pops
+    python -m tools check-pops --write-csv [docs/location_culture_religion.csv]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from pdx_writer import atomic_text
+from scale_pops import AreaPopulationScaler
+from vfs import MOD_ROOT
+
+CSV_FILE = MOD_ROOT / "docs" / "location_culture_religion.csv"
+CSV_HEADER = ["Location", "Primary_Culture", "All_Cultures", "Primary_Religion", "All_Religions", "Pop_Types"]
+LIST_SEPARATOR = ";"
+
+
+@dataclass
+class CsvRow:
+    location: str
+    primary_culture: str
+    cultures: List[str]
+    primary_religion: str
+    religions: List[str]
+    pop_types: List[str]
+
+
+@dataclass
+class LocationPops:
+    """单个 location 的人口汇总；dict 保持首次出现的顺序"""
+
+    cultures: Dict[str, float] = field(default_factory=dict)
+    religions: Dict[str, float] = field(default_factory=dict)
+    pop_types: Dict[str, float] = field(default_factory=dict)
+
+    def add(self, pop: Dict) -> None:
+        size = pop["size"]
+        self.cultures[pop["culture"]] = self.cultures.get(pop["culture"], 0.0) + size
+        self.religions[pop["religion"]] = self.religions.get(pop["religion"], 0.0) + size
+        self.pop_types[pop["type"]] = self.pop_types.get(pop["type"], 0.0) + size
+
+
+@dataclass
+class ConsistencyReport:
+    unlisted_cultures: Dict[str, List[str]] = field(default_factory=dict)
+    unlisted_religions: Dict[str, List[str]] = field(default_factory=dict)
+    unlisted_pop_types: Dict[str, List[str]] = field(default_factory=dict)
+    wrong_primary_culture: Dict[str, str] = field(default_factory=dict)
+    wrong_primary_religion: Dict[str, str] = field(default_factory=dict)
+    rows_without_pops: List[str] = field(default_factory=list)
+    pops_without_rows: List[str] = field(default_factory=list)
+
+    @property
+    def problem_count(self) -> int:
+        return (
+            len(self.unlisted_cultures)
+            + len(self.unlisted_religions)
+            + len(self.unlisted_pop_types)
+            + len(self.wrong_primary_culture)
+            + len(self.wrong_primary_religion)
+            + len(self.rows_without_pops)
+            + len(self.pops_without_rows)
+        )
+
+
+def _split(value: str) -> List[str]:
+    return [item for item in value.split(LIST_SEPARATOR) if item]
+
+
+def load_csv(path: Path = CSV_FILE) -> Dict[str, CsvRow]:
+    rows: Dict[str, CsvRow] = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for raw in csv.DictReader(f):
+            location = raw["Location"].strip()
+            if not location:
+                continue
+            rows[location] = CsvRow(
+                location=location,
+                primary_culture=raw["Primary_Culture"].strip(),
+                cultures=_split(raw["All_Cultures"]),
+                primary_religion=raw["Primary_Religion"].strip(),
+                religions=_split(raw["All_Religions"]),
+                pop_types=_split(raw["Pop_Types"]),
+            )
+    return rows
+
+
+def aggregate_pops(populations: Dict[str, List[Dict]]) -> Dict[str, LocationPops]:
+    result: Dict[str, LocationPops] = {}
+    for location, pops in populations.items():
+        summary = LocationPops()
+        for pop in pops:
+            summary.add(pop)
+        result[location] = summary
+    return result
+
+
+def _largest(values: Dict[str, float]) -> str:
+    return max(values, key=values.get)
+
+
+def check(rows: Dict[str, CsvRow], pops: Dict[str, LocationPops]) -> ConsistencyReport:
+    report = ConsistencyReport()
+    for location, row in rows.items():
+        summary = pops.get(location)
+        if summary is None or not summary.pop_types:
+            report.rows_without_pops.append(location)
+            continue
+        listed_cultures = set(row.cultures)
+        listed_religions = set(row.religions)
+        listed_types = set(row.pop_types)
+        extra = [c for c in summary.cultures if c not in listed_cultures]
+        if extra:
+            report.unlisted_cultures[location] = extra
+        extra = [r for r in summary.religions if r not in listed_religions]
+        if extra:
+            report.unlisted_religions[location] = extra
+        extra = [t for t in summary.pop_types if t not in listed_types]
+        if extra:
+            report.unlisted_pop_types[location] = extra
+        largest = _largest(summary.cultures)
+        if row.primary_culture != largest:
+            report.wrong_primary_culture[location] = largest
+        largest = _largest(summary.religions)
+        if row.primary_religion != largest:
+            report.wrong_primary_religion[location] = largest
+    report.pops_without_rows = sorted(location for location in pops if location not in rows)
+    return report
+
+
+def _ordered(values: Dict[str, float], primary: str) -> List[str]:
+    return [primary] + [value for value in values if value != primary]
+
+
+def write_csv(pops: Dict[str, LocationPops], path: Path = CSV_FILE) -> int:
+    """从人口汇总重新生成 CSV：主文化/主宗教取人口最多者并排在列表首位"""
+    count = 0
+    with atomic_text(path, encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(CSV_HEADER)
+        for location in sorted(pops):
+            summary = pops[location]
+            if not summary.pop_types:
+                continue
+            culture = _largest(summary.cultures)
+            religion = _largest(summary.religions)
+            writer.writerow([
+                location,
+                culture,
+                LIST_SEPARATOR.join(_ordered(summary.cultures, culture)),
+                religion,
+                LIST_SEPARATOR.join(_ordered(summary.religions, religion)),
+                LIST_SEPARATOR.join(summary.pop_types),
+            ])
+            count += 1
+    return count
+
+
+def _print_section(title: str, items: Dict[str, object], limit: int) -> None:
+    if not items:
+        return
+    print(f"\n{title}（{len(items)} 个）:")
+    for location in sorted(items)[:limit]:
+        value = items[location]
+        if isinstance(value, list):
+            value = ", ".join(value)
+        print(f"  - {location}: {value}" if value else f"  - {location}")
+    if len(items) > limit:
+        print(f"  ... 还有 {len(items) - limit} 个")
+
+
+def print_report(report: ConsistencyReport, limit: int) -> None:
+    _print_section("pop 使用了 CSV 未列出的 culture", report.unlisted_cultures, limit)
+    _print_section("pop 使用了 CSV 未列出的 religion", report.unlisted_religions, limit)
+    _print_section("pop 使用了 CSV 未列出的 pop type", report.unlisted_pop_types, limit)
+    _print_section("Primary_Culture 不是人口最多的文化（实际最多者）", report.wrong_primary_culture, limit)
+    _print_section("Primary_Religion 不是人口最多的宗教（实际最多者）", report.wrong_primary_religion, limit)
+    _print_section("CSV 中有记录但没有 pop", dict.fromkeys(report.rows_without_pops, ""), limit)
+    _print_section("有 pop 但 CSV 中没有记录", dict.fromkeys(report.pops_without_rows, ""), limit)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools check-pops",
+        description="检查 location_culture_religion.csv 与 06_pops.txt 是否一致。",
+    )
+    parser.add_argument("--csv", type=Path, default=CSV_FILE, help="CSV 路径")
+    parser.add_argument(
+        "--write-csv",
+        nargs="?",
+        type=Path,
+        const=True,
+        default=None,
+        help="从当前人口重新生成 CSV（不给路径时覆盖 --csv 指定的文件）；写入前记入快照，可用 tools undo 撤销",
+    )
+    parser.add_argument("--limit", type=int, default=20, help="每类问题最多显示的条目数")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    scaler = AreaPopulationScaler()
+    populations = scaler.parse_populations()
+    pops = aggregate_pops(populations)
+
+    if args.write_csv:
+        if scaler.vfs.is_fixture(scaler.pops_file):
+            print(f"[错误] {scaler.pops_file} 来自离线 fixture（替身数据），不能据此重新生成 CSV；找到原版游戏目录后再运行")
+            return 1
+        path = args.csv if args.write_csv is True else args.write_csv
+        count = write_csv(pops, path)
+        print(f"[完成] 已写入 {count} 行：{path}（{time.perf_counter() - started:.3f}s）")
+        return 0
+
+    rows = load_csv(args.csv)
+    report = check(rows, pops)
+    print_report(report, args.limit)
+    elapsed = time.perf_counter() - started
+    print(f"\n[完成] CSV {len(rows)} 行，pop {len(pops)} 个 location，发现 {report.problem_count} 处问题（{elapsed:.3f}s）")
+    return 1 if report.problem_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+人口汇总（rollup）物化
+
+按 06_pops.txt 与 definitions.txt 的内容哈希构建一次全图汇总：
+location / province / area / region 各级的总人口，以及按 pop type、
+culture、religion 的细分。汇总以 pickle 形式缓存在 tools/.cache 中，
+两个输入文件不变时直接加载。
+
+缩放等写入人口的命令通过 update_locations() 只对受影响的 location
+做增量更新（先从上级汇总中减去旧值，再加上新值），无需重新统计全图。
+
+用法：
+    python -m tools rollup region east_china_region
+    python -m tools rollup area jiangxi_area --top 5
+    python -m tools rollup --csv rollup.csv [--level area]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import pickle
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pdx_script import Block
+from pdx_writer import atomic_text
+from scale_pops import SIZE_PRECISION, AreaPopulationScaler
+from vfs import cache_path
+
+LEVELS = ("location", "province", "area", "region")
+DIMENSIONS = ("type", "culture", "religion")
+CACHE_FILE = "pop_rollup.pickle"
+CACHE_VERSION = 1
+
+# {"total": float, "type": {...}, "culture": {...}, "religion": {...}}
+Totals = Dict[str, object]
+
+
+def empty_totals() -> Totals:
+    return {"total": 0.0, "type": {}, "culture": {}, "religion": {}}
+
+
+def _accumulate(totals: Totals, pop: Dict) -> None:
+    size = pop["size"]
+    totals["total"] += size
+    for dimension in DIMENSIONS:
+        bucket = totals[dimension]
+        value = pop[dimension]
+        bucket[value] = bucket.get(value, 0.0) + size
+
+
+def _merge(target: Totals, source: Totals, sign: float = 1.0) -> None:
+    target["total"] += source["total"] * sign
+    for dimension in DIMENSIONS:
+        bucket = target[dimension]
+        for value, size in source[dimension].items():
+            bucket[value] = bucket.get(value, 0.0) + size * sign
+            if abs(bucket[value]) < 1e-9:
+                del bucket[value]
+
+
+def build_geography(document: Block) -> Dict[str, Tuple[str, str, str]]:
+    """从 definitions.txt 解析树得到 location -> (province, area, region)"""
+    parents: Dict[str, Tuple[str, str, str]] = {}
+
+    def visit(block: Block, region: str, area: str) -> None:
+        for entry in block:
+            if not entry.is_block or entry.key is None:
+                continue
+            key = entry.key
+            if key.endswith("_province"):
+                for location in entry.value.values():
+                    if isinstance(location, str):
+                        parents[location] = (key, area, region)
+            elif key.endswith("_area"):
+                visit(entry.value, region, key)
+            elif key.endswith("_region"):
+                visit(entry.value, key, area)
+            else:
+                visit(entry.value, region, area)
+
+    visit(document, "", "")
+    return parents
+
+
+class PopRollup:
+    """各级人口汇总；levels[level][name] -> Totals"""
+
+    def __init__(self, parents: Dict[str, Tuple[str, str, str]]):
+        self.parents = parents
+        self.levels: Dict[str, Dict[str, Totals]] = {level: {} for level in LEVELS}
+        self.key: Tuple[str, str] = ("", "")
+
+    @classmethod
+    def build(
+        cls,
+        populations: Dict[str, List[Dict]],
+        parents: Dict[str, Tuple[str, str, str]],
+    ) -> "PopRollup":
+        rollup = cls(parents)
+        for location, pops in populations.items():
+            totals = empty_totals()
+            for pop in pops:
+                _accumulate(totals, pop)
+            rollup.levels["location"][location] = totals
+            rollup._propagate(location, totals, 1.0)
+        return rollup
+
+    def _propagate(self, location: str, totals: Totals, sign: float) -> None:
+        for level, name in zip(LEVELS[1:], self.parents.get(location, ("", "", ""))):
+            if not name:
+                continue
+            bucket = self.levels[level].get(name)
+            if bucket is None:
+                bucket = self.levels[level][name] = empty_totals()
+            _merge(bucket, totals, sign)
+
+    def get(self, level: str, name: str) -> Totals:
+        return self.levels[level].get(name) or empty_totals()
+
+    def total(self, level: str, name: str) -> float:
+        return self.get(level, name)["total"]
+
+    def total_of(self, locations: Iterable[str]) -> float:
+        table = self.levels["location"]
+        return sum(table[location]["total"] for location in locations if location in table)
+
+    def update_locations(self, populations: Dict[str, List[Dict]]) -> None:
+        """增量更新：只重算给定 location 并修正其上级汇总"""
+        table = self.levels["location"]
+        for location, pops in populations.items():
+            old = table.get(location)
+            if old is not None:
+                self._propagate(location, old, -1.0)
+            totals = empty_totals()
+            for pop in pops:
+                _accumulate(totals, pop)
+            table[location] = totals
+            self._propagate(location, totals, 1.0)
+
+    def save(self, key: Tuple[str, str]) -> Path:
+        self.key = key
+        path = cache_path(CACHE_FILE)
+        payload = (CACHE_VERSION, key, self.parents, self.levels)
+        with open(path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @classmethod
+    def load(cls, key: Tuple[str, str]) -> Optional["PopRollup"]:
+        path = cache_path(CACHE_FILE)
+        try:
+            with open(path, "rb") as f:
+                version, cached_key, parents, levels = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != CACHE_VERSION or tuple(cached_key) != tuple(key):
+            return None
+        rollup = cls(parents)
+        rollup.levels = levels
+        rollup.key = key
+        return rollup
+
+    def export_csv(self, path: Path, levels: Iterable[str] = LEVELS) -> int:
+        """长表格式：level,name,dimension,value,size；dimension=total 为总人口"""
+        count = 0
+        with atomic_text(path, encoding="utf-8-sig") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["level", "name", "dimension", "value", "size"])
+            for level in levels:
+                for name in sorted(self.levels[level]):
+                    totals = self.levels[level][name]
+                    writer.writerow([level, name, "total", "", f"{totals['total']:.3f}"])
+                    for dimension in DIMENSIONS:
+                        for value in sorted(totals[dimension]):
+                            writer.writerow([level, name, dimension, value, f"{totals[dimension][value]:.3f}"])
+                    count += 1
+        return count
+
+
+def source_key(scaler: AreaPopulationScaler) -> Tuple[str, str]:
+    """(pops 哈希, definitions 哈希)，作为缓存键"""
+    vfs = scaler.vfs
+    return (
+        hashlib.sha1(vfs.read_bytes(scaler.pops_file)).hexdigest(),
+        hashlib.sha1(vfs.read_bytes(scaler.definitions_file)).hexdigest(),
+    )
+
+
+def load_rollup(scaler: AreaPopulationScaler) -> PopRollup:
+    """读取缓存的汇总；输入变化或缓存缺失时重新构建并保存"""
+    key = source_key(scaler)
+    rollup = PopRollup.load(key)
+    if rollup is not None:
+        return rollup
+    populations = scaler.populations or scaler.parse_populations()
+    parents = build_geography(scaler.vfs.parse(scaler.definitions_file))
+    rollup = PopRollup.build(populations, parents)
+    rollup.save(key)
+    return rollup
+
+
+def refresh_rollup(
+    rollup: PopRollup,
+    scaler: AreaPopulationScaler,
+    populations: Dict[str, List[Dict]],
+) -> None:
+    """写入人口文件后调用：增量更新受影响的 location 并以新哈希保存"""
+    # 与 update_pops_file 写出的小数位数保持一致，避免汇总与文件内容漂移
+    written = {
+        location: [dict(pop, size=float(f"{pop['size']:.{SIZE_PRECISION}f}")) for pop in pops]
+        for location, pops in populations.items()
+    }
+    rollup.update_locations(written)
+    rollup.save(source_key(scaler))
+
+
+def print_totals(level: str, name: str, totals: Totals, top: int) -> None:
+    print(f"{level} {name}: {totals['total']:.3f}")
+    for dimension in DIMENSIONS:
+        bucket = totals[dimension]
+        if not bucket:
+            continue
+        ranked = sorted(bucket.items(), key=lambda item: -item[1])
+        shown = ", ".join(f"{value} {size:.3f}" for value, size in ranked[:top])
+        more = f" ... 共 {len(ranked)} 项" if len(ranked) > top else ""
+        print(f"  {dimension:<9} {shown}{more}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools rollup",
+        description="查询或导出各级人口汇总。",
+    )
+    parser.add_argument("level", nargs="?", choices=LEVELS, help="汇总层级")
+    parser.add_argument("name", nargs="?", help="location/province/area/region 名称")
+    parser.add_argument("--top", type=int, default=10, help="每个细分维度显示的条目数")
+    parser.add_argument("--csv", type=Path, default=None, help="导出为 CSV")
+    parser.add_argument("--level", dest="csv_levels", action="append", choices=LEVELS,
+                        help="导出 CSV 时只包含指定层级（可重复）")
+    args = parser.parse_args(argv)
+
+    rollup = load_rollup(AreaPopulationScaler())
+
+    if args.csv:
+        count = rollup.export_csv(args.csv, args.csv_levels or LEVELS)
+        print(f"[完成] 已导出 {count} 个汇总单元：{args.csv}")
+        return 0
+
+    if not args.level:
+        for level in LEVELS:
+            print(f"{level:<9} {len(rollup.levels[level]):>6} 个")
+        return 0
+    if not args.name:
+        ranked = sorted(rollup.levels[args.level].items(), key=lambda item: -item[1]["total"])
+        for name, totals in ranked[: args.top]:
+            print(f"  {name:<32} {totals['total']:>12.3f}")
+        return 0
+    if args.name not in rollup.levels[args.level]:
+        print(f"未找到 {args.level}: {args.name}")
+        return 1
+    print_totals(args.level, args.name, rollup.levels[args.level][args.name], args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
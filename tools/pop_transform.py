@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量人口变换
+
+在整张人口表上一次性执行大量声明式规则，例如：
+    - 把某 area 中 5% 的 han_culture 农民转为 hui_muslim_culture；
+    - 按 docs/ming_pop_structure_ratios.md 把 2% 的农民转为 nobles_estate；
+    - 把一个 pop 拆分到两种宗教；
+    - 对选中的 pop 整体乘以系数。
+
+每条规则由"选择器 + 操作"组成。人口表按列存储并对 location/type/culture/religion
+建立倒排索引，选择器只需对索引做交集；变换产生的同键 pop 自动合并。
+全部规则执行完后只写一次文件，并只替换受影响的 location。
+
+规则文件使用 PDX 脚本语法：
+
+    convert = {
+        area = jiangxi_area
+        culture = han_culture
+        type = peasants
+        fraction = 0.05
+        to = { culture = hui_muslim_culture religion = sunni }
+    }
+    split = {
+        region = east_china_region
+        religion = sanjiao
+        part = { fraction = 0.3 religion = mahayana }
+        part = { fraction = 0.1 religion = taoism }
+    }
+    scale = { location = { nanchang xinjian } factor = 1.2 }
+
+选择器字段（可写单值或 `{ a b c }` 列表，缺省表示不限）：
+    region / area / location / type / culture / religion
+
+用法：
+    python -m tools transform rules.txt [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from pdx_script import Block, parse_file, unquote
+from pop_rollup import load_rollup, refresh_rollup
+from scale_pops import AreaPopulationScaler
+
+POP_ATTRIBUTES = ("type", "culture", "religion")
+INDEXED_COLUMNS = ("location",) + POP_ATTRIBUTES
+
+# 写回时小于该值的 pop 视为已清空（输出保留三位小数）
+EMPTY_SIZE = 0.0005
+
+PopKey = Tuple[str, str, str, str]
+
+
+class PopTable:
+    """按列存储的人口表，(location, type, culture, religion) 唯一"""
+
+    def __init__(self) -> None:
+        self.location: List[str] = []
+        self.type: List[str] = []
+        self.culture: List[str] = []
+        self.religion: List[str] = []
+        self.size = array("d")
+        self._rows: Dict[PopKey, int] = {}
+        self._index: Dict[str, Dict[str, List[int]]] = {
+            column: defaultdict(list) for column in INDEXED_COLUMNS
+        }
+        self._location_order: Dict[str, int] = {}
+
+    @classmethod
+    def from_populations(cls, populations: Dict[str, List[Dict]]) -> "PopTable":
+        table = cls()
+        for location, pops in populations.items():
+            for pop in pops:
+                table.add(location, pop["type"], pop["culture"], pop["religion"], pop["size"])
+        return table
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def add(self, location: str, pop_type: str, culture: str, religion: str, size: float) -> int:
+        """加入一个 pop；同键 pop 已存在时合并人口，返回行号"""
+        key = (location, pop_type, culture, religion)
+        row = self._rows.get(key)
+        if row is not None:
+            self.size[row] += size
+            return row
+        row = len(self.size)
+        self._rows[key] = row
+        self.location.append(location)
+        self.type.append(pop_type)
+        self.culture.append(culture)
+        self.religion.append(religion)
+        self.size.append(size)
+        index = self._index
+        index["location"][location].append(row)
+        index["type"][pop_type].append(row)
+        index["culture"][culture].append(row)
+        index["religion"][religion].append(row)
+        self._location_order.setdefault(location, len(self._location_order))
+        return row
+
+    def key(self, row: int) -> PopKey:
+        return (self.location[row], self.type[row], self.culture[row], self.religion[row])
+
+    def select(self, **criteria: Optional[Iterable[str]]) -> List[int]:
+        """按列取值筛选行；criteria 的值为 None 表示该列不限"""
+        candidates: List[Set[int]] = []
+        for column, values in criteria.items():
+            if values is None:
+                continue
+            index = self._index[column]
+            rows: Set[int] = set()
+            for value in values:
+                rows.update(index.get(value, ()))
+            if not rows:
+                return []
+            candidates.append(rows)
+        if not candidates:
+            return list(range(len(self.size)))
+        candidates.sort(key=len)
+        result = candidates[0]
+        for rows in candidates[1:]:
+            result = result & rows
+            if not result:
+                return []
+        return sorted(result)
+
+    def location_total(self, location: str) -> float:
+        return sum(self.size[row] for row in self._index["location"].get(location, ()))
+
+    def to_populations(self, locations: Optional[Iterable[str]] = None) -> Dict[str, List[Dict]]:
+        """还原成 AreaPopulationScaler 使用的 {location: [pop, ...]} 结构"""
+        if locations is None:
+            locations = sorted(self._location_order, key=self._location_order.get)
+        result: Dict[str, List[Dict]] = {}
+        for location in locations:
+            pops = []
+            for row in self._index["location"].get(location, ()):
+                if self.size[row] < EMPTY_SIZE:
+                    continue
+                pops.append({
+                    "type": self.type[row],
+                    "size": self.size[row],
+                    "culture": self.culture[row],
+                    "religion": self.religion[row],
+                })
+            result[location] = pops
+        return result
+
+
+@dataclass
+class Selector:
+    """规则的选择条件；空元组表示该维度不限"""
+
+    regions: Tuple[str, ...] = ()
+    areas: Tuple[str, ...] = ()
+    locations: Tuple[str, ...] = ()
+    types: Tuple[str, ...] = ()
+    cultures: Tuple[str, ...] = ()
+    religions: Tuple[str, ...] = ()
+
+
+@dataclass
+class Rule:
+    """
+    一条变换规则：先把选中的 pop 乘以 factor，再把 parts 中每一份
+    (比例, 属性改动) 转移到新的 type/culture/religion 上，剩余部分保持不变。
+    """
+
+    selector: Selector
+    parts: List[Tuple[float, Dict[str, str]]] = field(default_factory=list)
+    factor: float = 1.0
+    name: str = ""
+
+    def validate(self) -> None:
+        if self.factor < 0:
+            raise ValueError(f"规则 {self.name}：factor 不能为负数")
+        total = 0.0
+        for fraction, changes in self.parts:
+            if fraction < 0:
+                raise ValueError(f"规则 {self.name}：fraction 不能为负数")
+            unknown = set(changes) - set(POP_ATTRIBUTES)
+            if unknown:
+                raise ValueError(f"规则 {self.name}：无法修改属性 {', '.join(sorted(unknown))}")
+            if not changes:
+                raise ValueError(f"规则 {self.name}：转移目标没有任何属性改动")
+            total += fraction
+        if total > 1.0 + 1e-9:
+            raise ValueError(f"规则 {self.name}：转移比例之和 {total:.4f} 超过 1")
+
+
+@dataclass
+class RuleReport:
+    rule: Rule
+    matched_pops: int = 0
+    population_touched: float = 0.0
+    population_moved: float = 0.0
+    population_delta: float = 0.0
+
+
+class PopTransformer:
+    """对 PopTable 执行规则，并记录受影响的 location"""
+
+    def __init__(self, table: PopTable, scaler: AreaPopulationScaler):
+        self.table = table
+        self.scaler = scaler
+        self.changed_locations: Set[str] = set()
+        self._region_cache: Dict[str, List[str]] = {}
+
+    def resolve_locations(self, selector: Selector) -> Optional[Set[str]]:
+        """把 region/area/location 条件展开成 location 集合；都为空时返回 None"""
+        if not (selector.regions or selector.areas or selector.locations):
+            return None
+        if not self.scaler.areas:
+            self.scaler.parse_definitions()
+        locations: Set[str] = set(selector.locations)
+        areas = list(selector.areas)
+        for region in selector.regions:
+            if region not in self._region_cache:
+                region_areas = self.scaler.get_region_areas(region)
+                if not region_areas:
+                    raise ValueError(f"未找到 region: {region}")
+                self._region_cache[region] = region_areas
+            areas.extend(self._region_cache[region])
+        for area in areas:
+            if area not in self.scaler.areas:
+                raise ValueError(f"未找到 area: {area}")
+            locations.update(self.scaler.areas[area])
+        return locations
+
+    def apply(self, rule: Rule) -> RuleReport:
+        rule.validate()
+        table = self.table
+        selector = rule.selector
+        rows = table.select(
+            location=self.resolve_locations(selector),
+            type=selector.types or None,
+            culture=selector.cultures or None,
+            religion=selector.religions or None,
+        )
+        report = RuleReport(rule, matched_pops=len(rows))
+        size = table.size
+        keep = 1.0 - sum(fraction for fraction, _ in rule.parts)
+        # 转移出的人口可能并入同样被选中、尚未处理的行；先记下规则开始前的人口，
+        # 每行只按这份快照变换，并入的部分原样保留，不会在同一条规则里被再处理一次
+        originals = [size[row] for row in rows]
+        for row, original in zip(rows, originals):
+            if original <= 0:
+                continue
+            scaled = original * rule.factor
+            location, pop_type, culture, religion = table.key(row)
+            size[row] += scaled * keep - original
+            for fraction, changes in rule.parts:
+                moved = scaled * fraction
+                table.add(
+                    location,
+                    changes.get("type", pop_type),
+                    changes.get("culture", culture),
+                    changes.get("religion", religion),
+                    moved,
+                )
+                report.population_moved += moved
+            report.population_touched += original
+            report.population_delta += scaled - original
+            self.changed_locations.add(location)
+        return report
+
+    def apply_all(self, rules: Sequence[Rule]) -> List[RuleReport]:
+        """按顺序执行全部规则，后一条规则看到前一条的结果"""
+        return [self.apply(rule) for rule in rules]
+
+
+def _words(value) -> Tuple[str, ...]:
+    if isinstance(value, Block):
+        return tuple(str(unquote(v)) for v in value.values() if isinstance(v, str))
+    return (str(unquote(value)),)
+
+
+def _changes(block: Block) -> Dict[str, str]:
+    return {key: str(unquote(value)) for key, value in block.items() if key in POP_ATTRIBUTES}
+
+
+SELECTOR_FIELDS = {
+    "region": "regions",
+    "area": "areas",
+    "location": "locations",
+    "type": "types",
+    "culture": "cultures",
+    "religion": "religions",
+}
+
+
+def rule_from_block(kind: str, block: Block, line: int) -> Rule:
+    """把规则文件中的一个块转换成 Rule"""
+    name = f"{kind}@{line}"
+    selector_values: Dict[str, List[str]] = defaultdict(list)
+    parts: List[Tuple[float, Dict[str, str]]] = []
+    factor = 1.0
+    fraction = None
+    target: Dict[str, str] = {}
+    for key, value in block.items():
+        if key in SELECTOR_FIELDS:
+            selector_values[SELECTOR_FIELDS[key]].extend(_words(value))
+        elif key == "name":
+            name = str(unquote(value))
+        elif key == "factor":
+            factor = float(value)
+        elif key == "fraction":
+            fraction = float(value)
+        elif key == "to" and isinstance(value, Block):
+            target = _changes(value)
+        elif key == "part" and isinstance(value, Block):
+            parts.append((float(value.get("fraction", 0)), _changes(value)))
+        else:
+            raise ValueError(f"规则 {name}：无法识别的字段 {key}")
+    if kind == "convert":
+        if fraction is None:
+            raise ValueError(f"规则 {name}：convert 需要 fraction")
+        parts = [(fraction, target)]
+    elif kind == "split":
+        if not parts:
+            raise ValueError(f"规则 {name}：split 至少需要一个 part")
+    elif kind != "scale":
+        raise ValueError(f"无法识别的规则类型：{kind}（第 {line} 行）")
+    selector = Selector(**{k: tuple(v) for k, v in selector_values.items()})
+    return Rule(selector=selector, parts=parts, factor=factor, name=name)
+
+
+def load_rules(path: str) -> List[Rule]:
+    document = parse_file(path)
+    if document.errors:
+        raise ValueError(f"规则文件解析失败：{document.errors[0]}")
+    rules = []
+    for entry in document:
+        if not entry.is_block or entry.key is None:
+            raise ValueError(f"第 {entry.line} 行：规则必须写成 类型 = {{ ... }}")
+        rules.append(rule_from_block(entry.key, entry.value, entry.line))
+    return rules
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools transform",
+        description="按规则文件批量变换 06_pops.txt 中的人口。",
+    )
+    parser.add_argument("rules", help="PDX 脚本格式的规则文件")
+    parser.add_argument("--dry-run", action="store_true", help="只输出统计，不写文件")
+    parser.add_argument("--no-backup", action="store_true", help="写文件时不记录快照（无法用 tools undo 撤销）")
+    args = parser.parse_args(argv)
+
+    rules = load_rules(args.rules)
+    scaler = AreaPopulationScaler()
+    table = PopTable.from_populations(scaler.parse_populations())
+    rollup = load_rollup(scaler)
+    transformer = PopTransformer(table, scaler)
+    reports = transformer.apply_all(rules)
+
+    print(f"\n共执行 {len(reports)} 条规则：")
+    for report in reports:
+        print(
+            f"  {report.rule.name:<24} 命中 {report.matched_pops:>5} 个 pop"
+            f"  涉及人口 {report.population_touched:>10.3f}"
+            f"  转移 {report.population_moved:>10.3f}"
+            f"  增减 {report.population_delta:>+10.3f}"
+        )
+    print(f"受影响的 locations: {len(transformer.changed_locations)}")
+
+    if args.dry_run or not transformer.changed_locations:
+        return 0
+    if scaler.vfs.is_fixture(scaler.pops_file):
+        print(f"\n[错误] {scaler.pops_file} 来自离线 fixture（替身数据），不写入 mod；找到原版游戏目录后再运行，或用 --dry-run 预览")
+        return 1
+
+    changed = table.to_populations(sorted(transformer.changed_locations))
+    comment = f"Transformed by {len(rules)} rules from {args.rules}"
+    before_total = rollup.total_of(changed)
+    updated_file = scaler.update_pops_file(changed, comment, backup=not args.no_backup)
+    refresh_rollup(rollup, scaler, changed)
+    print(f"\n[成功] 已更新文件: {updated_file}")
+    print(f"[汇总] 受影响 locations 总人口: {before_total:.3f} -> {rollup.total_of(changed):.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
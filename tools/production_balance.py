@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产链平衡求解
+
+把 docs/building_input_output.csv 中每个生产方式的产出与投入整理成
+商品 × 生产方式 的产出矩阵 OUT 与投入矩阵 IN，再把开局各 location 的
+建筑（town_setup 展开 + building_manager 中单独放置的建筑，按等级计）
+汇总成 生产方式 × 市场 的数量矩阵 C，一次矩阵乘法得到每个市场、
+每种商品的产量 OUT·C 与消耗 IN·C，从而给出盈余与缺口。
+
+- 产量只包含 CSV 中的建筑；原材料由 location 的 RGO 产出，不在统计范围内，
+  因此原材料一栏反映的是建筑对它的需求；
+- 建筑默认使用 CSV 中该建筑列出的第一个生产方式，可用 --swap 覆盖；
+  what-if 只是把 C 中的若干行合并到另一行后重算，不重新读取文件。
+- 市场归属由游戏按距离动态计算，setup 中只有市场中心（03_markets.txt
+  的 add_market）。这里近似为：与市场中心同 area 者归该市场，其次同 region，
+  都不满足的计入"未归属"。definitions.txt 只覆盖部分地区时未归属会较多。
+- 装有 NumPy 时使用稠密矩阵乘法；否则退回纯 Python 的稀疏计算，结果相同。
+
+用法：
+    python -m tools balance
+    python -m tools balance --market dadu --top 15
+    python -m tools balance --swap cloth_workshop=wool_cloth_workshop_maintenance
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pdx_script import Block
+from pop_rollup import build_geography
+from vfs import MOD_ROOT, VirtualFileSystem, get_vfs
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+METHODS_CSV = MOD_ROOT / "docs" / "building_input_output.csv"
+DEFINITIONS_FILE = "in_game/map_data/definitions.txt"
+SETUP_DIR = "main_menu/setup/start"
+TOWN_SETUP_DIR = "in_game/common/town_setups"
+MARKET_FILE_PREFIX = "03"
+BUILDING_FILE_PREFIX = "07"
+UNASSIGNED = "（未归属）"
+MERGE_MODES = {"INJECT", "TRY_INJECT"}
+
+
+@dataclass(frozen=True)
+class Method:
+    building: str
+    name: str
+    output_good: str
+    output_amount: float
+    inputs: Tuple[Tuple[str, float], ...]
+
+
+def parse_inputs(text: str) -> Tuple[Tuple[str, float], ...]:
+    """`lumber:0.25, tools:0.1` -> (("lumber", 0.25), ("tools", 0.1))"""
+    inputs = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        good, _, amount = part.partition(":")
+        try:
+            inputs.append((good.strip(), float(amount)))
+        except ValueError:
+            raise ValueError(f"无法解析投入：{part}") from None
+    return tuple(inputs)
+
+
+def load_methods(path: Path = METHODS_CSV) -> Dict[str, List[Method]]:
+    """建筑 -> 生产方式列表（保持 CSV 中的顺序，第一个为默认）"""
+    methods: Dict[str, List[Method]] = defaultdict(list)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            building = (row.get("building_name") or "").strip()
+            if not building:
+                continue
+            methods[building].append(
+                Method(
+                    building=building,
+                    name=row["method_name"].strip(),
+                    output_good=row["output_good"].strip(),
+                    output_amount=float(row["output_amount"]),
+                    inputs=parse_inputs(row.get("inputs") or ""),
+                )
+            )
+    return dict(methods)
+
+
+def _levels(block: Block) -> Dict[str, float]:
+    levels = {}
+    for key, value in block.items():
+        if isinstance(value, str):
+            try:
+                levels[key] = float(value)
+            except ValueError:
+                continue
+    return levels
+
+
+def load_town_setups(vfs: VirtualFileSystem) -> Dict[str, Dict[str, float]]:
+    """town_setup 名称 -> {建筑: 等级}；支持 REPLACE: / INJECT: 前缀"""
+    setups: Dict[str, Dict[str, float]] = {}
+    for logical in vfs.listdir(TOWN_SETUP_DIR, (".txt",)):
+        for entry in vfs.parse(logical):
+            if not entry.is_block or entry.key is None:
+                continue
+            mode, _, name = entry.key.rpartition(":")
+            levels = _levels(entry.value)
+            if mode in MERGE_MODES and name in setups:
+                setups[name].update(levels)
+            else:
+                setups[name] = levels
+    return setups
+
+
+def setup_files(vfs: VirtualFileSystem, prefix: str) -> List[str]:
+    return [
+        logical for logical in vfs.listdir(SETUP_DIR, (".txt",))
+        if logical.rsplit("/", 1)[-1].startswith(prefix)
+    ]
+
+
+def load_placements(
+    vfs: VirtualFileSystem,
+    setups: Dict[str, Dict[str, float]],
+) -> Tuple[Dict[str, Dict[str, float]], Dict[str, int]]:
+    """location -> {建筑: 等级}，以及未定义的 town_setup -> 使用次数"""
+    town_setup: Dict[str, str] = {}
+    placed: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for logical in setup_files(vfs, BUILDING_FILE_PREFIX):
+        document = vfs.parse(logical)
+        locations = document.get("locations")
+        if isinstance(locations, Block):
+            for entry in locations:
+                if entry.is_block and entry.key:
+                    setup = entry.value.get("town_setup")
+                    if isinstance(setup, str):
+                        town_setup[entry.key] = setup
+        manager = document.get("building_manager")
+        if isinstance(manager, Block):
+            for entry in manager:
+                if not entry.is_block or entry.key is None:
+                    continue
+                location = entry.value.get("location")
+                if not isinstance(location, str):
+                    continue
+                try:
+                    level = float(entry.value.get("level", "1"))
+                except ValueError:
+                    level = 1.0
+                placed[location][entry.key] = level
+
+    missing: Dict[str, int] = defaultdict(int)
+    buildings: Dict[str, Dict[str, float]] = {}
+    for location, setup in town_setup.items():
+        if setup in setups:
+            buildings[location] = dict(setups[setup])
+        else:
+            missing[setup] += 1
+    for location, levels in placed.items():
+        buildings.setdefault(location, {}).update(levels)
+    return buildings, dict(missing)
+
+
+def load_markets(vfs: VirtualFileSystem) -> List[str]:
+    centers: List[str] = []
+    for logical in setup_files(vfs, MARKET_FILE_PREFIX):
+        manager = vfs.parse(logical).get("market_manager")
+        if not isinstance(manager, Block):
+            continue
+        for entry in manager:
+            if entry.key == "add_market" and isinstance(entry.value, str) and entry.value not in centers:
+                centers.append(entry.value)
+    return centers
+
+
+def assign_markets(
+    locations: Iterable[str],
+    centers: Sequence[str],
+    parents: Dict[str, Tuple[str, str, str]],
+) -> Dict[str, str]:
+    """location -> 市场中心；先按同 area，再按同 region 近似"""
+    by_area: Dict[str, str] = {}
+    by_region: Dict[str, str] = {}
+    for center in centers:
+        if center in parents:
+            _, area, region = parents[center]
+            by_area.setdefault(area, center)
+            by_region.setdefault(region, center)
+    result = {}
+    for location in locations:
+        if location in centers:
+            result[location] = location
+            continue
+        geography = parents.get(location)
+        market = None
+        if geography:
+            market = by_area.get(geography[1]) or by_region.get(geography[2])
+        result[location] = market or UNASSIGNED
+    return result
+
+
+@dataclass
+class Balance:
+    """solve() 的结果：production/consumption[商品序号][市场序号]"""
+
+    goods: List[str]
+    markets: List[str]
+    production: List[List[float]]
+    consumption: List[List[float]]
+
+    def net(self, good: int, market: int) -> float:
+        return self.production[good][market] - self.consumption[good][market]
+
+    def world(self, good: int) -> Tuple[float, float]:
+        return sum(self.production[good]), sum(self.consumption[good])
+
+    def market_rows(self, market: int) -> List[Tuple[str, float, float]]:
+        return [
+            (good, self.production[g][market], self.consumption[g][market])
+            for g, good in enumerate(self.goods)
+        ]
+
+
+@dataclass
+class ProductionModel:
+    methods: List[Method]
+    markets: List[str]
+    goods: List[str] = field(default_factory=list)
+    # 稀疏列：生产方式序号 -> [(商品序号, 数量)]
+    outputs: List[List[Tuple[int, float]]] = field(default_factory=list)
+    inputs: List[List[Tuple[int, float]]] = field(default_factory=list)
+    # 数量矩阵 C 的稀疏行：生产方式序号 -> {市场序号: 建筑等级合计}
+    counts: List[Dict[int, float]] = field(default_factory=list)
+    method_index: Dict[str, int] = field(default_factory=dict)
+    building_methods: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls,
+        methods: Dict[str, List[Method]],
+        buildings: Dict[str, Dict[str, float]],
+        market_of: Dict[str, str],
+    ) -> "ProductionModel":
+        flat = [method for building in sorted(methods) for method in methods[building]]
+        goods = sorted(
+            {method.output_good for method in flat}
+            | {good for method in flat for good, _ in method.inputs}
+        )
+        markets = sorted(set(market_of.values()))
+        model = cls(flat, markets, goods)
+        good_index = {good: i for i, good in enumerate(goods)}
+        market_index = {market: i for i, market in enumerate(markets)}
+        for j, method in enumerate(flat):
+            model.method_index[method.name] = j
+            model.building_methods.setdefault(method.building, []).append(j)
+            model.outputs.append([(good_index[method.output_good], method.output_amount)])
+            model.inputs.append([(good_index[good], amount) for good, amount in method.inputs])
+            model.counts.append({})
+        for location, levels in buildings.items():
+            k = market_index[market_of[location]]
+            for building, level in levels.items():
+                indices = model.building_methods.get(building)
+                if indices:
+                    row = model.counts[indices[0]]
+                    row[k] = row.get(k, 0.0) + level
+        return model
+
+    def swap(self, building: str, method: str, markets: Optional[Iterable[str]] = None) -> float:
+        """把某建筑（可限定市场）全部改用指定生产方式，返回涉及的建筑等级合计"""
+        target = self.method_index.get(method)
+        if target is None or self.methods[target].building != building:
+            raise ValueError(f"{building} 没有生产方式 {method}")
+        columns = None
+        if markets is not None:
+            columns = {self.markets.index(market) for market in markets}
+        moved = 0.0
+        for j in self.building_methods[building]:
+            if j == target:
+                continue
+            row = self.counts[j]
+            for k in [k for k in row if columns is None or k in columns]:
+                level = row.pop(k)
+                self.counts[target][k] = self.counts[target].get(k, 0.0) + level
+                moved += level
+        return moved
+
+    def solve(self) -> Balance:
+        if np is not None:
+            return self._solve_numpy()
+        return self._solve_sparse()
+
+    def _solve_numpy(self) -> Balance:
+        shape = (len(self.goods), len(self.methods))
+        out_matrix = np.zeros(shape)
+        in_matrix = np.zeros(shape)
+        for j in range(len(self.methods)):
+            for g, amount in self.outputs[j]:
+                out_matrix[g, j] += amount
+            for g, amount in self.inputs[j]:
+                in_matrix[g, j] += amount
+        count_matrix = np.zeros((len(self.methods), len(self.markets)))
+        for j, row in enumerate(self.counts):
+            for k, level in row.items():
+                count_matrix[j, k] = level
+        return Balance(
+            self.goods,
+            self.markets,
+            (out_matrix @ count_matrix).tolist(),
+            (in_matrix @ count_matrix).tolist(),
+        )
+
+    def _solve_sparse(self) -> Balance:
+        width = len(self.markets)
+        production = [[0.0] * width for _ in self.goods]
+        consumption = [[0.0] * width for _ in self.goods]
+        for j, row in enumerate(self.counts):
+            if not row:
+                continue
+            for target, column in ((production, self.outputs[j]), (consumption, self.inputs[j])):
+                for g, amount in column:
+                    line = target[g]
+                    for k, level in row.items():
+                        line[k] += amount * level
+        return Balance(self.goods, self.markets, production, consumption)
+
+
+def load_model(vfs: Optional[VirtualFileSystem] = None) -> Tuple[ProductionModel, Dict[str, int], int]:
+    """返回 (模型, 未定义的 town_setup, 没有生产数据的建筑等级合计)"""
+    vfs = vfs or get_vfs()
+    methods = load_methods()
+    buildings, missing_setups = load_placements(vfs, load_town_setups(vfs))
+    parents = build_geography(vfs.parse(DEFINITIONS_FILE)) if vfs.exists(DEFINITIONS_FILE) else {}
+    market_of = assign_markets(buildings, load_markets(vfs), parents)
+    model = ProductionModel.build(methods, buildings, market_of)
+    unproductive = sum(
+        1 for levels in buildings.values() for building in levels if building not in methods
+    )
+    return model, missing_setups, unproductive
+
+
+def print_table(rows: List[Tuple[str, float, float]], top: int) -> None:
+    rows = [row for row in rows if row[1] or row[2]]
+    rows.sort(key=lambda row: row[1] - row[2])
+    print(f"  {'商品':<20}{'产量':>12}{'消耗':>12}{'盈余':>12}")
+    shown = rows if top <= 0 or len(rows) <= top * 2 else rows[:top] + rows[-top:]
+    for good, produced, consumed in shown:
+        print(f"  {good:<22}{produced:>12.2f}{consumed:>12.2f}{produced - consumed:>+12.2f}")
+    if len(shown) < len(rows):
+        print(f"  ……（共 {len(rows)} 种商品，只显示缺口与盈余最大的各 {top} 种）")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools balance",
+        description="按开局建筑计算各市场与全世界的商品盈余与缺口。",
+    )
+    parser.add_argument("--market", action="append", help="显示指定市场（市场中心 location，可重复）")
+    parser.add_argument(
+        "--swap", action="append", default=[], metavar="BUILDING=METHOD",
+        help="what-if：把某建筑全部改用指定生产方式（可重复）",
+    )
+    parser.add_argument("--top", type=int, default=10, help="每张表显示缺口与盈余最大的各 N 种商品（0 为全部）")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    model, missing_setups, unproductive = load_model()
+    loaded = time.perf_counter()
+    baseline = model.solve()
+    solved = time.perf_counter()
+
+    print(f"[载入] {len(model.methods)} 个生产方式，{len(model.goods)} 种商品，{len(model.markets)} 个市场"
+          f"（{(loaded - started) * 1000:.0f} ms，求解 {(solved - loaded) * 1000:.1f} ms，"
+          f"{'NumPy' if np is not None else '纯 Python'}）")
+    if missing_setups:
+        shown = ", ".join(f"{name}×{count}" for name, count in sorted(missing_setups.items())[:8])
+        print(f"[提示] {len(missing_setups)} 个 town_setup 未找到定义（多为原版定义）：{shown}")
+    if unproductive:
+        print(f"[提示] {unproductive} 处建筑不在 CSV 中（无生产数据），已忽略")
+
+    balance = baseline
+    if args.swap:
+        for spec in args.swap:
+            building, _, method = spec.partition("=")
+            try:
+                moved = model.swap(building.strip(), method.strip())
+            except ValueError as e:
+                print(f"[错误] {e}")
+                return 1
+            print(f"[what-if] {building} -> {method}：涉及 {moved:.0f} 级建筑")
+        started = time.perf_counter()
+        balance = model.solve()
+        print(f"[what-if] 重新求解 {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    print("\n全世界：")
+    rows = []
+    for g, good in enumerate(balance.goods):
+        produced, consumed = balance.world(g)
+        rows.append((good, produced, consumed))
+    print_table(rows, args.top)
+    if args.swap:
+        print("\nwhat-if 前后变化：")
+        for g, good in enumerate(balance.goods):
+            before = sum(baseline.production[g]) - sum(baseline.consumption[g])
+            after = sum(balance.production[g]) - sum(balance.consumption[g])
+            if abs(after - before) > 1e-9:
+                print(f"  {good:<22}{before:>+12.2f} -> {after:>+12.2f}")
+
+    for market in args.market or []:
+        if market not in balance.markets:
+            print(f"\n[错误] 没有市场 {market}（可用：{', '.join(balance.markets[:10])} ...）")
+            return 1
+        print(f"\n市场 {market}：")
+        print_table(balance.market_rows(balance.markets.index(market)), args.top)
+
+    if not args.market:
+        print("\n各市场最大缺口：")
+        for k, market in enumerate(balance.markets):
+            worst = min(range(len(balance.goods)), key=lambda g: balance.net(g, k))
+            deficit = balance.net(worst, k)
+            if deficit < 0:
+                print(f"  {market:<24}{balance.goods[worst]:<20}{deficit:>+12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全量往返校验与解析吞吐门禁
+
+对树中每个 .txt / .gui / .yml 文件执行"解析 -> 保留格式写回"，要求输出与
+原文逐字节相同（含注释、BOM、换行符）；同时按文件类别统计解析与写回的
+吞吐（MB/s），与仓库中的基线 roundtrip_baseline.json 比较。
+
+改写文件的工具（scale_pops、pop_transform、tools fmt）实际走的是 ScriptWriter.document
+的规范格式写回，因此 .txt / .gui 还要经过一次"解析 -> ScriptWriter -> 再解析"：
+结构须与原文语义相同、注释一条不少（与 tools fmt 的校验一致）。有解析错误的文件
+无法可靠地规范写回，只列出不计为失败。
+
+任一文件无法往返或规范写回、或某类吞吐低于基线超过容差时返回码为 1，可直接用作 CI 门禁。
+只校验游戏目录（与 load_profile 相同，跳过 tools/ 与 docs/）。
+
+用法：
+    python -m tools roundtrip                       # 校验 mod 并与基线比较
+    python -m tools roundtrip --root "$EU5_GAME_PATH"  # 校验原版（只看往返，不比吞吐）
+    python -m tools roundtrip --update-baseline     # 在当前机器上重新记录基线
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from localization import dump_localization, parse_localization_lines
+from pdx_script import RoundTripError, dump_preserving, parse_bytes
+from pdx_writer import atomic_text, format_bytes
+from vfs import MOD_ROOT, SCRIPT_DIR
+
+BASELINE_FILE = SCRIPT_DIR / "roundtrip_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+SKIP_DIRS = {".git", ".cache", "__pycache__", "tools", "docs"}
+
+# 文件类别 -> (解析函数, 写回函数)
+CODECS: Dict[str, Tuple[Callable, Callable]] = {
+    ".txt": (parse_bytes, dump_preserving),
+    ".gui": (parse_bytes, dump_preserving),
+    ".yml": (parse_localization_lines, dump_localization),
+}
+# 改写工具会以 ScriptWriter 规范格式写回的类别
+WRITER_SUFFIXES = {".txt", ".gui"}
+
+
+@dataclass
+class ClassStats:
+    files: int = 0
+    size: int = 0
+    parse_seconds: float = 0.0
+    write_seconds: float = 0.0
+    format_seconds: float = 0.0
+
+    @staticmethod
+    def _rate(size: int, seconds: float) -> float:
+        return size / 1e6 / seconds if seconds > 0 else 0.0
+
+    @property
+    def parse_rate(self) -> float:
+        return self._rate(self.size, self.parse_seconds)
+
+    @property
+    def write_rate(self) -> float:
+        return self._rate(self.size, self.write_seconds)
+
+    @property
+    def format_rate(self) -> float:
+        return self._rate(self.size, self.format_seconds)
+
+
+@dataclass
+class RoundTripResult:
+    stats: Dict[str, ClassStats] = field(default_factory=dict)
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    # ScriptWriter 写回后结构改变或丢失注释
+    writer_failures: List[Tuple[str, str]] = field(default_factory=list)
+    # 有解析错误、改写工具会拒绝处理的文件
+    writer_skipped: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def find_files(root: Path) -> List[Path]:
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in CODECS:
+                files.append(Path(dirpath) / name)
+    return files
+
+
+def first_difference(a: bytes, b: bytes) -> int:
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return i
+    return min(len(a), len(b))
+
+
+def check_file(data: bytes, suffix: str, repeat: int = 1) -> Tuple[Optional[str], float, float]:
+    """往返一个文件，返回 (失败原因, 最短解析耗时, 最短写回耗时)"""
+    parse, dump = CODECS[suffix]
+    parse_best = write_best = float("inf")
+    output = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        document = parse(data)
+        parsed = time.perf_counter()
+        try:
+            output = dump(document)
+        except (RoundTripError, UnicodeError) as e:
+            return str(e), parsed - started, 0.0
+        finished = time.perf_counter()
+        parse_best = min(parse_best, parsed - started)
+        write_best = min(write_best, finished - parsed)
+    if output != data:
+        offset = first_difference(data, output)
+        line = data.count(b"\n", 0, offset) + 1
+        return f"第 {line} 行（偏移 {offset}）写回结果与原文不同", parse_best, write_best
+    return None, parse_best, write_best
+
+
+def check_writer(data: bytes) -> Tuple[Optional[str], Optional[str], float]:
+    """规范格式写回一个脚本文件，返回 (失败原因, 跳过原因, 耗时)"""
+    if parse_bytes(data).errors:
+        return None, "存在解析错误，规范写回前需先修复（tools fmt 会拒绝处理）", 0.0
+    started = time.perf_counter()
+    try:
+        format_bytes(data)
+    except ValueError as e:
+        return str(e), None, time.perf_counter() - started
+    return None, None, time.perf_counter() - started
+
+
+def run(root: Path, repeat: int = 1) -> RoundTripResult:
+    result = RoundTripResult()
+    for path in find_files(root):
+        suffix = path.suffix.lower()
+        data = path.read_bytes()
+        try:
+            error, parse_seconds, write_seconds = check_file(data, suffix, repeat)
+        except UnicodeError as e:
+            error, parse_seconds, write_seconds = f"无法按 UTF-8 解码：{e}", 0.0, 0.0
+        logical = path.relative_to(root).as_posix()
+        if error:
+            result.failures.append((logical, error))
+        stats = result.stats.setdefault(suffix, ClassStats())
+        if suffix in WRITER_SUFFIXES and not error:
+            writer_error, skipped, seconds = check_writer(data)
+            if writer_error:
+                result.writer_failures.append((logical, writer_error))
+            elif skipped:
+                result.writer_skipped.append((logical, skipped))
+            stats.format_seconds += seconds
+        stats.files += 1
+        stats.size += len(data)
+        stats.parse_seconds += parse_seconds
+        stats.write_seconds += write_seconds
+    return result
+
+
+def load_baseline(path: Path = BASELINE_FILE) -> Dict:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(result: RoundTripResult, path: Path = BASELINE_FILE) -> None:
+    classes = {
+        suffix: {
+            "files": stats.files,
+            "bytes": stats.size,
+            "parse_mb_s": round(stats.parse_rate, 2),
+            "write_mb_s": round(stats.write_rate, 2),
+            **({"format_mb_s": round(stats.format_rate, 2)} if suffix in WRITER_SUFFIXES else {}),
+        }
+        for suffix, stats in sorted(result.stats.items())
+    }
+    with atomic_text(path) as f:
+        json.dump({"classes": classes}, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare_baseline(result: RoundTripResult, baseline: Dict, tolerance: float) -> List[str]:
+    """返回低于基线的吞吐项"""
+    regressions = []
+    for suffix, recorded in baseline.get("classes", {}).items():
+        stats = result.stats.get(suffix)
+        if stats is None:
+            continue
+        for label, key, measured in (
+            ("解析", "parse_mb_s", stats.parse_rate),
+            ("写回", "write_mb_s", stats.write_rate),
+            ("规范写回", "format_mb_s", stats.format_rate),
+        ):
+            floor = recorded.get(key, 0.0) * (1 - tolerance)
+            if measured < floor:
+                regressions.append(
+                    f"{suffix} {label}吞吐 {measured:.2f} MB/s 低于基线 "
+                    f"{recorded[key]:.2f} MB/s（容差 {tolerance:.0%}）"
+                )
+    return regressions
+
+
+def print_stats(result: RoundTripResult) -> None:
+    print(f"{'类别':<6}{'文件数':>8}{'大小(MB)':>12}{'解析 MB/s':>12}{'写回 MB/s':>12}{'规范写回 MB/s':>14}")
+    for suffix, stats in sorted(result.stats.items()):
+        formatted = f"{stats.format_rate:>16.2f}" if suffix in WRITER_SUFFIXES else f"{'-':>16}"
+        print(
+            f"{suffix:<8}{stats.files:>8}{stats.size / 1e6:>12.2f}"
+            f"{stats.parse_rate:>12.2f}{stats.write_rate:>12.2f}{formatted}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools roundtrip",
+        description="校验全部脚本与本地化文件可逐字节往返，并检查解析吞吐是否低于基线。",
+    )
+    parser.add_argument("--root", type=Path, help="要校验的目录（默认 mod 根目录；指定时不比较基线）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个文件重复计时的次数，取最短（默认 3）")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help=f"允许低于基线的比例（默认 {DEFAULT_TOLERANCE}）",
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="把本次吞吐写入基线文件")
+    args = parser.parse_args(argv)
+
+    root = args.root or MOD_ROOT
+    if not root.is_dir():
+        print(f"[错误] 目录不存在：{root}")
+        return 1
+
+    result = run(root, max(1, args.repeat))
+    print_stats(result)
+
+    for logical, reason in result.failures:
+        print(f"[往返失败] {logical}: {reason}")
+    for logical, reason in result.writer_failures:
+        print(f"[规范写回失败] {logical}: {reason}")
+    for logical, reason in result.writer_skipped:
+        print(f"[提示] {logical}: {reason}")
+
+    failed = len(result.failures) + len(result.writer_failures)
+    regressions: List[str] = []
+    if args.update_baseline:
+        if failed:
+            print("[错误] 存在无法往返的文件，未更新基线")
+            return 1
+        save_baseline(result)
+        print(f"[基线] 已写入 {BASELINE_FILE}")
+    elif args.root is None:
+        baseline = load_baseline()
+        if not baseline:
+            print(f"[提示] 尚无基线文件 {BASELINE_FILE}，使用 --update-baseline 生成")
+        regressions = compare_baseline(result, baseline, args.tolerance)
+        for message in regressions:
+            print(f"[吞吐下降] {message}")
+
+    total = sum(stats.files for stats in result.stats.values())
+    if failed or regressions:
+        print(
+            f"\n[失败] {total} 个文件中 {len(result.failures)} 个无法往返，"
+            f"{len(result.writer_failures)} 个无法规范写回，{len(regressions)} 项吞吐下降"
+        )
+        return 1
+    print(f"\n[通过] {total} 个文件全部逐字节往返，脚本文件经 ScriptWriter 写回后语义与注释不变")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,135 +6,123 @@ EU5 Area Population Scaling Script
 按比例缩放人口，得到新人口数据。
 """
 
+import io
 import re
-import os
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 
+from pdx_script import Block, parse_bytes
+from pdx_writer import ScriptWriter, atomic_write
+from vfs import VirtualFileSystem, get_vfs
+
 # 路径配置
-# 自动获取脚本所在目录，向上一级到mod根目录（1644文件夹）
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-MOD_PATH = os.path.dirname(SCRIPT_DIR)
-GAME_PATH = r"E:\SteamLibrary\steamapps\common\Europa Universalis V\game"
-DEFINITIONS_FILE = os.path.join(GAME_PATH, "in_game", "map_data", "definitions.txt")
-POPS_FILE = os.path.join(MOD_PATH, "main_menu", "setup", "start", "06_pops.txt")
+# 均为逻辑路径，经由 VFS 在 mod / 原版游戏 / fixture 中解析（见 vfs.py）
+DEFINITIONS_FILE = "in_game/map_data/definitions.txt"
+POPS_FILE = "main_menu/setup/start/06_pops.txt"
+# 写出人口时 size 保留的小数位数
+SIZE_PRECISION = 3
+
+
+def suggest_names(name: str, kind: str) -> str:
+    """用名称索引给出相近的标识符，附加在错误信息后"""
+    from name_index import did_you_mean
+    suggestions = did_you_mean(name, [kind])
+    if not suggestions:
+        return ""
+    return f"（您是否想找：{', '.join(suggestions)}）"
 
 
 class AreaPopulationScaler:
-    def __init__(self, definitions_file: str, pops_file: str):
+    def __init__(self, definitions_file: str = DEFINITIONS_FILE, pops_file: str = POPS_FILE,
+                 vfs: Optional[VirtualFileSystem] = None):
         self.definitions_file = definitions_file
         self.pops_file = pops_file
+        self.vfs = vfs or get_vfs()
         self.areas = {}
         self.populations = {}
         
     def parse_definitions(self) -> Dict[str, List[str]]:
         """解析definitions.txt，提取所有area及其包含的locations"""
-        print(f"正在解析 {self.definitions_file}...")
-        
-        with open(self.definitions_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        print(f"正在解析 {self.vfs.real_path(self.definitions_file)}...")
         
         areas = {}
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            # 匹配 area_name = {
-            area_match = re.match(r'(\w+_area)\s*=\s*\{', line)
-            if area_match:
-                area_name = area_match.group(1)
-                locations = []
-                
-                # 解析area内容，直到找到匹配的结束大括号
-                i += 1
-                brace_count = 1
-                area_content = []
-                
-                while i < len(lines) and brace_count > 0:
-                    current_line = lines[i]
-                    area_content.append(current_line)
-                    
-                    # 计算大括号
-                    brace_count += current_line.count('{') - current_line.count('}')
-                    i += 1
-                
-                # 从area内容中提取locations
-                content_text = ''.join(area_content)
-                # 匹配 province_name = { location1 location2 ... }
-                province_pattern = r'\w+_province\s*=\s*\{([^}]+)\}'
-                for prov_match in re.finditer(province_pattern, content_text):
-                    prov_locations = prov_match.group(1).strip().split()
-                    locations.extend([loc.strip() for loc in prov_locations if loc.strip()])
-                
-                if locations:
-                    areas[area_name] = locations
-                    # 不输出所有area的日志，只在需要时输出
-                
-                continue
-            
-            i += 1
         
+        def visit(block: Block):
+            for entry in block:
+                if not entry.is_block:
+                    continue
+                # 匹配 area_name = { province_name = { location1 location2 ... } }
+                if entry.key and entry.key.endswith('_area'):
+                    locations = []
+                    for prov in entry.value:
+                        if prov.is_block and prov.key and prov.key.endswith('_province'):
+                            locations.extend(prov.value.values())
+                    if locations:
+                        areas[entry.key] = locations
+                    continue
+                visit(entry.value)
+        
+        visit(self.vfs.parse(self.definitions_file))
         self.areas = areas
         return areas
     
     def parse_populations(self) -> Dict[str, List[Dict]]:
         """解析06_pops.txt，提取所有location的人口数据"""
-        print(f"正在解析 {self.pops_file}...")
+        print(f"正在解析 {self.vfs.real_path(self.pops_file)}...")
         
         populations = {}
         current_location = None
         current_pops = []
         
-        with open(self.pops_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                stripped = line.strip()
-                if not stripped:
+        for line in self.vfs.read_text(self.pops_file).splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+            
+            # 跳过文件开头的 "locations = {"
+            if stripped == 'locations = {' or stripped == 'locations={':
+                continue
+            
+            # 匹配 location_name = { (可能前面有制表符)
+            # 排除 "locations" 和 "define_pop" 等关键字
+            location_match = re.match(r'^[\t\s]*([a-z_][a-z0-9_]*)\s*=\s*\{$', stripped)
+            if location_match:
+                loc_name = location_match.group(1)
+                # 排除关键字
+                if loc_name in ['locations', 'define_pop']:
                     continue
                 
-                # 跳过文件开头的 "locations = {"
-                if stripped == 'locations = {' or stripped == 'locations={':
-                    continue
+                # 保存上一个location的数据
+                if current_location and current_pops:
+                    populations[current_location] = current_pops
                 
-                # 匹配 location_name = { (可能前面有制表符)
-                # 排除 "locations" 和 "define_pop" 等关键字
-                location_match = re.match(r'^[\t\s]*([a-z_][a-z0-9_]*)\s*=\s*\{$', stripped)
-                if location_match:
-                    loc_name = location_match.group(1)
-                    # 排除关键字
-                    if loc_name in ['locations', 'define_pop']:
-                        continue
-                    
-                    # 保存上一个location的数据
-                    if current_location and current_pops:
-                        populations[current_location] = current_pops
-                    
-                    current_location = loc_name
-                    current_pops = []
+                current_location = loc_name
+                current_pops = []
+                continue
+            
+            # 匹配单行格式：define_pop = { type = ... size = ... culture = ... religion = ... }
+            # 注意：数据中使用制表符分隔，行首可能有制表符
+            if stripped and 'define_pop' in stripped:
+                pop_match = re.search(
+                    r'define_pop\s*=\s*\{.*?type\s*=\s*(\w+).*?size\s*=\s*([\d.]+).*?culture\s*=\s*(\w+).*?religion\s*=\s*(\w+)',
+                    stripped
+                )
+                if pop_match:
+                    pop_data = {
+                        'type': pop_match.group(1),
+                        'size': float(pop_match.group(2)),
+                        'culture': pop_match.group(3),
+                        'religion': pop_match.group(4)
+                    }
+                    current_pops.append(pop_data)
                     continue
-                
-                # 匹配单行格式：define_pop = { type = ... size = ... culture = ... religion = ... }
-                # 注意：数据中使用制表符分隔，行首可能有制表符
-                if stripped and 'define_pop' in stripped:
-                    pop_match = re.search(
-                        r'define_pop\s*=\s*\{.*?type\s*=\s*(\w+).*?size\s*=\s*([\d.]+).*?culture\s*=\s*(\w+).*?religion\s*=\s*(\w+)',
-                        stripped
-                    )
-                    if pop_match:
-                        pop_data = {
-                            'type': pop_match.group(1),
-                            'size': float(pop_match.group(2)),
-                            'culture': pop_match.group(3),
-                            'religion': pop_match.group(4)
-                        }
-                        current_pops.append(pop_data)
-                        continue
-                
-                # 匹配location结束大括号
-                if stripped == '}' and current_location:
-                    if current_pops:
-                        populations[current_location] = current_pops
-                    current_location = None
-                    current_pops = []
+            
+            # 匹配location结束大括号
+            if stripped == '}' and current_location:
+                if current_pops:
+                    populations[current_location] = current_pops
+                current_location = None
+                current_pops = []
         
         # 处理最后一个location
         if current_location and current_pops:
@@ -149,61 +137,30 @@ class AreaPopulationScaler:
         if not self.areas:
             self.parse_definitions()
         
-        # 支持完整名称或部分匹配
-        if area_name in self.areas:
-            return self.areas[area_name]
-        
-        # 尝试部分匹配
-        for key, locations in self.areas.items():
-            if area_name.lower() in key.lower() or key.lower() in area_name.lower():
-                return locations
-        
-        return None
+        # 只接受完整名称；找不到时由调用方给出"您是否想找"提示（见 suggest_names）
+        return self.areas.get(area_name)
     
     def get_region_areas(self, region_name: str) -> List[str]:
         """获取指定region下的所有area名称"""
         if not self.areas:
             self.parse_definitions()
         
-        # 从definitions.txt解析region结构
-        with open(self.definitions_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        region_areas = []
-        i = 0
-        in_target_region = False
-        region_indent_level = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            stripped = line.strip()
-            
-            # 计算缩进级别（制表符数量）
-            indent_level = len(line) - len(line.lstrip('\t'))
-            
-            # 匹配 region_name = {
-            if re.match(rf'{region_name}\s*=\s*{{', stripped):
-                in_target_region = True
-                region_indent_level = indent_level
-                i += 1
-                continue
-            
-            # 如果在目标region内
-            if in_target_region:
-                # 如果遇到同级别或更高级别的结束大括号，说明离开了region
-                if stripped == '}' and indent_level <= region_indent_level:
-                    break
-                
-                # 匹配 area_name = { (必须在region内，且缩进级别大于region)
-                area_match = re.match(r'(\w+_area)\s*=\s*\{', stripped)
-                if area_match and indent_level > region_indent_level:
-                    area_name = area_match.group(1)
-                    if area_name in self.areas:
-                        region_areas.append(area_name)
-            
-            i += 1
-        
-        return region_areas
+        # 在definitions.txt的解析树中查找region，收集其下的area
+        def find_region(block: Block) -> Optional[Block]:
+            for entry in block:
+                if not entry.is_block:
+                    continue
+                if entry.key == region_name:
+                    return entry.value
+                found = find_region(entry.value)
+                if found is not None:
+                    return found
+            return None
+        
+        region = find_region(self.vfs.parse(self.definitions_file))
+        if region is None:
+            return []
+        return [entry.key for entry in region if entry.is_block and entry.key in self.areas]
     
     def calculate_total_population(self, locations: List[str]) -> float:
         """计算指定locations的总人口"""
@@ -290,7 +247,7 @@ class AreaPopulationScaler:
         # 获取area的所有locations
         locations = self.get_area_locations(area_name)
         if not locations:
-            raise ValueError(f"未找到 area: {area_name}")
+            raise ValueError(f"未找到 area: {area_name}{suggest_names(area_name, 'area')}")
         
         print(f"\n处理 area: {area_name}")
         print(f"包含 {len(locations)} 个 locations")
@@ -339,113 +296,86 @@ class AreaPopulationScaler:
     
     def format_output(self, scaled_populations: Dict[str, List[Dict]], comment: str = "") -> str:
         """格式化输出为EU5脚本格式"""
-        output_lines = ["locations = {"]
+        buffer = io.BytesIO()
+        writer = ScriptWriter(buffer, precision=SIZE_PRECISION)
+        writer.open("locations")
         
         # 添加注释
         if comment:
-            output_lines.append(f"\t# {comment}")
-            output_lines.append("")
+            writer.comment(comment)
+            writer.blank()
         
         for loc_name in sorted(scaled_populations.keys()):
-            output_lines.append(f"\t{loc_name} = {{")
-            for pop in scaled_populations[loc_name]:
-                output_lines.append(
-                    f"\t\tdefine_pop = {{\ttype = {pop['type']}\tsize = {pop['size']:.3f}\tculture = {pop['culture']}\treligion = {pop['religion']} }}"
-                )
-            output_lines.append("\t}")
+            write_location(writer, loc_name, scaled_populations[loc_name])
         
-        output_lines.append("}")
-        return "\n".join(output_lines)
+        writer.close()
+        writer.finish()
+        return buffer.getvalue().decode("utf-8")
     
     def update_pops_file(self, scaled_populations: Dict[str, List[Dict]], comment: str = "", backup: bool = True) -> str:
-        """更新原pops文件，替换指定locations的人口数据"""
-        # 创建备份
-        if backup:
-            backup_file = self.pops_file + ".backup"
-            import shutil
-            shutil.copy2(self.pops_file, backup_file)
-            print(f"已创建备份文件: {backup_file}")
-        
-        # 读取原文件
-        with open(self.pops_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # 找到第一个要被替换的location在文件中的位置
-        first_location_index = None
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            location_match = re.match(r'^[\t\s]*([a-z_][a-z0-9_]*)\s*=\s*\{$', stripped)
-            if location_match:
-                loc_name = location_match.group(1)
-                if loc_name not in ['locations', 'define_pop'] and loc_name in scaled_populations:
-                    first_location_index = i
-                    break
-        
-        # 构建新的文件内容
-        new_lines = []
-        i = 0
-        skip_location = False
-        brace_count = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            stripped = line.strip()
-            original_line = line  # 保留原始行（包括换行符）
-            
-            # 如果在跳过location块中
-            if skip_location:
-                # 计算大括号（只计算当前行的，不匹配其他location）
-                brace_count += line.count('{') - line.count('}')
-                if brace_count == 0:
-                    # location块结束
-                    skip_location = False
-                    # 不添加原结束大括号，因为我们已经在前面添加了新的
-                i += 1
+        """更新原pops文件，替换指定locations的人口数据
+
+        只改写被替换的 location 块所在的字节区间，文件其余部分逐字节保留；
+        backup 为真时写入前的内容记入快照库（见 snapshots.py），可用 `python -m tools undo` 恢复
+        """
+        # 结果总是写入mod层；mod中尚无该文件时以原版内容为底稿。
+        # fixture 只是离线替身，写进 mod 会在游戏中整体替换原版的人口文件，因此拒绝
+        self.vfs.require_real(self.pops_file)
+        target_file = str(self.vfs.mod_path(self.pops_file))
+
+        source = self.vfs.read_bytes(self.pops_file)
+        output = replace_locations(source, scaled_populations, comment)
+        with atomic_write(target_file, snapshot=backup) as f:
+            f.write(output)
+        self.vfs.invalidate(self.pops_file)
+
+        return target_file
+
+
+def replace_locations(source: bytes, scaled_populations: Dict[str, List[Dict]], comment: str = "") -> bytes:
+    """把 locations = { ... } 下一层中出现在 scaled_populations 里的 location 块换成新内容
+
+    新块沿用原块所在行的缩进与换行符；注释只在第一个被替换的块之前写一次。
+    """
+    edits: List[Tuple[int, int, bytes]] = []
+    for top in parse_bytes(source):
+        if top.key != "locations" or not top.is_block:
+            continue
+        for entry in top.value:
+            if not entry.is_block or entry.key not in scaled_populations:
                 continue
-            
-            # 匹配 location_name = {
-            location_match = re.match(r'^[\t\s]*([a-z_][a-z0-9_]*)\s*=\s*\{$', stripped)
-            if location_match:
-                loc_name = location_match.group(1)
-                # 排除关键字
-                if loc_name in ['locations', 'define_pop']:
-                    new_lines.append(original_line)
-                    i += 1
-                    continue
-                
-                # 检查是否需要替换这个location
-                if loc_name in scaled_populations:
-                    # 添加注释（只在第一个被替换的location之前添加一次）
-                    if i == first_location_index and comment:
-                        new_lines.append(f"\t# {comment}\n")
-                    
-                    # 添加location定义
-                    new_lines.append(f"\t{loc_name} = " + "{\n")
-                    
-                    # 添加缩放后的人口数据
-                    for pop in scaled_populations[loc_name]:
-                        new_lines.append(
-                            f"\t\tdefine_pop = " + "{" + f"\ttype = {pop['type']}\tsize = {pop['size']:.3f}\tculture = {pop['culture']}\treligion = {pop['religion']} " + "}\n"
-                        )
-                    
-                    # 添加结束大括号
-                    new_lines.append("\t}\n")
-                    
-                    # 开始跳过原location块
-                    skip_location = True
-                    brace_count = 1  # 已经有一个开始大括号
-                    i += 1
-                    continue
-            
-            # 正常添加其他行
-            new_lines.append(original_line)
-            i += 1
-        
-        # 写入新文件
-        with open(self.pops_file, 'w', encoding='utf-8') as f:
-            f.writelines(new_lines)
-        
-        return self.pops_file
+            line_start = source.rfind(b"\n", 0, entry.start) + 1
+            indent = source[line_start:entry.start]
+            newline = b"\r\n" if source[entry.start:entry.end].find(b"\r\n") >= 0 else b"\n"
+            buffer = io.BytesIO()
+            writer = ScriptWriter(buffer, precision=SIZE_PRECISION)
+            if comment and not edits:
+                writer.comment(comment)
+            write_location(writer, entry.key, scaled_populations[entry.key])
+            writer.finish()
+            lines = buffer.getvalue().rstrip(b"\n").split(b"\n")
+            edits.append((entry.start, entry.end, (newline + indent).join(lines)))
+    output = bytearray()
+    position = 0
+    for start, end, data in edits:
+        output += source[position:start]
+        output += data
+        position = end
+    output += source[position:]
+    return bytes(output)
+
+
+def write_location(writer: ScriptWriter, loc_name: str, pops: List[Dict]) -> None:
+    """写出一个 location 块及其中的 define_pop"""
+    writer.open(loc_name)
+    for pop in pops:
+        writer.inline("define_pop", [
+            ("type", pop['type']),
+            ("size", float(pop['size'])),
+            ("culture", pop['culture']),
+            ("religion", pop['religion']),
+        ])
+    writer.close()
 
 
 def main():
@@ -472,15 +402,21 @@ def main():
         print("  示例: python scale_pops.py ile_de_france_area 150.0 area")
     
     scaler = AreaPopulationScaler(DEFINITIONS_FILE, POPS_FILE)
+    if scaler.vfs.is_fixture(POPS_FILE):
+        print(f"\n[提示] {POPS_FILE} 来自离线 fixture（替身数据），只能预览，不会写入 mod")
     
     try:
+        # 物化的人口汇总，用于报告缩放前后的总量（见 pop_rollup.py）
+        from pop_rollup import load_rollup, refresh_rollup
+        rollup = load_rollup(scaler)
+        
         if is_region:
             # 处理region
             print(f"\n正在查找 {target_name} 下的所有 areas...")
             area_names = scaler.get_region_areas(target_name)
             
             if not area_names:
-                raise ValueError(f"未找到 {target_name} 下的任何 area")
+                raise ValueError(f"未找到 {target_name} 下的任何 area{suggest_names(target_name, 'region')}")
             
             print(f"找到 {len(area_names)} 个 areas:")
             for area in area_names[:10]:  # 只显示前10个
@@ -506,12 +442,18 @@ def main():
         print("正在更新原pops文件...")
         print("=" * 60)
         
+        before_total = rollup.total_of(scaled_pops)
         updated_file = scaler.update_pops_file(scaled_pops, comment, backup=True)
+        refresh_rollup(rollup, scaler, scaled_pops)
+        after_total = rollup.total_of(scaled_pops)
         
         print(f"\n[成功] 已更新文件: {updated_file}")
         print(f"[成功] 共处理 {len(scaled_pops)} 个 locations")
-        print(f"[成功] 已创建备份文件: {updated_file}.backup")
+        print(f"[汇总] {target_name}: {before_total:.3f} -> {after_total:.3f}")
+        print("[提示] 写入前的内容已记入快照，可用 python -m tools undo 撤销")
         
+    except ValueError as e:
+        print(f"\n错误: {e}")
     except Exception as e:
         print(f"\n错误: {e}")
         import traceback
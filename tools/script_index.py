@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+脚本交叉引用与调用图索引
+
+为 scripted effect、scripted trigger、事件 id 与 on_action 建立
+"定义 / 引用"图，每条边都带 文件:行号，用于回答：
+
+    谁调用了 research_advances_by_level？
+    on_game_start 会触发哪些事件？
+    哪些定义从未被引用、哪些引用找不到定义、调用图中有没有环？
+
+定义来自 VFS 合并视图（mod 覆盖原版），引用只扫描 mod 自身的脚本。
+每个文件抽取出的定义与引用按内容哈希缓存在 tools/.cache/ 中，
+文件未变化时不会重新解析。
+
+scripted effect / trigger 的调用在脚本中只是一个普通的 key（`name = yes` 或
+`name = { 参数 }`），因此按已知定义名识别；未定义而名字以 _effect / _trigger
+结尾的 key 视为缺失定义。带 dynamic_historical_event 或 mean_time_to_happen 的
+事件、以及全部 on_action 由引擎触发，不计入"未使用"。
+
+用法：
+    python -m tools xref callers research_advances_by_level
+    python -m tools xref callees on_game_start
+    python -m tools xref unused
+    python -m tools xref missing
+    python -m tools xref cycles
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pdx_script import Block, parse_bytes
+from vfs import VirtualFileSystem, cache_path, get_vfs
+
+CACHE_FILE = "script_index.pickle"
+CACHE_VERSION = 1
+
+# 种类 -> 定义所在目录；events 递归（含 DHE/、situations/），其余只取目录下一层
+DEFINITION_DIRS = {
+    "scripted_effect": "in_game/common/scripted_effects",
+    "scripted_trigger": "in_game/common/scripted_triggers",
+    "on_action": "in_game/common/on_action",
+    "event": "in_game/events",
+}
+RECURSIVE_KINDS = {"event"}
+# 扫描引用的 mod 目录
+REFERENCE_DIRS = ("in_game/common", "in_game/events", "main_menu/common")
+KINDS = tuple(DEFINITION_DIRS)
+
+EVENT_CALL_KEYS = {"trigger_event", "trigger_event_silently", "trigger_event_non_silently"}
+ON_ACTION_CALL_KEYS = {"on_action", "trigger_on_action", "fire_on_action"}
+# on_action 定义内列出事件 / 子 on_action 的块
+EVENT_LIST_KEYS = {"events", "random_events"}
+ON_ACTION_LIST_KEYS = {"on_actions", "random_on_actions"}
+# 引擎自行触发的事件标志
+ROOT_EVENT_KEYS = {"dynamic_historical_event", "mean_time_to_happen"}
+CALL_VALUES = {"yes", "no"}
+# 待解析的调用：call 为 `name = { ... }`，flag_call 为 `name = yes/no`
+CALL_KINDS = {"call", "flag_call"}
+MISSING_SUFFIXES = {"_effect": "scripted_effect", "_trigger": "scripted_trigger"}
+
+NodeId = Tuple[str, str]  # (种类, 名称)
+
+
+@dataclass(frozen=True)
+class Definition:
+    kind: str
+    name: str
+    path: str
+    line: int
+    root: bool = False
+
+
+@dataclass(frozen=True)
+class Reference:
+    """一次引用；kind 为 call / flag_call 时要等全部定义收集完才能确定是 effect 还是 trigger"""
+
+    kind: str
+    name: str
+    path: str
+    line: int
+    caller: Optional[NodeId]
+
+    @property
+    def location(self) -> str:
+        return f"{self.path}:{self.line}"
+
+
+@dataclass
+class FileFacts:
+    digest: str
+    # 是否为 mod 自身的文件（只有 mod 文件会收集引用）
+    in_mod: bool
+    definitions: List[Definition] = field(default_factory=list)
+    references: List[Reference] = field(default_factory=list)
+
+
+def definition_kind(logical: str) -> Optional[str]:
+    for kind, directory in DEFINITION_DIRS.items():
+        if not logical.startswith(directory + "/"):
+            continue
+        if kind in RECURSIVE_KINDS or "/" not in logical[len(directory) + 1:]:
+            return kind
+    return None
+
+
+def is_event_id(text: str) -> bool:
+    namespace, dot, number = text.rpartition(".")
+    return bool(namespace and dot and number.isdigit())
+
+
+class _Extractor:
+    def __init__(self, logical: str, kind: Optional[str], collect_references: bool):
+        self.logical = logical
+        self.kind = kind
+        self.collect_references = collect_references
+        self.definitions: List[Definition] = []
+        self.references: List[Reference] = []
+
+    def run(self, document: Block) -> None:
+        for entry in document:
+            caller: Optional[NodeId] = None
+            if self.kind and entry.key and entry.is_block:
+                if self.kind != "event" or is_event_id(entry.key):
+                    root = self.kind == "on_action" or (
+                        self.kind == "event" and any(key in ROOT_EVENT_KEYS for key, _ in entry.value.items())
+                    )
+                    self.definitions.append(Definition(self.kind, entry.key, self.logical, entry.line, root))
+                    caller = (self.kind, entry.key)
+            if not self.collect_references:
+                continue
+            if caller is not None:
+                self.visit(entry.value, caller)
+            else:
+                self.visit_entry(entry, None)
+
+    def add(self, kind: str, name: str, line: int, caller: Optional[NodeId]) -> None:
+        self.references.append(Reference(kind, name, self.logical, line, caller))
+
+    def visit(self, block: Block, caller: Optional[NodeId]) -> None:
+        for entry in block:
+            self.visit_entry(entry, caller)
+
+    def visit_entry(self, entry, caller: Optional[NodeId]) -> None:
+        key, value = entry.key, entry.value
+        if key is None:
+            if isinstance(value, Block):
+                self.visit(value, caller)
+            return
+        if key in EVENT_CALL_KEYS:
+            event_id = value.get("id") if isinstance(value, Block) else value
+            if isinstance(event_id, str):
+                self.add("event", event_id, entry.line, caller)
+            return
+        if key in ON_ACTION_CALL_KEYS and isinstance(value, str):
+            self.add("on_action", value, entry.line, caller)
+            return
+        if isinstance(value, Block) and caller and caller[0] == "on_action":
+            if key in EVENT_LIST_KEYS:
+                for child in value:
+                    if isinstance(child.value, str) and is_event_id(child.value):
+                        self.add("event", child.value, child.line, caller)
+                return
+            if key in ON_ACTION_LIST_KEYS:
+                for child in value:
+                    if isinstance(child.value, str):
+                        self.add("on_action", child.value, child.line, caller)
+                return
+        if isinstance(value, Block):
+            self.add("call", key, entry.line, caller)
+            self.visit(value, caller)
+        elif value in CALL_VALUES:
+            self.add("flag_call", key, entry.line, caller)
+
+
+def extract(logical: str, data: bytes, in_mod: bool) -> FileFacts:
+    extractor = _Extractor(logical, definition_kind(logical), in_mod)
+    extractor.run(parse_bytes(data))
+    facts = FileFacts(hashlib.sha1(data).hexdigest(), in_mod, extractor.definitions)
+    # 同一位置的同名 key 只记一次
+    facts.references = list(dict.fromkeys(extractor.references))
+    return facts
+
+
+def mod_files(vfs: VirtualFileSystem, directory: str) -> List[str]:
+    """mod 层中目录下全部 .txt 的逻辑路径"""
+    root = vfs.mod_layer.real_path(directory)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        relative = os.path.relpath(dirpath, vfs.mod_layer.root).replace(os.sep, "/")
+        files.extend(f"{relative}/{name}" for name in sorted(filenames) if name.endswith(".txt"))
+    return files
+
+
+def source_files(vfs: VirtualFileSystem) -> Dict[str, bool]:
+    """逻辑路径 -> 是否为 mod 文件（需要收集引用）"""
+    files: Dict[str, bool] = {}
+    for kind, directory in DEFINITION_DIRS.items():
+        listed = vfs.walk(directory, (".txt",)) if kind in RECURSIVE_KINDS else vfs.listdir(directory, (".txt",))
+        for logical in listed:
+            files[logical] = vfs.resolve(logical) is vfs.mod_layer
+    for directory in REFERENCE_DIRS:
+        for logical in mod_files(vfs, directory):
+            files[logical] = True
+    return files
+
+
+class ScriptIndex:
+    def __init__(self) -> None:
+        self.files: Dict[str, FileFacts] = {}
+        self.definitions: Dict[NodeId, List[Definition]] = {}
+        self.references: List[Tuple[NodeId, Reference]] = []
+        self.callers_of: Dict[NodeId, List[Reference]] = defaultdict(list)
+        self.callees_of: Dict[NodeId, List[Tuple[NodeId, Reference]]] = defaultdict(list)
+        self.missing: List[Tuple[NodeId, Reference]] = []
+
+    def update(self, vfs: VirtualFileSystem) -> int:
+        """按内容哈希增量更新，返回重新解析的文件数"""
+        wanted = source_files(vfs)
+        reparsed = 0
+        for logical in list(self.files):
+            if logical not in wanted:
+                del self.files[logical]
+        for logical, in_mod in wanted.items():
+            data = vfs.read_bytes(logical)
+            cached = self.files.get(logical)
+            if cached is not None and cached.in_mod == in_mod and cached.digest == hashlib.sha1(data).hexdigest():
+                continue
+            self.files[logical] = extract(logical, data, in_mod)
+            reparsed += 1
+        self.link()
+        return reparsed
+
+    def link(self) -> None:
+        """由各文件的事实建立全局图"""
+        self.definitions = defaultdict(list)
+        for facts in self.files.values():
+            for definition in facts.definitions:
+                self.definitions[(definition.kind, definition.name)].append(definition)
+        self.definitions = dict(self.definitions)
+        self.references = []
+        self.callers_of = defaultdict(list)
+        self.callees_of = defaultdict(list)
+        self.missing = []
+        for facts in self.files.values():
+            for reference in facts.references:
+                target = self.resolve(reference)
+                if target is None:
+                    continue
+                self.references.append((target, reference))
+                if target in self.definitions:
+                    self.callers_of[target].append(reference)
+                    if reference.caller is not None:
+                        self.callees_of[reference.caller].append((target, reference))
+                else:
+                    self.missing.append((target, reference))
+
+    def resolve(self, reference: Reference) -> Optional[NodeId]:
+        if reference.kind not in CALL_KINDS:
+            return (reference.kind, reference.name)
+        for kind in ("scripted_effect", "scripted_trigger"):
+            if (kind, reference.name) in self.definitions:
+                return (kind, reference.name)
+        # `xxx_trigger = { ... }` 多为数据库字段，只有 `= yes/no` 形式才按名字推断缺失
+        if reference.kind == "flag_call":
+            for suffix, kind in MISSING_SUFFIXES.items():
+                if reference.name.endswith(suffix):
+                    return (kind, reference.name)
+        return None
+
+    def lookup(self, name: str) -> List[NodeId]:
+        return [(kind, name) for kind in KINDS if (kind, name) in self.definitions or (kind, name) in self.callers_of]
+
+    def unused(self, kinds: Optional[Iterable[str]] = None) -> List[Definition]:
+        """mod 中定义却从未被引用的内容（引擎触发的事件与 on_action 除外）"""
+        wanted = set(kinds or KINDS)
+        result = []
+        for node, definitions in self.definitions.items():
+            if node[0] not in wanted or node in self.callers_of:
+                continue
+            if any(definition.root for definition in definitions):
+                continue
+            result.extend(d for d in definitions if self.files[d.path].in_mod)
+        return sorted(result, key=lambda d: (d.kind, d.path, d.line))
+
+    def cycles(self) -> List[List[NodeId]]:
+        """调用图中的强连通分量（含自调用），Tarjan 算法（迭代实现）"""
+        graph: Dict[NodeId, List[NodeId]] = {
+            node: sorted({target for target, _ in edges}) for node, edges in self.callees_of.items()
+        }
+        index: Dict[NodeId, int] = {}
+        low: Dict[NodeId, int] = {}
+        on_stack: Set[NodeId] = set()
+        stack: List[NodeId] = []
+        result: List[List[NodeId]] = []
+        counter = 0
+        for start in sorted(graph):
+            if start in index:
+                continue
+            work = [(start, 0)]
+            while work:
+                node, position = work.pop()
+                if position == 0:
+                    index[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack.add(node)
+                children = graph.get(node, [])
+                if position < len(children):
+                    work.append((node, position + 1))
+                    child = children[position]
+                    if child not in index:
+                        work.append((child, 0))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in graph.get(node, []):
+                        result.append(sorted(component))
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+        return result
+
+
+def get_index(vfs: Optional[VirtualFileSystem] = None, rebuild: bool = False) -> Tuple[ScriptIndex, int]:
+    """读取缓存的索引并增量更新，返回 (索引, 重新解析的文件数)"""
+    vfs = vfs or get_vfs()
+    path = cache_path(CACHE_FILE)
+    index = None
+    if path.exists() and not rebuild:
+        try:
+            with open(path, "rb") as f:
+                version, cached = pickle.load(f)
+            if version == CACHE_VERSION:
+                index = cached
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            pass
+    if index is None:
+        index = ScriptIndex()
+    reparsed = index.update(vfs)
+    if reparsed:
+        with open(path, "wb") as f:
+            pickle.dump((CACHE_VERSION, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return index, reparsed
+
+
+def node_label(node: NodeId) -> str:
+    return f"{node[0]} {node[1]}"
+
+
+def caller_label(reference: Reference) -> str:
+    return node_label(reference.caller) if reference.caller else "（文件顶层）"
+
+
+def print_definitions(index: ScriptIndex, node: NodeId) -> None:
+    for definition in index.definitions.get(node, []):
+        print(f"{node_label(node)}  定义于 {definition.path}:{definition.line}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools xref",
+        description="scripted effect / trigger、事件与 on_action 的交叉引用查询。",
+    )
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存重新建立索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+    callers = sub.add_parser("callers", help="列出引用某个定义的位置")
+    callers.add_argument("name")
+    callees = sub.add_parser("callees", help="列出某个定义引用的内容")
+    callees.add_argument("name")
+    unused = sub.add_parser("unused", help="mod 中从未被引用的定义")
+    unused.add_argument("--kind", action="append", choices=KINDS, help="只看指定种类（可重复）")
+    sub.add_parser("missing", help="引用了但找不到定义的内容")
+    sub.add_parser("cycles", help="调用图中的环")
+    args = parser.parse_args(argv)
+
+    index, reparsed = get_index(rebuild=args.rebuild)
+    print(f"[索引] {len(index.files)} 个文件（重新解析 {reparsed} 个），{len(index.definitions)} 个定义\n")
+
+    if args.command in {"callers", "callees"}:
+        nodes = index.lookup(args.name)
+        if not nodes:
+            print(f"[错误] 找不到定义或引用：{args.name}")
+            return 1
+        for node in nodes:
+            print_definitions(index, node)
+            if args.command == "callers":
+                references = index.callers_of.get(node, [])
+                for reference in sorted(references, key=lambda r: (r.path, r.line)):
+                    print(f"  <- {reference.location}  {caller_label(reference)}")
+                print(f"  共 {len(references)} 处引用\n")
+            else:
+                edges = index.callees_of.get(node, [])
+                for target, reference in sorted(edges, key=lambda e: (e[1].path, e[1].line)):
+                    print(f"  -> {node_label(target)}  {reference.location}")
+                print(f"  共 {len(edges)} 处调用\n")
+        return 0
+
+    if args.command == "unused":
+        definitions = index.unused(args.kind)
+        for definition in definitions:
+            print(f"{definition.kind:<17} {definition.name:<48} {definition.path}:{definition.line}")
+        print(f"\n共 {len(definitions)} 个未被引用的定义")
+        return 0
+
+    if args.command == "missing":
+        for node, reference in sorted(index.missing, key=lambda m: (m[0], m[1].path, m[1].line)):
+            print(f"{node_label(node):<64} {reference.location}  {caller_label(reference)}")
+        print(f"\n共 {len(index.missing)} 处引用找不到定义")
+        return 1 if index.missing else 0
+
+    cycles = index.cycles()
+    for component in cycles:
+        print(" -> ".join(node_label(node) for node in component + component[:1]))
+    print(f"\n共 {len(cycles)} 个环")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+setup 文件的语义 diff
+
+文本 diff 在块被重排、重新缩进或整体缩放时几乎无法阅读。这里把两个版本
+都解析成脚本树，自底向上为每个块计算 Merkle 哈希（空白、注释、数字写法
+如 1.0 与 1.000 都不影响哈希），然后逐级比较：
+
+    文件（git blob id / 字节相同） -> 顶层容器（character_db 等） -> 实体
+
+哈希相同的子树直接跳过，只对真正变化的实体给出条目级描述，例如：
+
+    character eng_charles_i_stuart: adm 45 -> 60
+    pops nanchang: peasants 10.000 -> 11.230 (+12.3%)
+    dynasty safavid_dynasty: 删除
+
+用法：
+    python -m tools diff --git HEAD~1 HEAD
+    python -m tools diff --git HEAD~1                  # 与工作区比较
+    python -m tools diff --git v0.1 v0.2 --path main_menu/setup/start/05_characters.txt
+    python -m tools diff old_dir new_dir
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pdx_script import Block, Entry, parse_bytes
+from vfs import MOD_ROOT
+
+DEFAULT_PATHS = ["main_menu/setup/start"]
+SUFFIXES = (".txt",)
+
+# 容器名 -> 实体种类；locations 按文件编号区分人口与城市
+KIND_NAMES = {
+    "character_db": "character",
+    "dynasty_manager": "dynasty",
+    "countries": "country",
+    "diplomacy_manager": "diplomacy",
+    "war_manager": "war",
+    "market_manager": "market",
+}
+LOCATION_KINDS = {"06": "pops", "07": "location"}
+
+NUMBER_RE = re.compile(r"^-?\d+(?:\.\d+)?$")
+SHORT_LIMIT = 80
+
+EntityId = Tuple[str, str, str]  # (文件组, 容器, key)
+
+
+def _canon(value: str) -> str:
+    """数字统一写法，使 1.0 与 1.000 视为相同"""
+    if NUMBER_RE.match(value):
+        return repr(float(value))
+    return value
+
+
+def block_digest(block: Block, memo: Dict[int, bytes]) -> bytes:
+    """自底向上的块哈希；结果按块对象缓存在 memo 中"""
+    parts: List[bytes] = [(block.tag or "").encode()]
+    for entry in block.entries:
+        value = entry.value
+        if isinstance(value, Block):
+            child = memo.get(id(value))
+            if child is None:
+                child = block_digest(value, memo)
+            parts.append(f"{entry.key}{entry.op}\x01".encode() + child)
+        else:
+            parts.append(f"{entry.key}{entry.op}{_canon(value)}\x00".encode())
+    digest = hashlib.blake2b(b"\x02".join(parts), digest_size=16).digest()
+    memo[id(block)] = digest
+    return digest
+
+
+def entry_digest(entry: Entry, memo: Dict[int, bytes]) -> bytes:
+    value = entry.value
+    if isinstance(value, Block):
+        inner = memo.get(id(value)) or block_digest(value, memo)
+        return hashlib.blake2b(f"{entry.key}{entry.op}".encode() + inner, digest_size=16).digest()
+    return f"{entry.key}{entry.op}{_canon(value)}".encode()
+
+
+def file_group(path: str) -> str:
+    """文件编号前缀：05_zzz_characters.txt -> 05（同组文件在游戏中合并）"""
+    name = path.rsplit("/", 1)[-1]
+    match = re.match(r"^(\d+)_", name)
+    return match.group(1) if match else name
+
+
+def entity_kind(group: str, container: str) -> str:
+    if container == "locations":
+        return LOCATION_KINDS.get(group, "location")
+    return KIND_NAMES.get(container, container or "root")
+
+
+@dataclass
+class Occurrence:
+    digest: bytes
+    entry: Entry
+    path: str
+
+
+@dataclass
+class Change:
+    status: str  # added / removed / changed
+    kind: str
+    key: str
+    details: List[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        label = f"{self.kind} {self.key}"
+        if self.status == "added":
+            head = f"{label}: 新增"
+        elif self.status == "removed":
+            head = f"{label}: 删除"
+        else:
+            head = f"{label}:"
+        if not self.details:
+            return head
+        if self.status == "changed" and len(self.details) == 1:
+            return f"{head} {self.details[0]}"
+        return head + "".join(f"\n    {detail}" for detail in self.details)
+
+
+def _containers(document: Block) -> Iterable[Tuple[str, Entry]]:
+    """顶层容器；`countries = { countries = { ... } }` 这类重复嵌套会被展开"""
+    for entry in document:
+        if entry.is_block and entry.key is not None:
+            block = entry.value
+            if len(block.entries) == 1 and block.entries[0].key == entry.key and block.entries[0].is_block:
+                yield entry.key, block.entries[0]
+            else:
+                yield entry.key, entry
+        else:
+            yield "", entry
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    group: str
+    memo: Dict[int, bytes]
+    # (容器名, 条目, 容器哈希)；顶层标量的容器名为空串、哈希为 None
+    containers: List[Tuple[str, Entry, Optional[bytes]]]
+
+
+def parse_revision(files: Dict[str, bytes]) -> List[ParsedFile]:
+    parsed = []
+    for path, data in files.items():
+        memo: Dict[int, bytes] = {}
+        containers = []
+        for container, entry in _containers(parse_bytes(data)):
+            digest = block_digest(entry.value, memo) if container else None
+            containers.append((container, entry, digest))
+        parsed.append(ParsedFile(path, file_group(path), memo, containers))
+    return parsed
+
+
+def collect(parsed: List[ParsedFile], unchanged: set) -> Dict[EntityId, List[Occurrence]]:
+    """按实体归类；unchanged 中的 (路径, 容器哈希) 两边相同，整体跳过"""
+    entities: Dict[EntityId, List[Occurrence]] = defaultdict(list)
+    for item in parsed:
+        for container, entry, digest in item.containers:
+            if container:
+                if (item.path, container, digest) in unchanged:
+                    continue
+                children = entry.value.entries
+            else:
+                children = [entry]
+            for child in children:
+                key = child.key if child.key is not None else (child.value if isinstance(child.value, str) else "{}")
+                occurrence = Occurrence(entry_digest(child, item.memo), child, item.path)
+                entities[(item.group, container, key)].append(occurrence)
+    return entities
+
+
+def render_short(value) -> str:
+    if not isinstance(value, Block):
+        return value
+    parts = []
+    for entry in value.entries:
+        text = render_short(entry.value)
+        parts.append(text if entry.key is None else f"{entry.key} {entry.op} {text}")
+    prefix = f"{value.tag} " if value.tag else ""
+    text = prefix + "{ " + " ".join(parts) + " }"
+    if len(text) > SHORT_LIMIT:
+        text = text[: SHORT_LIMIT - 4] + " ..."
+    return text
+
+
+def _pop_sizes(block: Block) -> Optional[Dict[str, float]]:
+    pops = block.get_all("define_pop")
+    if not pops:
+        return None
+    sizes: Dict[str, float] = defaultdict(float)
+    for pop in pops:
+        if isinstance(pop, Block):
+            try:
+                sizes[str(pop.get("type"))] += float(pop.get("size", 0))
+            except (TypeError, ValueError):
+                continue
+    return sizes
+
+
+def _percent(old: float, new: float) -> str:
+    if old == 0:
+        return "新增"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def describe_pops(old: Dict[str, float], new: Dict[str, float]) -> List[str]:
+    details = []
+    for pop_type in sorted(set(old) | set(new)):
+        before, after = old.get(pop_type, 0.0), new.get(pop_type, 0.0)
+        if abs(before - after) < 0.0005:
+            continue
+        details.append(f"{pop_type} {before:.3f} -> {after:.3f} ({_percent(before, after)})")
+    before, after = sum(old.values()), sum(new.values())
+    if len(details) > 1 and abs(before - after) >= 0.0005:
+        details.append(f"合计 {before:.3f} -> {after:.3f} ({_percent(before, after)})")
+    return details or ["pop 构成调整（各类型总量不变）"]
+
+
+def describe_block(old: Block, new: Block, memo: Dict[int, bytes]) -> List[str]:
+    """逐 key 比较两个块，只描述哈希不同的部分"""
+    old_pops, new_pops = _pop_sizes(old), _pop_sizes(new)
+    if old_pops is not None or new_pops is not None:
+        return describe_pops(old_pops or {}, new_pops or {})
+
+    def grouped(block: Block) -> Dict[Optional[str], List[Entry]]:
+        result: Dict[Optional[str], List[Entry]] = defaultdict(list)
+        for entry in block.entries:
+            result[entry.key].append(entry)
+        return result
+
+    old_map, new_map = grouped(old), grouped(new)
+    details = []
+    keys = list(old_map) + [key for key in new_map if key not in old_map]
+    for key in keys:
+        before, after = old_map.get(key, []), new_map.get(key, [])
+        if [entry_digest(e, memo) for e in before] == [entry_digest(e, memo) for e in after]:
+            continue
+        if key is None:
+            removed = Counter(render_short(e.value) for e in before)
+            added = Counter(render_short(e.value) for e in after)
+            removed, added = removed - added, added - removed
+            details.extend(f"- {value}" for value in removed.elements())
+            details.extend(f"+ {value}" for value in added.elements())
+            continue
+        if len(before) == 1 and len(after) == 1:
+            details.append(f"{key} {render_short(before[0].value)} -> {render_short(after[0].value)}")
+        elif not before:
+            details.extend(f"+ {key} = {render_short(e.value)}" for e in after)
+        elif not after:
+            details.extend(f"- {key} = {render_short(e.value)}" for e in before)
+        else:
+            details.append(f"{key} 已修改（{len(before)} -> {len(after)} 项）")
+    return details or ["仅顺序变化"]
+
+
+def _unmatched(occurrences: List[Occurrence], remaining: Counter) -> List[Occurrence]:
+    """按多重集差取出未配对的出现"""
+    result = []
+    for occurrence in occurrences:
+        if remaining[occurrence.digest] > 0:
+            remaining[occurrence.digest] -= 1
+            result.append(occurrence)
+    return result
+
+
+def diff_entities(
+    old: Dict[EntityId, List[Occurrence]],
+    new: Dict[EntityId, List[Occurrence]],
+) -> List[Change]:
+    memo: Dict[int, bytes] = {}
+    changes: List[Change] = []
+    for entity in sorted(set(old) | set(new)):
+        group, container, key = entity
+        kind = entity_kind(group, container)
+        before, after = old.get(entity, []), new.get(entity, [])
+        before_digests = Counter(o.digest for o in before)
+        after_digests = Counter(o.digest for o in after)
+        if before_digests == after_digests:
+            continue
+        removed = _unmatched(before, before_digests - after_digests)
+        added = _unmatched(after, after_digests - before_digests)
+        if len(removed) == 1 and len(added) == 1:
+            old_value, new_value = removed[0].entry.value, added[0].entry.value
+            if len(before) > 1 or len(after) > 1:
+                # 重复出现的 key（如 dependency）需要整条显示才能区分
+                details = [f"{render_short(old_value)} -> {render_short(new_value)}"]
+            elif isinstance(old_value, Block) and isinstance(new_value, Block):
+                details = describe_block(old_value, new_value, memo)
+            else:
+                details = [f"{render_short(old_value)} -> {render_short(new_value)}"]
+            changes.append(Change("changed", kind, key, details))
+            continue
+        if not before:
+            changes.append(Change("added", kind, key))
+            continue
+        if not after:
+            changes.append(Change("removed", kind, key))
+            continue
+        details = [f"- {render_short(o.entry.value)}" for o in removed]
+        details += [f"+ {render_short(o.entry.value)}" for o in added]
+        changes.append(Change("changed", kind, key, details))
+    return changes
+
+
+def _git(*args: str) -> bytes:
+    return subprocess.run(
+        ["git", *args], cwd=MOD_ROOT, check=True, stdout=subprocess.PIPE
+    ).stdout
+
+
+def git_blobs(revision: str, paths: List[str]) -> Dict[str, str]:
+    """revision 中匹配路径的文件 -> blob id"""
+    output = _git("ls-tree", "-r", "-z", revision, "--", *paths).decode("utf-8")
+    blobs = {}
+    for record in output.split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        _, kind, blob = meta.split()
+        if kind == "blob" and path.endswith(SUFFIXES):
+            blobs[path] = blob
+    return blobs
+
+
+def read_git_files(revision: str, blobs: Dict[str, str]) -> Dict[str, bytes]:
+    if not blobs:
+        return {}
+    # 用一次 cat-file --batch 读出全部 blob
+    request = "".join(f"{blob}\n" for blob in blobs.values()).encode()
+    output = subprocess.run(
+        ["git", "cat-file", "--batch"], cwd=MOD_ROOT, check=True,
+        input=request, stdout=subprocess.PIPE,
+    ).stdout
+    result = {}
+    offset = 0
+    for path in blobs:
+        header_end = output.index(b"\n", offset)
+        size = int(output[offset:header_end].split()[2])
+        start = header_end + 1
+        result[path] = output[start:start + size]
+        offset = start + size + 1
+    return result
+
+
+def read_tree_files(root: Path, paths: List[str]) -> Dict[str, bytes]:
+    result = {}
+    for raw in paths:
+        base = root / raw
+        targets = [base] if base.is_file() else sorted(base.rglob("*")) if base.is_dir() else []
+        for target in targets:
+            if target.is_file() and target.suffix.lower() in SUFFIXES:
+                result[target.relative_to(root).as_posix()] = target.read_bytes()
+    return result
+
+
+def load_revisions(args) -> Tuple[Dict[str, bytes], Dict[str, bytes]]:
+    """读取两个版本；字节完全相同（或 blob id 相同）的文件直接剔除"""
+    paths = args.path or DEFAULT_PATHS
+    if args.git:
+        old_blobs = git_blobs(args.old, paths)
+        if args.new:
+            new_blobs = git_blobs(args.new, paths)
+            same = {p for p, blob in old_blobs.items() if new_blobs.get(p) == blob}
+            old_files = read_git_files(args.old, {p: b for p, b in old_blobs.items() if p not in same})
+            new_files = read_git_files(args.new, {p: b for p, b in new_blobs.items() if p not in same})
+            return old_files, new_files
+        old_files = read_git_files(args.old, old_blobs)
+        new_files = read_tree_files(MOD_ROOT, paths)
+    else:
+        old_files = read_tree_files(Path(args.old), paths if args.path else ["."])
+        new_files = read_tree_files(Path(args.new), paths if args.path else ["."])
+    for path in [p for p in old_files if new_files.get(p) == old_files[p]]:
+        del old_files[path]
+        del new_files[path]
+    return old_files, new_files
+
+
+def semantic_diff(old_files: Dict[str, bytes], new_files: Dict[str, bytes]) -> List[Change]:
+    old_parsed = parse_revision(old_files)
+    new_parsed = parse_revision(new_files)
+
+    def digests(parsed: List[ParsedFile]) -> set:
+        return {(p.path, c, d) for p in parsed for c, _, d in p.containers if c}
+
+    unchanged = digests(old_parsed) & digests(new_parsed)
+    return diff_entities(collect(old_parsed, unchanged), collect(new_parsed, unchanged))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools diff",
+        description="比较两个版本的 setup 文件，输出实体级的语义差异。",
+    )
+    parser.add_argument("old", help="旧版本：git 修订（配合 --git）或目录")
+    parser.add_argument("new", nargs="?", help="新版本：git 修订或目录；--git 时缺省为工作区")
+    parser.add_argument("--git", action="store_true", help="old/new 为 git 修订")
+    parser.add_argument("--path", action="append", help="只比较指定文件或目录（可重复）")
+    args = parser.parse_args(argv)
+    if not args.git and not args.new:
+        parser.error("比较目录时需要同时给出 old 与 new")
+
+    started = time.perf_counter()
+    old_files, new_files = load_revisions(args)
+    changes = semantic_diff(old_files, new_files)
+    elapsed = time.perf_counter() - started
+
+    for change in changes:
+        print(change.render())
+    counts = Counter(change.status for change in changes)
+    print(
+        f"\n[完成] 比较了 {len(set(old_files) | set(new_files))} 个有变化的文件："
+        f"新增 {counts['added']}，删除 {counts['removed']}，修改 {counts['changed']}"
+        f"（{elapsed:.2f}s）"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+setup 文件的惰性视图
+
+查看或修改一个人物、王朝或国家，不必解析整个 05_characters.txt（2.3 MB）。
+open_setup() 以 mmap 打开文件，只建立一份"实体名 -> 字节区间"的小索引，
+访问某个实体时才解析它那一段：
+
+    from setup_view import open_setup
+    block = open_setup("05_characters.txt")["eng_charles_i_stuart"]
+    entry = open_setup("05_characters.txt").entry("eng_charles_i_stuart")  # 偏移、行号为文件中的绝对值
+
+- 实体是顶层管理块（character_db、dynasty_manager、locations 等）的直接子块；
+  `countries = { countries = { TAG = {...} } }` 这类同名包装块会再向内一层；
+- 索引只扫描字符串、注释与花括号，不做完整解析；结果按文件大小与修改时间
+  校验后缓存在 tools/.cache/ 中，文件未变化时直接加载；
+- 解析过的实体按区间缓存在视图中，内存只随访问过的实体增长；
+- 同名实体（如 diplomacy_manager 中多条 dependency）按 Block.get 的规则取最后一个，
+  get_all() 取全部。
+
+用法：
+    python -m tools setup 05_characters.txt eng_charles_i_stuart
+    python -m tools setup 10_zzz_w_countries.txt --keys
+"""
+
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import pickle
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pdx_script import BOM, Block, Entry, parse_span
+from vfs import VirtualFileSystem, cache_path, get_vfs
+
+SETUP_DIR = "main_menu/setup/start"
+CACHE_VERSION = 1
+
+# 只关心会影响花括号配对的令牌；与 pdx_script.tokenize 对字符串、注释的切分一致
+_SCAN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|"[^\n]*|\#[^\n]*|[{}]')
+# `{` 之前的 `key =` 或带前缀块的 `key = rgb`
+_KEY_RE = re.compile(rb'([^\s={}<>"#!?]+)[ \t\r\n]*[<>!?]?=[ \t\r\n]*(?:[^\s={}<>"#]+[ \t\r\n]*)?$')
+_KEY_LOOKBACK = 256
+
+# 实体名 -> [(起始偏移, 结束偏移, 行号)]，按在文件中出现的顺序
+Span = Tuple[int, int, int]
+
+
+def scan_entities(data: bytes) -> Dict[str, List[Span]]:
+    """扫描顶层管理块的直接子块（同名包装块再向内一层），不建立解析树"""
+    index: Dict[str, List[Span]] = {}
+    # 栈中保存 (key, 起始偏移, 行号, 是否为实体, 子块是否为实体)
+    stack: List[Tuple[Optional[str], int, int, bool, bool]] = []
+    line = 1
+    counted = lower = len(BOM) if data.startswith(BOM) else 0
+    for match in _SCAN_RE.finditer(data):
+        token = match.group()
+        if token == b"{":
+            position = match.start()
+            if stack and not stack[-1][4]:
+                # 实体内部的块：只需配对，不找 key
+                stack.append((None, position, 0, False, False))
+                continue
+            key_match = _KEY_RE.search(data, max(lower, position - _KEY_LOOKBACK), position)
+            key = key_match.group(1).decode("utf-8", "replace") if key_match else None
+            start = key_match.start() if key_match else position
+            line += data.count(b"\n", counted, start)
+            counted = start
+            if not stack:
+                stack.append((key, start, line, False, key is not None))
+            else:
+                stack.append((key, start, line, key is not None, key is not None and key == stack[0][0]))
+        elif token == b"}":
+            if not stack:
+                continue
+            key, start, key_line, entity, _children = stack.pop()
+            if entity:
+                index.setdefault(key, []).append((start, match.end(), key_line))
+    return index
+
+
+class SetupView:
+    """一个 setup 文件的只读惰性视图"""
+
+    def __init__(self, path: Path, index: Dict[str, List[Span]], signature: Tuple[int, int]):
+        self.path = path
+        self.index = index
+        self.signature = signature
+        self._file = None
+        self._data = b""
+        if signature[0]:
+            self._file = open(path, "rb")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._entries: Dict[int, Entry] = {}
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._data.close()
+            self._file.close()
+            self._file = None
+            self._data = b""
+        self._entries.clear()
+
+    def __enter__(self) -> "SetupView":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"SetupView({self.path.name}, {len(self.index)} 个实体)"
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def keys(self) -> List[str]:
+        return list(self.index)
+
+    def _entry_at(self, span: Span) -> Entry:
+        entry = self._entries.get(span[0])
+        if entry is None:
+            document = parse_span(self._data, span[0], span[1], span[2])
+            entry = document.entries[0]
+            self._entries[span[0]] = entry
+        return entry
+
+    def entries(self, key: str) -> List[Entry]:
+        return [self._entry_at(span) for span in self.index.get(key, ())]
+
+    def entry(self, key: str) -> Entry:
+        """实体最后一次出现的 Entry；start/end/line 为文件中的绝对值"""
+        spans = self.index.get(key)
+        if not spans:
+            raise KeyError(key)
+        return self._entry_at(spans[-1])
+
+    def __getitem__(self, key: str) -> Block:
+        return self.entry(key).value
+
+    def get(self, key: str, default: Optional[Block] = None) -> Optional[Block]:
+        return self.entry(key).value if key in self.index else default
+
+    def get_all(self, key: str) -> List[Block]:
+        return [entry.value for entry in self.entries(key)]
+
+    def span(self, key: str) -> Tuple[int, int]:
+        spans = self.index.get(key)
+        if not spans:
+            raise KeyError(key)
+        return spans[-1][0], spans[-1][1]
+
+    def raw(self, key: str) -> bytes:
+        """实体的原文（含 key 与花括号）"""
+        start, end = self.span(key)
+        return self._data[start:end]
+
+
+# ---- 打开与索引缓存 ----
+
+_views: Dict[Path, SetupView] = {}
+_paths: Dict[Tuple[int, str], Path] = {}
+
+
+def resolve_setup(name: str, vfs: Optional[VirtualFileSystem] = None) -> Path:
+    """文件名（05_characters.txt）或逻辑路径 -> 磁盘路径"""
+    vfs = vfs or get_vfs()
+    path = _paths.get((id(vfs), name))
+    if path is None:
+        logical = name if "/" in name else f"{SETUP_DIR}/{name}"
+        if not vfs.exists(logical):
+            raise ValueError(f"找不到 setup 文件：{logical}")
+        path = vfs.real_path(logical).resolve()
+        _paths[(id(vfs), name)] = path
+    return path
+
+
+def _index_cache(path: Path) -> Path:
+    return cache_path(f"setup_index.{path.parent.name}.{path.name}.pickle")
+
+
+def load_index(path: Path, signature: Tuple[int, int]) -> Dict[str, List[Span]]:
+    """读取缓存的索引；文件大小或修改时间不符时重新扫描并写回"""
+    cache = _index_cache(path)
+    if cache.exists():
+        try:
+            with open(cache, "rb") as f:
+                version, cached_path, cached_signature, index = pickle.load(f)
+            if version == CACHE_VERSION and cached_path == str(path) and tuple(cached_signature) == signature:
+                return index
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            pass
+    with open(path, "rb") as f:
+        index = scan_entities(f.read())
+    with open(cache, "wb") as f:
+        pickle.dump((CACHE_VERSION, str(path), signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return index
+
+
+def open_setup(name: str, vfs: Optional[VirtualFileSystem] = None) -> SetupView:
+    """打开（或复用）setup 文件的惰性视图；文件变化后自动重建索引"""
+    path = resolve_setup(name, vfs)
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    view = _views.get(path)
+    if view is not None and view.signature == signature:
+        return view
+    if view is not None:
+        view.close()
+    view = SetupView(path, load_index(path, signature), signature)
+    _views[path] = view
+    return view
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools setup",
+        description="按实体名读取 setup 文件中的单个块，不解析整个文件。",
+    )
+    parser.add_argument("file", help="setup 文件名（如 05_characters.txt）或逻辑路径")
+    parser.add_argument("names", nargs="*", help="实体名，如 eng_charles_i_stuart")
+    parser.add_argument("--keys", action="store_true", help="列出全部实体名")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        view = open_setup(args.file)
+    except ValueError as e:
+        print(f"[错误] {e}")
+        return 1
+    opened = time.perf_counter()
+
+    if args.keys:
+        for key in view:
+            print(key)
+    missing = 0
+    for name in args.names:
+        if name not in view:
+            print(f"[错误] {view.path.name} 中没有 {name}")
+            missing += 1
+            continue
+        entry = view.entry(name)
+        print(f"# {view.path.name}:{entry.line}")
+        print(view.raw(name).decode("utf-8", "replace"))
+    finished = time.perf_counter()
+    print(
+        f"\n[视图] {len(view)} 个实体，打开 {(opened - started) * 1000:.2f} ms，"
+        f"读取 {(finished - opened) * 1000:.2f} ms",
+        file=sys.stderr,
+    )
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入前快照与多级撤销
+
+所有通过 pdx_writer.atomic_write() 改写文件的工具，在写入前都会把文件原来的
+内容记录到 mod 目录之外的快照库（默认 ~/.cache/eu5_1644_tools/snapshots，
+可用环境变量 TOOLS_SNAPSHOT_DIR 指定），取代以前覆盖式的 .backup 文件。
+
+- 文件按行切分为内容定义的块（某行的 CRC 命中掩码时断开），每块以 SHA-1 寻址、
+  zlib 压缩后存放；改动几行的大文件再次快照时，只有改动附近的一两个块是新的；
+- 同一进程内写入的所有文件属于同一个会话，`tools undo` 以会话为单位恢复，
+  可连续执行以逐级回退；恢复前检查文件是否在工具写入之后又被改过；
+- 写入前不存在的文件也会记录，撤销时删除；
+- 垃圾回收保留最近 KEEP_SESSIONS 个会话以及 KEEP_DAYS 天内的会话，
+  然后删除不再被引用的块；会话数超过 AUTO_GC_SESSIONS 时自动执行。
+
+用法：
+    python -m tools undo                 # 撤销最近一次写入
+    python -m tools undo -n 3            # 连续撤销 3 次
+    python -m tools snapshots list
+    python -m tools snapshots gc [--keep 20] [--days 14]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+from vfs import MOD_ROOT
+
+SNAPSHOT_DIR = Path(
+    os.environ.get("TOOLS_SNAPSHOT_DIR", Path.home() / ".cache" / "eu5_1644_tools" / "snapshots")
+)
+MIN_CHUNK = 1024
+MAX_CHUNK = 16 * 1024
+# 行 CRC 的低位全为 0 时断开，平均约每 16 行一个断点
+CHUNK_MASK = 0xF
+COMPRESS_LEVEL = 6
+
+KEEP_SESSIONS = 20
+KEEP_DAYS = 14
+AUTO_GC_SESSIONS = 50
+
+
+@dataclass
+class FileSnapshot:
+    path: str
+    existed: bool
+    size: int = 0
+    sha1: Optional[str] = None
+    chunks: List[str] = field(default_factory=list)
+    # 工具写入后的内容哈希，撤销前用来确认文件没有再被改动
+    after: Optional[str] = None
+
+
+@dataclass
+class Session:
+    id: str
+    created: float
+    tool: str
+    argv: List[str]
+    files: List[FileSnapshot] = field(default_factory=list)
+    undone: bool = False
+
+    def find(self, path: str) -> Optional[FileSnapshot]:
+        for snapshot in self.files:
+            if snapshot.path == path:
+                return snapshot
+        return None
+
+
+# ---- 分块与对象 ----
+
+def split_chunks(data: bytes) -> Iterator[bytes]:
+    """按行切分为内容定义的块，插入或删除几行只影响附近的块"""
+    start = 0
+    position = 0
+    size = len(data)
+    while position < size:
+        end = data.find(b"\n", position)
+        end = size if end < 0 else end + 1
+        line = data[position:end]
+        position = end
+        length = position - start
+        if length >= MAX_CHUNK or (length >= MIN_CHUNK and zlib.crc32(line) & CHUNK_MASK == 0):
+            yield data[start:position]
+            start = position
+    if start < size:
+        yield data[start:]
+
+
+class SnapshotStore:
+    def __init__(self, root: Path = SNAPSHOT_DIR):
+        self.root = root
+        self.objects = root / "objects"
+        self.sessions_dir = root / "sessions"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def put(self, chunk: bytes) -> str:
+        digest = hashlib.sha1(chunk).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_name(path.name + ".tmp")
+            temp.write_bytes(zlib.compress(chunk, COMPRESS_LEVEL))
+            os.replace(temp, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return zlib.decompress(self._object_path(digest).read_bytes())
+
+    def content(self, snapshot: FileSnapshot) -> bytes:
+        data = b"".join(self.get(digest) for digest in snapshot.chunks)
+        if hashlib.sha1(data).hexdigest() != snapshot.sha1:
+            raise ValueError(f"快照内容校验失败：{snapshot.path}")
+        return data
+
+    # ---- 会话 ----
+
+    def save_session(self, session: Session) -> None:
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        path = self.sessions_dir / f"{session.id}.json"
+        temp = path.with_name(path.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(asdict(session), f, ensure_ascii=False)
+        os.replace(temp, path)
+
+    def sessions(self) -> List[Session]:
+        """按时间从旧到新"""
+        if not self.sessions_dir.is_dir():
+            return []
+        sessions = []
+        for path in sorted(self.sessions_dir.glob("*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            files = [FileSnapshot(**item) for item in data.pop("files", [])]
+            sessions.append(Session(files=files, **data))
+        return sessions
+
+    def delete_session(self, session: Session) -> None:
+        (self.sessions_dir / f"{session.id}.json").unlink(missing_ok=True)
+
+    def snapshot(self, path: str) -> FileSnapshot:
+        try:
+            data = Path(path).read_bytes()
+        except FileNotFoundError:
+            return FileSnapshot(path, existed=False)
+        chunks = [self.put(chunk) for chunk in split_chunks(data)]
+        return FileSnapshot(path, True, len(data), hashlib.sha1(data).hexdigest(), chunks)
+
+    def gc(self, keep: int = KEEP_SESSIONS, days: float = KEEP_DAYS) -> Tuple[int, int, int]:
+        """返回 (删除的会话数, 删除的块数, 释放的字节数)"""
+        sessions = self.sessions()
+        cutoff = time.time() - days * 86400
+        kept = sessions[-keep:] if keep > 0 else []
+        removed = 0
+        for session in sessions:
+            if session in kept or session.created >= cutoff:
+                continue
+            self.delete_session(session)
+            removed += 1
+        live = {digest for session in self.sessions() for snapshot in session.files for digest in snapshot.chunks}
+        chunks = freed = 0
+        if self.objects.is_dir():
+            for path in self.objects.glob("*/*"):
+                if path.parent.name + path.name not in live:
+                    freed += path.stat().st_size
+                    path.unlink()
+                    chunks += 1
+        return removed, chunks, freed
+
+    def usage(self) -> Tuple[int, int]:
+        """(块数, 占用字节)"""
+        if not self.objects.is_dir():
+            return 0, 0
+        sizes = [path.stat().st_size for path in self.objects.glob("*/*")]
+        return len(sizes), sum(sizes)
+
+
+# ---- 供写文件的工具调用 ----
+
+_store: Optional[SnapshotStore] = None
+_session: Optional[Session] = None
+
+
+def _current_store() -> SnapshotStore:
+    global _store
+    if _store is None or _store.root != SNAPSHOT_DIR:
+        _store = SnapshotStore(SNAPSHOT_DIR)
+    return _store
+
+
+def _tool_name() -> str:
+    """`python -m tools fmt` -> fmt；`python tools/scale_pops.py` -> scale_pops"""
+    stem = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "python"
+    if stem == "__main__" and len(sys.argv) > 1:
+        return sys.argv[1]
+    return stem
+
+
+def _key(path: Union[str, Path]) -> str:
+    return str(Path(path).resolve())
+
+
+def record(path: Union[str, Path]) -> None:
+    """写入 path 之前调用：把当前内容记入本进程的会话（同一文件只记第一次）"""
+    global _session
+    store = _current_store()
+    key = _key(path)
+    if _session is None:
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        millis = int(now * 1000) % 1000
+        _session = Session(f"{stamp}.{millis:03d}-{os.getpid()}", now, _tool_name(), sys.argv[1:])
+        if len(store.sessions()) >= AUTO_GC_SESSIONS:
+            store.gc()
+    if _session.find(key) is None:
+        _session.files.append(store.snapshot(key))
+    store.save_session(_session)
+
+
+def written(path: Union[str, Path]) -> None:
+    """写入完成后调用：记录写入后的内容哈希"""
+    if _session is None:
+        return
+    snapshot = _session.find(_key(path))
+    if snapshot is None:
+        return
+    try:
+        snapshot.after = hashlib.sha1(Path(snapshot.path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        snapshot.after = None
+    _current_store().save_session(_session)
+
+
+# ---- 撤销 ----
+
+def _display(path: str) -> str:
+    try:
+        return Path(path).relative_to(MOD_ROOT).as_posix()
+    except ValueError:
+        return path
+
+
+def _current_digest(path: str) -> Optional[str]:
+    try:
+        return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def undo_session(store: SnapshotStore, session: Session, force: bool = False) -> List[str]:
+    """把会话中的文件恢复到写入前的状态；返回恢复的文件"""
+    modified = [
+        snapshot.path for snapshot in session.files
+        if snapshot.after is not None and _current_digest(snapshot.path) != snapshot.after
+    ]
+    if modified and not force:
+        raise ValueError(
+            "以下文件在工具写入后又被修改过，使用 --force 仍然恢复：\n  "
+            + "\n  ".join(_display(path) for path in modified)
+        )
+    # 先读出全部内容，校验失败时不改动任何文件
+    contents = {snapshot.path: store.content(snapshot) for snapshot in session.files if snapshot.existed}
+    restored = []
+    for snapshot in session.files:
+        target = Path(snapshot.path)
+        if snapshot.existed:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temp = target.with_name(target.name + ".tmp")
+            temp.write_bytes(contents[snapshot.path])
+            os.replace(temp, target)
+        elif target.exists():
+            target.unlink()
+        restored.append(snapshot.path)
+    session.undone = True
+    store.save_session(session)
+    return restored
+
+
+def _format_time(created: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+
+
+def undo_main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="tools undo", description="撤销最近一次（或多次）工具写入。")
+    parser.add_argument("-n", "--steps", type=int, default=1, help="连续撤销的次数（默认 1）")
+    parser.add_argument("--session", help="撤销到指定会话（含）为止")
+    parser.add_argument("--force", action="store_true", help="文件在写入后又被修改过时仍然恢复")
+    args = parser.parse_args(argv)
+
+    store = _current_store()
+    pending = [session for session in reversed(store.sessions()) if not session.undone]
+    if args.session:
+        ids = [session.id for session in pending]
+        if args.session not in ids:
+            print(f"[错误] 找不到未撤销的会话：{args.session}")
+            return 1
+        pending = pending[:ids.index(args.session) + 1]
+    else:
+        pending = pending[:max(1, args.steps)]
+    if not pending:
+        print("[提示] 没有可以撤销的写入")
+        return 0
+    for session in pending:
+        try:
+            restored = undo_session(store, session, args.force)
+        except (OSError, ValueError) as e:
+            print(f"[错误] 会话 {session.id}（{session.tool}）：{e}")
+            return 1
+        print(f"[已撤销] {session.id}  {session.tool}")
+        for path in restored:
+            print(f"  {_display(path)}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="tools snapshots", description="查看与清理写入前快照。")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="列出会话（新的在前）")
+    listing.add_argument("--all", action="store_true", help="包括已撤销的会话")
+    gc = sub.add_parser("gc", help="按保留策略删除旧会话与无用的块")
+    gc.add_argument("--keep", type=int, default=KEEP_SESSIONS, help=f"至少保留的会话数（默认 {KEEP_SESSIONS}）")
+    gc.add_argument("--days", type=float, default=KEEP_DAYS, help=f"保留这么多天内的会话（默认 {KEEP_DAYS}）")
+    args = parser.parse_args(argv)
+
+    store = _current_store()
+    if args.command == "gc":
+        removed, chunks, freed = store.gc(args.keep, args.days)
+        print(f"[完成] 删除 {removed} 个会话、{chunks} 个块，释放 {freed / 1024:.1f} KB")
+        return 0
+
+    sessions = store.sessions()
+    logical = 0
+    for session in reversed(sessions):
+        logical += sum(snapshot.size for snapshot in session.files)
+        if session.undone and not args.all:
+            continue
+        status = "（已撤销）" if session.undone else ""
+        print(f"{session.id}  {_format_time(session.created)}  {session.tool}{status}")
+        for snapshot in session.files:
+            state = f"{snapshot.size / 1024:.1f} KB" if snapshot.existed else "写入前不存在"
+            print(f"    {_display(snapshot.path)}  {state}")
+    chunks, stored = store.usage()
+    print(
+        f"\n共 {len(sessions)} 个会话，快照原始大小 {logical / 1024:.1f} KB，"
+        f"实际占用 {stored / 1024:.1f} KB（{chunks} 个块），位于 {store.root}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
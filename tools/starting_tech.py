@@ -0,0 +1,823 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开局科技等级查找表生成器
+
+set_starting_tech_level_by_region 原先是一条按顺序逐个比较的 if / else_if 链：
+每个国家开局都要先比较 tag、再逐个比较 6 个 region、再逐个比较 8 个
+sub_continent，大多数国家要做十几次判断才落到自己的分支。
+
+现在以 docs/starting_tech_levels.csv 为唯一数据源（按优先级排列的
+scope,name,level,parent 行），由本工具生成最紧凑的脚本：
+
+- 同一等级的 tag / sub_continent 合并成一个 OR 分支（它们互不相交，顺序无关）；
+- parent 经原版 definitions.txt 确认的 region 例外嵌套在所属 sub_continent 的分支内部，
+  其他大洲的国家不再逐个比较 region；无法确认的作为独立分支排在所有 sub_continent 之前；
+- 表中的 note 写成分支前的注释；
+- 地理分支两两不相交，按 10_* 中命中的国家数从多到少排列；
+- 找不到首都时的默认分支保持原样（已有变量时不覆盖）。
+
+生成前会用一个只支持本 effect 所用触发器的小解释器，对 10_* 中每个国家的
+tag 与首都、以及表中每个 region / sub_continent 构造的样例，分别求值
+"查找表 / 当前脚本 / 生成脚本" 三者的结果；生成脚本与查找表不一致时拒绝写入，
+与当前脚本不一致时（即查找表改变了行为）需要 --allow-changes。
+同时统计每个国家开局时要做的判断次数，报告生成前后的差异。
+region 的 parent 只能用原版 definitions.txt 确认（离线 fixture 是替身数据）：
+与原版矛盾时报错，查不到时不嵌套，也不报告判断次数。
+
+用法：
+    python -m tools starting-tech verify           # 比较当前脚本与查找表
+    python -m tools starting-tech generate --dry-run
+    python -m tools starting-tech generate         # 写回 scripted effect 文件
+    python -m tools starting-tech generate --check # 脚本与生成结果不一致时返回码为 1
+    python -m tools starting-tech extract          # 从当前脚本反推查找表（一次性迁移用；表已存在时需加 --force）
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Set, Tuple
+
+from pdx_script import Block, Entry, parse_bytes
+from pdx_writer import ScriptWriter, atomic_text, atomic_write
+from vfs import GAME_PATH_ENV, MOD_ROOT, VirtualFileSystem, get_vfs
+
+TABLE_CSV = MOD_ROOT / "docs" / "starting_tech_levels.csv"
+EFFECT_FILE = "in_game/common/scripted_effects/zzz_1644_starting_tech.txt"
+EFFECT_NAME = "set_starting_tech_level_by_region"
+VARIABLE = "start_tech_lv_1644"
+RESEARCH_EFFECT = "research_advances_by_level"
+DEFINITIONS_FILE = "in_game/map_data/definitions.txt"
+SETUP_DIR = "main_menu/setup/start"
+COUNTRY_FILE_PREFIX = "10_"
+GENERATED_NOTE = "由 tools/starting_tech.py 根据 docs/starting_tech_levels.csv 生成，请勿手工修改"
+
+TAG = "tag"
+REGION = "region"
+SUB_CONTINENT = "sub_continent"
+DEFAULT = "default"
+SCOPES = (TAG, REGION, SUB_CONTINENT, DEFAULT)
+
+TAG_RE = re.compile(r"^[A-Z][A-Z0-9]{2}$")
+
+
+@dataclass
+class Rule:
+    scope: str
+    name: str
+    level: int
+    parent: str = ""
+    note: str = ""
+
+
+@dataclass
+class TechTable:
+    rules: List[Rule]
+    default: Optional[int] = None
+
+    def lookup(self, country: "Country") -> Optional[int]:
+        """按表中顺序取第一条命中的规则；都不命中时返回默认等级"""
+        for rule in self.rules:
+            if rule.scope == TAG and country.tag == rule.name:
+                return rule.level
+            if rule.scope == REGION and country.region == rule.name:
+                return rule.level
+            if rule.scope == SUB_CONTINENT and country.sub_continent == rule.name:
+                return rule.level
+        return self.default
+
+
+@dataclass(frozen=True)
+class Country:
+    tag: str
+    capital: Optional[str]
+    region: Optional[str] = None
+    sub_continent: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        capital = self.capital or "无首都"
+        return f"{self.tag}（{capital}，{self.region or '-'} / {self.sub_continent or '-'}）"
+
+
+@dataclass
+class Outcome:
+    level: Optional[int]
+    research: int
+    checks: int
+
+    @property
+    def result(self) -> Tuple[Optional[int], int]:
+        return self.level, self.research
+
+
+# ---- 查找表读写 ----
+
+def load_table(path: Path = TABLE_CSV) -> TechTable:
+    rules: List[Rule] = []
+    default: Optional[int] = None
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for number, row in enumerate(csv.DictReader(f), start=2):
+            scope = (row.get("scope") or "").strip()
+            name = (row.get("name") or "").strip()
+            if scope not in SCOPES:
+                raise ValueError(f"{path.name} 第 {number} 行：未知的 scope '{scope}'")
+            try:
+                level = int(row.get("level") or "")
+            except ValueError:
+                raise ValueError(f"{path.name} 第 {number} 行：等级必须是整数") from None
+            if scope == DEFAULT:
+                default = level
+                continue
+            if not name:
+                raise ValueError(f"{path.name} 第 {number} 行：缺少 name")
+            rules.append(Rule(scope, name, level, (row.get("parent") or "").strip(), (row.get("note") or "").strip()))
+    return TechTable(rules, default)
+
+
+def save_table(table: TechTable, path: Path = TABLE_CSV) -> None:
+    with atomic_text(path, encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["scope", "name", "level", "parent", "note"])
+        for rule in table.rules:
+            writer.writerow([rule.scope, rule.name, rule.level, rule.parent, rule.note])
+        if table.default is not None:
+            writer.writerow([DEFAULT, "", table.default, "", ""])
+
+
+# ---- 地理与国家 ----
+
+def build_geography(document: Block) -> Dict[str, Tuple[str, str]]:
+    """location -> (region, sub_continent)；region 的上一级块即 sub_continent"""
+    parents: Dict[str, Tuple[str, str]] = {}
+
+    def collect(block: Block, region: str, sub_continent: str) -> None:
+        for entry in block:
+            if not entry.is_block:
+                continue
+            if entry.key is not None and entry.key.endswith("_province"):
+                for location in entry.value.values():
+                    if isinstance(location, str):
+                        parents[location] = (region, sub_continent)
+            else:
+                collect(entry.value, region, sub_continent)
+
+    def visit(block: Block, path: List[str]) -> None:
+        for entry in block:
+            if not entry.is_block or entry.key is None:
+                continue
+            if entry.key.endswith("_region"):
+                sub_continent = path[-1] if len(path) >= 2 else ""
+                collect(entry.value, entry.key, sub_continent)
+            else:
+                visit(entry.value, path + [entry.key])
+
+    visit(document, [])
+    return parents
+
+
+def region_parents(geography: Dict[str, Tuple[str, str]]) -> Dict[str, str]:
+    return {region: sub_continent for region, sub_continent in geography.values()}
+
+
+def load_countries(vfs: VirtualFileSystem) -> Dict[str, Optional[str]]:
+    """tag -> 首都；按加载顺序后面的文件覆盖前面的"""
+    capitals: Dict[str, Optional[str]] = {}
+
+    def visit(block: Block) -> None:
+        for entry in block:
+            if not entry.is_block or entry.key is None:
+                continue
+            if TAG_RE.match(entry.key):
+                capital = entry.value.get("capital")
+                if isinstance(capital, str) or entry.key not in capitals:
+                    capitals[entry.key] = capital if isinstance(capital, str) else None
+            elif entry.key == "countries":
+                visit(entry.value)
+
+    for logical in vfs.listdir(SETUP_DIR, (".txt",)):
+        if logical.rsplit("/", 1)[-1].startswith(COUNTRY_FILE_PREFIX):
+            visit(vfs.parse(logical))
+    return capitals
+
+
+def build_cases(
+    table: TechTable,
+    capitals: Dict[str, Optional[str]],
+    geography: Dict[str, Tuple[str, str]],
+    confirmed: Collection[str] = (),
+) -> List[Country]:
+    """10_* 中的全部国家，加上表中每个 region / sub_continent 与 tag 规则的组合样例；
+    parent 未经确认的 region 另外放到表外的 sub_continent 中各构造一个"""
+    cases: List[Country] = []
+    for tag, capital in sorted(capitals.items()):
+        region, sub_continent = geography.get(capital, (None, None)) if capital else (None, None)
+        cases.append(Country(tag, capital, region or None, sub_continent or None))
+
+    places: List[Tuple[Optional[str], Optional[str]]] = []
+    for rule in table.rules:
+        if rule.scope == REGION:
+            places.append((rule.name, rule.parent or None))
+            if rule.name not in confirmed:
+                places.append((rule.name, "__other_sub_continent"))
+        elif rule.scope == SUB_CONTINENT:
+            places.append((None, rule.name))
+    places.append((None, "__other_sub_continent"))
+    tags = ["___"] + [rule.name for rule in table.rules if rule.scope == TAG]
+    for tag in tags:
+        cases.append(Country(tag, None))
+        for region, sub_continent in places:
+            cases.append(Country(tag, f"<{region or sub_continent}>", region, sub_continent))
+    return cases
+
+
+# ---- 解释器 ----
+
+def _scope_key(value: str, prefix: str) -> str:
+    return value[len(prefix) + 1:] if value.startswith(prefix + ":") else value
+
+
+class Evaluator:
+    """只支持本 effect 用到的效果与触发器；遇到其他内容抛出 ValueError"""
+
+    def __init__(self, country: Country):
+        self.country = country
+        self.variables: Dict[str, int] = {}
+        self.research = 0
+        self.checks = 0
+
+    def outcome(self) -> Outcome:
+        return Outcome(self.variables.get(VARIABLE), self.research, self.checks)
+
+    def run(self, block: Block) -> None:
+        done = True
+        for entry in block:
+            key = entry.key
+            if key == "limit":
+                continue
+            if key == "if":
+                done = self._branch(entry.value)
+            elif key == "else_if":
+                if not done:
+                    done = self._branch(entry.value)
+            elif key == "else":
+                if not done:
+                    self.run(entry.value)
+                done = True
+            elif key == "set_variable" and entry.is_block:
+                self.variables[entry.value["name"]] = int(entry.value["value"])
+            elif key == RESEARCH_EFFECT and entry.value == "yes":
+                self.research += 1
+            else:
+                raise ValueError(f"第 {entry.line} 行：不支持的效果 {key}")
+
+    def _branch(self, block: Block) -> bool:
+        limit = block.get("limit")
+        if isinstance(limit, Block) and not self.all(limit, in_capital=False):
+            return False
+        self.run(block)
+        return True
+
+    def all(self, block: Block, in_capital: bool) -> bool:
+        return all(self.test(entry, in_capital) for entry in block)
+
+    def test(self, entry: Entry, in_capital: bool) -> bool:
+        key, value = entry.key, entry.value
+        if key == "OR":
+            return any(self.test(child, in_capital) for child in value)
+        if key == "AND":
+            return self.all(value, in_capital)
+        if key == "NOT":
+            return not any(self.test(child, in_capital) for child in value)
+        self.checks += 1
+        country = self.country
+        if in_capital:
+            if key == REGION:
+                return country.region == _scope_key(value, REGION)
+            if key == SUB_CONTINENT:
+                return country.sub_continent == _scope_key(value, SUB_CONTINENT)
+        elif key == TAG:
+            return country.tag == value
+        elif key == "exists" and value == "capital":
+            return country.capital is not None
+        elif key == "has_variable":
+            return value in self.variables
+        elif key == "capital.region":
+            return country.capital is not None and country.region == _scope_key(value, REGION)
+        elif key == "capital.sub_continent":
+            return country.capital is not None and country.sub_continent == _scope_key(value, SUB_CONTINENT)
+        elif key == "capital" and isinstance(value, Block):
+            return country.capital is not None and self.all(value, in_capital=True)
+        raise ValueError(f"第 {entry.line} 行：不支持的触发器 {key}")
+
+
+def evaluate(effect: Block, country: Country) -> Outcome:
+    evaluator = Evaluator(country)
+    evaluator.run(effect)
+    return evaluator.outcome()
+
+
+def find_effect(document: Block) -> Entry:
+    for entry in document:
+        if entry.key == EFFECT_NAME and entry.is_block:
+            return entry
+    raise ValueError(f"{EFFECT_FILE} 中没有 {EFFECT_NAME}")
+
+
+# ---- 从脚本反推查找表 ----
+
+def _atoms(block: Block) -> List[Tuple[str, str]]:
+    """limit 中的 (scope, name) 条件；exists = capital 这类前提忽略"""
+    atoms: List[Tuple[str, str]] = []
+    for entry in block:
+        key, value = entry.key, entry.value
+        if key in ("OR", "capital") and isinstance(value, Block):
+            atoms.extend(_atoms(value))
+        elif key == TAG:
+            atoms.append((TAG, value))
+        elif key in ("capital.region", REGION):
+            atoms.append((REGION, _scope_key(value, REGION)))
+        elif key in ("capital.sub_continent", SUB_CONTINENT):
+            atoms.append((SUB_CONTINENT, _scope_key(value, SUB_CONTINENT)))
+    return atoms
+
+
+def _level(block: Block) -> Optional[int]:
+    for value in block.get_all("set_variable"):
+        if isinstance(value, Block) and value.get("name") == VARIABLE:
+            return int(value["value"])
+    return None
+
+
+def extract_table(effect: Block, parents: Dict[str, str]) -> TechTable:
+    table = TechTable([])
+    for entry in effect:
+        if not entry.is_block:
+            continue
+        if entry.key == "else":
+            inner = entry.value.get("if")
+            table.default = _level(inner if isinstance(inner, Block) else entry.value)
+            continue
+        limit = entry.value.get("limit")
+        atoms = _atoms(limit) if isinstance(limit, Block) else []
+        level = _level(entry.value)
+        if level is not None:
+            for scope, name in atoms:
+                table.rules.append(Rule(scope, name, level, parents.get(name, "") if scope == REGION else ""))
+            continue
+        # 生成脚本中带 region 例外的 sub_continent 分支
+        sub_continents = [name for scope, name in atoms if scope == SUB_CONTINENT]
+        for child in entry.value:
+            if not child.is_block or child.key not in ("if", "else_if", "else"):
+                continue
+            child_level = _level(child.value)
+            if child.key == "else":
+                table.rules.extend(Rule(SUB_CONTINENT, name, child_level) for name in sub_continents)
+                continue
+            child_limit = child.value.get("limit")
+            for scope, name in _atoms(child_limit) if isinstance(child_limit, Block) else []:
+                parent = sub_continents[0] if sub_continents else ""
+                table.rules.append(Rule(scope, name, child_level, parent))
+    return table
+
+
+# ---- 生成 ----
+
+@dataclass
+class _Group:
+    """一个 sub_continent 及其内部的 region 例外"""
+    name: str
+    level: Optional[int] = None
+    note: str = ""
+    regions: List[Rule] = field(default_factory=list)
+
+
+def _by_level(rules: Iterable[Rule]) -> List[Tuple[int, List[Rule]]]:
+    """按等级合并，保持各等级首次出现的顺序"""
+    levels: Dict[int, List[Rule]] = {}
+    for rule in rules:
+        levels.setdefault(rule.level, []).append(rule)
+    return list(levels.items())
+
+
+def _names(rules: Iterable[Rule]) -> List[str]:
+    return [rule.name for rule in rules]
+
+
+def plan(
+    table: TechTable,
+    confirmed: Collection[str] = (),
+) -> Tuple[List[Rule], List[Rule], List[_Group], List[str]]:
+    """检查查找表并分组，返回 (tag 规则, 独立的 region 例外, sub_continent 分组, 警告)
+
+    confirmed 为 parent 已用真实 definitions.txt 确认的 region；其余 region 例外不嵌套，
+    作为独立分支排在所有 sub_continent 分支之前，因此在表中也必须排在 sub_continent 规则之前。
+    """
+    warnings: List[str] = []
+    tags: List[Rule] = []
+    loose: List[Rule] = []
+    groups: Dict[str, _Group] = {}
+    seen_geography = False
+    seen_sub_continent = False
+    for rule in table.rules:
+        if rule.scope == TAG:
+            if seen_geography:
+                raise ValueError(f"tag 规则 {rule.name} 必须排在所有地理规则之前")
+            if rule.name in {t.name for t in tags}:
+                warnings.append(f"tag {rule.name} 重复，后一条永远不会命中，已忽略")
+                continue
+            tags.append(rule)
+            continue
+        seen_geography = True
+        if rule.scope == REGION and rule.name not in confirmed:
+            if seen_sub_continent:
+                raise ValueError(f"region {rule.name} 的 parent 未经确认，必须排在所有 sub_continent 规则之前")
+            if rule.name in {r.name for r in loose}:
+                warnings.append(f"region {rule.name} 重复，后一条永远不会命中，已忽略")
+            else:
+                loose.append(rule)
+        elif rule.scope == REGION:
+            if not rule.parent:
+                raise ValueError(f"region {rule.name} 缺少 parent（所属 sub_continent）")
+            group = groups.setdefault(rule.parent, _Group(rule.parent))
+            if group.level is not None:
+                warnings.append(f"region {rule.name} 排在 {rule.parent} 之后，永远不会命中，已忽略")
+            elif rule.name in {r.name for r in group.regions}:
+                warnings.append(f"region {rule.name} 重复，后一条永远不会命中，已忽略")
+            else:
+                group.regions.append(rule)
+        else:
+            seen_sub_continent = True
+            group = groups.setdefault(rule.name, _Group(rule.name))
+            if group.level is not None:
+                warnings.append(f"sub_continent {rule.name} 重复，后一条永远不会命中，已忽略")
+            else:
+                group.level = rule.level
+                group.note = rule.note
+    for group in groups.values():
+        # 与所属 sub_continent 等级相同的 region 例外是多余的
+        if group.level is not None:
+            group.regions = [r for r in group.regions if r.level != group.level]
+    return tags, loose, list(groups.values()), warnings
+
+
+def _set_level(writer: ScriptWriter, level: int) -> None:
+    writer.inline("set_variable", [("name", VARIABLE), ("value", level)])
+
+
+def _notes(writer: ScriptWriter, rules: List[Rule]) -> None:
+    """表中 note 列写成分支前的注释：分支中各条规则的 note 相同时写一次，否则逐条注明规则名"""
+    notes = {rule.note for rule in rules}
+    if len(notes) == 1:
+        if rules[0].note:
+            writer.comment(rules[0].note)
+        return
+    for rule in rules:
+        if rule.note:
+            writer.comment(f"{rule.name}：{rule.note}")
+
+
+def _limit(writer: ScriptWriter, names: List[str], scope: str, capital: Optional[str]) -> None:
+    """limit = { ... }；capital 为 "?=" / "=" 时在首都作用域内比较"""
+    prefix = f"{scope}:" if scope != TAG else ""
+    conditions = [(scope, prefix + name) for name in names]
+    if capital is None and len(conditions) == 1:
+        writer.inline("limit", conditions)
+        return
+    writer.open("limit")
+    if capital is not None and len(conditions) == 1:
+        writer.inline("capital", conditions, op=capital)
+    else:
+        if capital is not None:
+            writer.open("capital", capital)
+        writer.open("OR")
+        for key, value in conditions:
+            writer.field(key, value)
+        writer.close()
+        if capital is not None:
+            writer.close()
+    writer.close()
+
+
+# 地理分支：(覆盖的 sub_continent / region, 分支前的注释所取的规则, 写出分支内容的函数)
+_Branch = Tuple[List[str], List[Rule], Callable[[], None]]
+
+
+def write_effect(
+    writer: ScriptWriter,
+    table: TechTable,
+    weights: Optional[Dict[str, int]] = None,
+    confirmed: Collection[str] = (),
+) -> List[str]:
+    """把查找表写成 set_starting_tech_level_by_region 定义，返回警告
+
+    weights 为各 sub_continent / region 的国家数；地理分支两两不相交，
+    按命中国家数从多到少排列，使大多数国家在前几个分支就结束判断。
+    parent 未经确认（不在 confirmed 中）的 region 例外不参与排列，
+    按表中顺序作为独立分支排在 tag 之后、所有 sub_continent 之前。
+    """
+    tags, loose, groups, warnings = plan(table, confirmed)
+    weights = weights or {}
+    keyword = "if"
+
+    def branch(rules: List[Rule], write: Callable[[], None]) -> None:
+        nonlocal keyword
+        _notes(writer, rules)
+        writer.open(keyword)
+        keyword = "else_if"
+        write()
+        writer.field(RESEARCH_EFFECT, "yes")
+        writer.close()
+
+    def simple(names: List[str], scope: str, level: int) -> Callable[[], None]:
+        def write() -> None:
+            _limit(writer, names, scope, "?=")
+            _set_level(writer, level)
+        return write
+
+    def nested(group: _Group) -> Callable[[], None]:
+        def write() -> None:
+            _limit(writer, [group.name], SUB_CONTINENT, "?=")
+            inner = "if"
+            for level, rules in _by_level(group.regions):
+                _notes(writer, rules)
+                writer.open(inner)
+                _limit(writer, _names(rules), REGION, "=")
+                _set_level(writer, level)
+                writer.close()
+                inner = "else_if"
+            writer.open("else")
+            _set_level(writer, group.level)
+            writer.close()
+        return write
+
+    def tag_branch(names: List[str], level: int) -> Callable[[], None]:
+        def write() -> None:
+            _limit(writer, names, TAG, None)
+            _set_level(writer, level)
+        return write
+
+    writer.open(EFFECT_NAME)
+    writer.comment(GENERATED_NOTE)
+    for level, rules in _by_level(tags):
+        branch(rules, tag_branch(_names(rules), level))
+    for level, rules in _by_level(loose):
+        branch(rules, simple(_names(rules), REGION, level))
+
+    # 没有 region 例外的 sub_continent 按等级合并；有例外的单独一支，例外嵌套在内；
+    # 所属 sub_continent 没有自己等级的 region 例外直接作为顶层分支
+    branches: List[_Branch] = []
+    plain = [Rule(SUB_CONTINENT, g.name, g.level, note=g.note) for g in groups if g.level is not None and not g.regions]
+    for level, rules in _by_level(plain):
+        branches.append((_names(rules), rules, simple(_names(rules), SUB_CONTINENT, level)))
+    for group in groups:
+        if not group.regions:
+            continue
+        if group.level is None:
+            for level, rules in _by_level(group.regions):
+                branches.append((_names(rules), rules, simple(_names(rules), REGION, level)))
+        else:
+            note = [Rule(SUB_CONTINENT, group.name, group.level, note=group.note)]
+            branches.append(([group.name], note, nested(group)))
+    branches.sort(key=lambda item: -sum(weights.get(name, 0) for name in item[0]))
+    for _, rules, write in branches:
+        branch(rules, write)
+
+    if table.default is not None:
+        wrapped = keyword != "if"
+        if wrapped:
+            writer.open("else")
+        writer.open("if")
+        writer.open("limit")
+        writer.inline("NOT", [("has_variable", VARIABLE)])
+        writer.close()
+        _set_level(writer, table.default)
+        writer.field(RESEARCH_EFFECT, "yes")
+        writer.close()
+        if wrapped:
+            writer.close()
+    writer.close()
+    return warnings
+
+
+def country_weights(cases: Iterable[Country]) -> Dict[str, int]:
+    """各 sub_continent / region 的国家数"""
+    weights: Dict[str, int] = {}
+    for country in cases:
+        for name in (country.region, country.sub_continent):
+            if name:
+                weights[name] = weights.get(name, 0) + 1
+    return weights
+
+
+def render_effect(
+    table: TechTable,
+    weights: Optional[Dict[str, int]] = None,
+    confirmed: Collection[str] = (),
+) -> Tuple[bytes, List[str]]:
+    buffer = io.BytesIO()
+    writer = ScriptWriter(buffer)
+    warnings = write_effect(writer, table, weights, confirmed)
+    writer.finish()
+    return buffer.getvalue(), warnings
+
+
+def splice(source: bytes, entry: Entry, rendered: bytes) -> bytes:
+    """只替换文件中这一个定义，其余内容逐字节保留"""
+    return source[:entry.start] + rendered.rstrip(b"\n") + source[entry.end:]
+
+
+# ---- 校验 ----
+
+@dataclass
+class Comparison:
+    cases: int = 0
+    changed: List[Tuple[Country, Outcome, Outcome]] = field(default_factory=list)
+    wrong: List[Tuple[Country, Optional[int], Outcome]] = field(default_factory=list)
+    checks_before: int = 0
+    checks_after: int = 0
+    countries: int = 0
+    country_checks_before: int = 0
+    country_checks_after: int = 0
+
+
+def compare(
+    table: TechTable,
+    before: Block,
+    after: Block,
+    cases: List[Country],
+    real: int,
+) -> Comparison:
+    """real 为 cases 中前 real 个真实国家的数量，单独统计判断次数"""
+    comparison = Comparison(cases=len(cases), countries=real)
+    for index, country in enumerate(cases):
+        old = evaluate(before, country)
+        new = evaluate(after, country)
+        expected = table.lookup(country)
+        if new.level != expected or new.research != (1 if expected is not None else 0):
+            comparison.wrong.append((country, expected, new))
+        if old.result != new.result:
+            comparison.changed.append((country, old, new))
+        comparison.checks_before += old.checks
+        comparison.checks_after += new.checks
+        if index < real:
+            comparison.country_checks_before += old.checks
+            comparison.country_checks_after += new.checks
+    return comparison
+
+
+def _describe(outcome: Outcome) -> str:
+    level = "不设置" if outcome.level is None else f"{outcome.level} 级"
+    return f"{level}，research × {outcome.research}"
+
+
+def print_comparison(comparison: Comparison, limit: int = 20, costs: bool = True) -> None:
+    """costs 为 False（没有真实地理，国家首都都落不到地区上）时不报告判断次数"""
+    for country, expected, outcome in comparison.wrong[:limit]:
+        print(f"[与查找表不符] {country.label}：表中为 {expected}，生成脚本为 {_describe(outcome)}")
+    for country, old, new in comparison.changed[:limit]:
+        print(f"[行为变化] {country.label}：{_describe(old)} -> {_describe(new)}")
+    hidden = max(0, len(comparison.wrong) - limit) + max(0, len(comparison.changed) - limit)
+    if hidden:
+        print(f"……另有 {hidden} 条未列出")
+
+    def ratio(before: int, after: int) -> str:
+        return f"{before} -> {after}（减少 {1 - after / before:.0%}）" if before else "0"
+
+    print(f"\n样例 {comparison.cases} 个（其中 10_* 国家 {comparison.countries} 个）")
+    if not costs:
+        print("没有真实的 definitions.txt，不报告开局判断次数")
+        return
+    print(f"10_* 国家开局判断次数合计：{ratio(comparison.country_checks_before, comparison.country_checks_after)}")
+    print(f"全部样例判断次数合计：{ratio(comparison.checks_before, comparison.checks_after)}")
+
+
+def load_geography(vfs: VirtualFileSystem) -> Dict[str, Tuple[str, str]]:
+    """真实 definitions.txt 中的地理；只有离线 fixture（替身数据）或文件缺失时返回空表"""
+    if not vfs.exists(DEFINITIONS_FILE) or vfs.is_fixture(DEFINITIONS_FILE):
+        return {}
+    return build_geography(vfs.parse(DEFINITIONS_FILE))
+
+
+@dataclass
+class Inputs:
+    source: bytes
+    entry: Entry
+    cases: List[Country]
+    # cases 中前 real 个是 10_* 中的真实国家
+    real: int
+    # parent 已用真实 definitions.txt 确认的 region
+    confirmed: Set[str]
+    # 是否有真实地理（没有时国家的判断次数没有意义）
+    geographic: bool
+
+
+def load_inputs(vfs: VirtualFileSystem, table: TechTable) -> Inputs:
+    """region 的 parent 决定它能否嵌套在 sub_continent 分支内，只认真实 definitions.txt：
+    与之矛盾时报错；查不到（没有原版目录、只有 fixture 或原版中没有）时不嵌套"""
+    source = vfs.read_bytes(EFFECT_FILE)
+    entry = find_effect(parse_bytes(source))
+    geography = load_geography(vfs)
+    parents = region_parents(geography)
+    confirmed: Set[str] = set()
+    for rule in table.rules:
+        if rule.scope != REGION:
+            continue
+        known = parents.get(rule.name)
+        if known is None:
+            continue
+        if known != rule.parent:
+            raise ValueError(f"region {rule.name} 在 definitions.txt 中属于 {known}，表中写的是 {rule.parent}")
+        confirmed.add(rule.name)
+    capitals = load_countries(vfs)
+    cases = build_cases(table, capitals, geography, confirmed)
+    return Inputs(source, entry, cases, len(capitals), confirmed, bool(geography))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools starting-tech",
+        description="由查找表生成开局科技等级 effect，并校验与当前脚本的行为一致。",
+    )
+    parser.add_argument("--table", type=Path, default=TABLE_CSV, help="查找表 CSV（默认 docs/starting_tech_levels.csv）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("verify", help="比较当前脚本与查找表")
+    generate = sub.add_parser("generate", help="生成脚本并写回 scripted effect 文件")
+    generate.add_argument("--dry-run", action="store_true", help="只输出生成结果，不写文件")
+    generate.add_argument("--check", action="store_true", help="文件与生成结果不一致时返回码为 1")
+    generate.add_argument("--allow-changes", action="store_true", help="允许生成结果改变现有行为")
+    extract = sub.add_parser("extract", help="从当前脚本反推查找表并写入 --table")
+    extract.add_argument("--force", action="store_true", help="覆盖已有的查找表")
+    args = parser.parse_args(argv)
+
+    vfs = get_vfs()
+    if args.command == "extract":
+        if args.table.exists() and not args.force:
+            print(f"[错误] {args.table} 已存在，它是手工维护的查找表；确认要用反推结果覆盖时加 --force")
+            return 1
+        entry = find_effect(vfs.parse(EFFECT_FILE))
+        table = extract_table(entry.value, region_parents(load_geography(vfs)))
+        save_table(table, args.table)
+        print(f"[完成] {len(table.rules)} 条规则写入 {args.table}；parent 为空的 region 需要手工补全")
+        return 0
+
+    try:
+        table = load_table(args.table)
+        inputs = load_inputs(vfs, table)
+        source, entry, cases, real = inputs.source, inputs.entry, inputs.cases, inputs.real
+        rendered, warnings = render_effect(table, country_weights(cases[:real]), inputs.confirmed)
+        generated = find_effect(parse_bytes(rendered))
+        comparison = compare(table, entry.value, generated.value, cases, real)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[错误] {e}")
+        return 1
+    for warning in warnings:
+        print(f"[警告] {warning}")
+    unconfirmed = [r.name for r in table.rules if r.scope == REGION and r.name not in inputs.confirmed]
+    if unconfirmed:
+        where = "definitions.txt 中没有" if inputs.geographic else f"没有真实的 definitions.txt（可设置 {GAME_PATH_ENV}）"
+        print(f"[提示] {where}，parent 无法确认，不嵌套而作为独立分支：{'、'.join(unconfirmed)}")
+
+    if args.command == "verify":
+        # 当前脚本视为"生成结果"与查找表比较
+        comparison = compare(table, entry.value, entry.value, cases, real)
+        for country, expected, outcome in comparison.wrong[:20]:
+            print(f"[与查找表不符] {country.label}：表中为 {expected}，当前脚本为 {_describe(outcome)}")
+        print(f"\n样例 {comparison.cases} 个，不一致 {len(comparison.wrong)} 个")
+        return 1 if comparison.wrong else 0
+
+    if args.dry_run:
+        sys.stdout.write(rendered.decode("utf-8"))
+    print_comparison(comparison, costs=inputs.geographic)
+    if comparison.wrong:
+        print("\n[错误] 生成脚本与查找表不一致，未写入")
+        return 1
+
+    output = splice(source, entry, rendered)
+    if args.check:
+        if output != source:
+            print(f"\n[需要重新生成] {EFFECT_FILE}")
+            return 1
+        print(f"\n[通过] {EFFECT_FILE} 与查找表一致")
+        return 0
+    if comparison.changed and not args.allow_changes:
+        print(f"\n[错误] 有 {len(comparison.changed)} 个样例的结果会改变，确认后加 --allow-changes")
+        return 1
+    if args.dry_run or output == source:
+        print("\n[未写入] " + ("--dry-run" if args.dry_run else "文件已是最新"))
+        return 0
+    with atomic_write(vfs.mod_path(EFFECT_FILE)) as f:
+        f.write(output)
+    vfs.invalidate(EFFECT_FILE)
+    print(f"\n[已写入] {vfs.mod_path(EFFECT_FILE)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
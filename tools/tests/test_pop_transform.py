@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""pop_transform 变换引擎的单元测试（python -m pytest tools/tests）"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pop_transform import PopTable, PopTransformer, Rule, Selector  # noqa: E402
+
+
+def _table(*pops):
+    return PopTable.from_populations({
+        "loc": [{"type": "peasants", "culture": culture, "religion": "r", "size": size} for culture, size in pops]
+    })
+
+
+def _sizes(table):
+    return {table.culture[row]: table.size[row] for row in range(len(table))}
+
+
+class ApplyTest(unittest.TestCase):
+    def test_moved_population_is_not_transformed_twice(self):
+        # 转移进 hui 的人口也在本条规则的选择范围内，但不应再被乘 factor、再转移一次
+        table = _table(("han", 100.0), ("hui", 100.0))
+        rule = Rule(Selector(types=("peasants",)), parts=[(0.5, {"culture": "hui"})], factor=0.5, name="t")
+        report = PopTransformer(table, scaler=None).apply(rule)
+        sizes = _sizes(table)
+        self.assertAlmostEqual(sizes["han"], 25.0)
+        self.assertAlmostEqual(sizes["hui"], 75.0)
+        self.assertAlmostEqual(report.population_touched, 200.0)
+        self.assertAlmostEqual(report.population_delta, -100.0)
+
+    def test_move_into_new_row(self):
+        table = _table(("han", 100.0))
+        rule = Rule(Selector(cultures=("han",)), parts=[(0.25, {"culture": "hui"})], name="t")
+        report = PopTransformer(table, scaler=None).apply(rule)
+        self.assertEqual(_sizes(table), {"han": 75.0, "hui": 25.0})
+        self.assertAlmostEqual(report.population_moved, 25.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
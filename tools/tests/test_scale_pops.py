@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""scale_pops.replace_locations 的单元测试（python -m pytest tools/tests）"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scale_pops import replace_locations  # noqa: E402
+
+SOURCE = (
+    b"# header\n"
+    b"locations = {\n"
+    b"    a = { define_pop = { type = peasants size = 1 culture = x religion = y } }  # keep\n"
+    b"\tb = {\n"
+    b"\t\tdefine_pop = { type = peasants size = 2.50 culture = x religion = y }\n"
+    b"\t}\n"
+    b"\tc={define_pop={type=clergy size=3 culture=x religion=y}}\n"
+    b"}\n"
+)
+
+
+def _pop(size):
+    return {"type": "peasants", "size": size, "culture": "x", "religion": "y"}
+
+
+class ReplaceLocationsTest(unittest.TestCase):
+    def test_untouched_locations_are_byte_identical(self):
+        output = replace_locations(SOURCE, {"b": [_pop(5.0)]})
+        before, after = SOURCE.split(b"\tb = {")[0], SOURCE.split(b"\t}\n", 1)[1]
+        self.assertTrue(output.startswith(before))
+        self.assertTrue(output.endswith(after))
+        self.assertIn(b"\tb = {\n\t\tdefine_pop = {\ttype = peasants\tsize = 5.000", output)
+
+    def test_comment_written_once_before_first_replacement(self):
+        output = replace_locations(SOURCE, {"a": [_pop(1.0)], "c": [_pop(2.0)]}, "scaled")
+        self.assertEqual(output.count(b"# scaled"), 1)
+        self.assertIn(b"    # scaled\n    a = {\n    \tdefine_pop", output)
+        self.assertIn(b"  # keep\n\tb = {\n\t\tdefine_pop = { type = peasants size = 2.50", output)
+
+    def test_no_replacement_returns_source(self):
+        self.assertEqual(replace_locations(SOURCE, {"missing": [_pop(1.0)]}), SOURCE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""starting_tech 生成器的单元测试（python -m pytest tools/tests）"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pdx_script import parse_bytes  # noqa: E402
+from starting_tech import (  # noqa: E402
+    REGION, SUB_CONTINENT, TAG, Country, Rule, TechTable, evaluate, find_effect, render_effect,
+)
+
+
+def _table():
+    return TechTable([
+        Rule(TAG, "QNG", 3, note="清"),
+        Rule(REGION, "japan_region", 3, "east_asia"),
+        Rule(SUB_CONTINENT, "east_asia", 1),
+        Rule(SUB_CONTINENT, "western_europe", 4),
+    ], default=1)
+
+
+def _level(rendered, country):
+    return evaluate(find_effect(parse_bytes(rendered)).value, country).level
+
+
+class WriteEffectTest(unittest.TestCase):
+    def test_unconfirmed_region_is_standalone(self):
+        # parent 未确认时，region 例外必须在任何 sub_continent 之前独立判断
+        rendered, _ = render_effect(_table(), {"western_europe": 100})
+        text = rendered.decode("utf-8")
+        self.assertLess(text.index("region:japan_region"), text.index("sub_continent:"))
+        self.assertIn("# 清", text)
+        elsewhere = Country("JAP", "kyoto", "japan_region", "far_east")
+        self.assertEqual(_level(rendered, elsewhere), 3)
+
+    def test_confirmed_region_is_nested(self):
+        rendered, _ = render_effect(_table(), {"western_europe": 100}, confirmed={"japan_region"})
+        text = rendered.decode("utf-8")
+        self.assertLess(text.index("sub_continent:western_europe"), text.index("region:japan_region"))
+        self.assertEqual(_level(rendered, Country("JAP", "kyoto", "japan_region", "east_asia")), 3)
+        self.assertEqual(_level(rendered, Country("MNG", "beijing", "north_china_region", "east_asia")), 1)
+
+    def test_unconfirmed_region_after_sub_continent_is_rejected(self):
+        table = _table()
+        table.rules.append(Rule(REGION, "korea_region", 3, "east_asia"))
+        with self.assertRaises(ValueError):
+            render_effect(table)
+
+
+if __name__ == "__main__":
+    unittest.main()
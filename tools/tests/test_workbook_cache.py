@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""workbook_cache 的单元测试（python -m pytest tools/tests）"""
+
+import datetime as dt
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vfs  # noqa: E402
+import workbook_cache  # noqa: E402
+from workbook_cache import _cache_file, _cache_prefix, open_workbook  # noqa: E402
+
+HAS_OPENPYXL = importlib.util.find_spec("openpyxl") is not None
+
+
+def _save(path, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "人口"
+    for row in rows:
+        sheet.append(row)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(path)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        cache_dir = self.root / ".cache"
+        for patcher in (mock.patch.object(vfs, "CACHE_DIR", cache_dir),
+                        mock.patch.object(workbook_cache, "CACHE_DIR", cache_dir)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = cache_dir
+
+    def test_same_stem_in_different_directories_has_distinct_names(self):
+        first, second = self.root / "a" / "pops.xlsx", self.root / "b" / "pops.xlsx"
+        self.assertNotEqual(_cache_prefix(first), _cache_prefix(second))
+        self.assertFalse(_cache_file(second, "0" * 40).name.startswith(_cache_prefix(first) + "."))
+        # 斜杠与下划线折叠成同一个 slug 时仍由路径哈希区分
+        self.assertNotEqual(_cache_prefix(self.root / "a_b" / "c.xlsx"), _cache_prefix(self.root / "a" / "b_c.xlsx"))
+
+    @unittest.skipUnless(HAS_OPENPYXL, "需要 openpyxl")
+    def test_cold_conversion_then_warm_read(self):
+        path = self.root / "docs" / "pops.xlsx"
+        _save(path, [
+            ["地区", "人口", "比例", "日期"],
+            ["北直隶", 120, 0.5, dt.datetime(1644, 4, 25)],
+            ["南直隶", None, 1.25, None],
+        ])
+        expected = [
+            ("地区", "人口", "比例", "日期"),
+            ("北直隶", 120, 0.5, "1644.4.25"),
+            ("南直隶", None, 1.25, None),
+        ]
+        workbook = open_workbook(path)
+        self.assertEqual(workbook.sheet_names, ["人口"])
+        self.assertEqual(list(workbook.active.rows()), expected)
+        self.assertEqual(workbook.active.kinds, ["text", "int", "float", "text"])
+        self.assertTrue(_cache_file(path, workbook.digest).exists())
+
+        with mock.patch.object(workbook_cache, "_read_xlsx", side_effect=AssertionError("缓存未命中")):
+            self.assertEqual(list(open_workbook(path)["人口"].rows()), expected)
+
+    @unittest.skipUnless(HAS_OPENPYXL, "需要 openpyxl")
+    def test_rebuild_keeps_caches_of_same_stem_elsewhere(self):
+        first, second = self.root / "a" / "pops.xlsx", self.root / "b" / "pops.xlsx"
+        _save(first, [["a", 1]])
+        _save(second, [["b", 2]])
+        old_first = _cache_file(first, open_workbook(first).digest)
+        kept = _cache_file(second, open_workbook(second).digest)
+
+        _save(first, [["a", 3]])
+        new_first = _cache_file(first, open_workbook(first).digest)
+        self.assertNotEqual(old_first, new_first)
+        self.assertFalse(old_first.exists())
+        self.assertTrue(new_first.exists())
+        self.assertTrue(kept.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
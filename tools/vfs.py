@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分层虚拟文件系统（VFS）
+
+把 mod、原版游戏安装目录以及仓库内置的离线 fixture 叠成一个逻辑视图。
+逻辑路径（如 `in_game/map_data/definitions.txt`）按层的优先级依次查找，
+与游戏加载时"同路径文件由 mod 覆盖原版"的规则一致：
+
+    mod  >  原版游戏  >  tools/fixtures/vanilla（离线 CI 用的最小替身）
+
+每一层的目录列表、stat 结果和解析后的脚本树都是惰性缓存的，
+热身之后一次原版文件查找只是一次字典命中。
+
+原版游戏路径按以下顺序确定：
+    1. 环境变量 EU5_GAME_PATH
+    2. DEFAULT_GAME_PATHS 中第一个存在的目录
+找不到原版游戏时自动退回到 fixture 层。
+
+用法：
+    python -m tools where in_game/map_data/definitions.txt
+    python -m tools where --layers
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pdx_script import Document, parse_bytes
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+MOD_ROOT = SCRIPT_DIR.parent
+FIXTURE_ROOT = SCRIPT_DIR / "fixtures" / "vanilla"
+# 工具生成的缓存（索引、汇总等）统一放在这里，不进入 mod 加载范围
+CACHE_DIR = Path(os.environ.get("TOOLS_CACHE_DIR", SCRIPT_DIR / ".cache"))
+
+GAME_PATH_ENV = "EU5_GAME_PATH"
+DEFAULT_GAME_PATHS = [
+    r"E:\SteamLibrary\steamapps\common\Europa Universalis V\game",
+    "~/.steam/steam/steamapps/common/Europa Universalis V/game",
+    "~/.local/share/Steam/steamapps/common/Europa Universalis V/game",
+]
+
+
+def find_game_path() -> Optional[Path]:
+    """定位原版游戏的 game 目录，找不到时返回 None"""
+    candidates = []
+    env_path = os.environ.get(GAME_PATH_ENV)
+    if env_path:
+        candidates.append(env_path)
+    candidates.extend(DEFAULT_GAME_PATHS)
+    for raw in candidates:
+        path = Path(os.path.expanduser(raw))
+        if path.is_dir():
+            return path
+    return None
+
+
+def cache_path(name: str) -> Path:
+    """缓存文件路径；按需创建缓存目录"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return CACHE_DIR / name
+
+
+def normalize(logical: str) -> str:
+    """统一逻辑路径：正斜杠分隔、去掉首尾斜杠"""
+    return logical.replace("\\", "/").strip("/")
+
+
+class Layer:
+    """VFS 中的一层，对应磁盘上的一个根目录"""
+
+    def __init__(self, name: str, root: Path):
+        self.name = name
+        self.root = Path(root)
+        self._listings: Dict[str, Dict[str, bool]] = {}
+        self._stats: Dict[str, os.stat_result] = {}
+        self._trees: Dict[str, Tuple[int, int, Document]] = {}
+
+    def __repr__(self) -> str:
+        return f"Layer({self.name}, {self.root})"
+
+    def real_path(self, logical: str) -> Path:
+        return self.root / logical
+
+    def listing(self, logical_dir: str) -> Dict[str, bool]:
+        """目录内容 {名称: 是否为目录}，首次访问时读取并缓存"""
+        listing = self._listings.get(logical_dir)
+        if listing is None:
+            listing = {}
+            try:
+                with os.scandir(self.root / logical_dir) as it:
+                    for item in it:
+                        listing[item.name] = item.is_dir()
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+            self._listings[logical_dir] = listing
+        return listing
+
+    def has_file(self, logical: str) -> bool:
+        directory, _, name = logical.rpartition("/")
+        return self.listing(directory).get(name) is False
+
+    def has_dir(self, logical: str) -> bool:
+        if not logical:
+            return self.root.is_dir()
+        directory, _, name = logical.rpartition("/")
+        return self.listing(directory).get(name) is True
+
+    def stat(self, logical: str) -> os.stat_result:
+        result = self._stats.get(logical)
+        if result is None:
+            result = os.stat(self.real_path(logical))
+            self._stats[logical] = result
+        return result
+
+    def tree(self, logical: str) -> Document:
+        """解析后的脚本树；文件大小或修改时间变化时重新解析（每次都重新 stat，不用 _stats 中的缓存）"""
+        stat = os.stat(self.real_path(logical))
+        self._stats[logical] = stat
+        cached = self._trees.get(logical)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        document = parse_bytes(self.real_path(logical).read_bytes())
+        self._trees[logical] = (stat.st_mtime_ns, stat.st_size, document)
+        return document
+
+    def invalidate(self, logical: Optional[str] = None) -> None:
+        """丢弃缓存；写入文件后调用，logical 为空时清空整层"""
+        if logical is None:
+            self._listings.clear()
+            self._stats.clear()
+            self._trees.clear()
+            return
+        self._listings.pop(logical.rpartition("/")[0], None)
+        self._stats.pop(logical, None)
+        self._trees.pop(logical, None)
+
+
+class VirtualFileSystem:
+    """按优先级（高到低）叠放的若干 Layer"""
+
+    def __init__(self, layers: Sequence[Layer]):
+        if not layers:
+            raise ValueError("VFS 至少需要一层")
+        self.layers = list(layers)
+        self._resolved: Dict[str, Optional[Layer]] = {}
+
+    @classmethod
+    def default(
+        cls,
+        game_path: Optional[Path] = None,
+        use_fixture: bool = True,
+    ) -> "VirtualFileSystem":
+        """mod > 原版游戏 > fixture 的标准叠放"""
+        layers = [Layer("mod", MOD_ROOT)]
+        game_path = game_path or find_game_path()
+        if game_path:
+            layers.append(Layer("vanilla", game_path))
+        if use_fixture and FIXTURE_ROOT.is_dir():
+            layers.append(Layer("fixture", FIXTURE_ROOT))
+        return cls(layers)
+
+    @property
+    def mod_layer(self) -> Layer:
+        return self.layers[0]
+
+    def layer(self, name: str) -> Optional[Layer]:
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        return None
+
+    def resolve(self, logical: str) -> Optional[Layer]:
+        """返回提供该逻辑路径的最高优先级层"""
+        logical = normalize(logical)
+        try:
+            return self._resolved[logical]
+        except KeyError:
+            pass
+        found = None
+        for layer in self.layers:
+            if layer.has_file(logical):
+                found = layer
+                break
+        self._resolved[logical] = found
+        return found
+
+    def _require(self, logical: str) -> Tuple[Layer, str]:
+        logical = normalize(logical)
+        layer = self.resolve(logical)
+        if layer is None:
+            raise FileNotFoundError(f"VFS 中找不到文件：{logical}")
+        return layer, logical
+
+    def exists(self, logical: str) -> bool:
+        return self.resolve(logical) is not None
+
+    def real_path(self, logical: str) -> Path:
+        layer, logical = self._require(logical)
+        return layer.real_path(logical)
+
+    def stat(self, logical: str) -> os.stat_result:
+        layer, logical = self._require(logical)
+        return layer.stat(logical)
+
+    def read_bytes(self, logical: str) -> bytes:
+        return self.real_path(logical).read_bytes()
+
+    def read_text(self, logical: str, encoding: str = "utf-8-sig") -> str:
+        return self.read_bytes(logical).decode(encoding)
+
+    def parse(self, logical: str) -> Document:
+        layer, logical = self._require(logical)
+        return layer.tree(logical)
+
+    def is_fixture(self, logical: str) -> bool:
+        """该逻辑路径是否只由离线 fixture 提供（替身数据，不是真实游戏内容）"""
+        layer = self.resolve(logical)
+        return layer is not None and layer.name == "fixture"
+
+    def require_real(self, logical: str) -> None:
+        """以该文件为底稿写入 mod 之前调用：fixture 层只读，底稿来自 fixture 时报错"""
+        if self.is_fixture(logical):
+            raise ValueError(
+                f"{normalize(logical)} 只在离线 fixture（{FIXTURE_ROOT}）中找到，是替身数据而不是游戏内容；"
+                f"未找到原版游戏目录时拒绝据此写入 mod（可设置 {GAME_PATH_ENV}）"
+            )
+
+    def mod_path(self, logical: str) -> Path:
+        """逻辑路径在 mod 层中的实际位置（写文件时使用，不要求已存在）"""
+        return self.mod_layer.real_path(normalize(logical))
+
+    def listdir(self, logical_dir: str, suffixes: Iterable[str] = ()) -> List[str]:
+        """合并各层后目录中的文件逻辑路径；同名文件只保留优先级最高的一份"""
+        logical_dir = normalize(logical_dir)
+        suffixes = tuple(s.lower() for s in suffixes)
+        names = set()
+        for layer in self.layers:
+            for name, is_dir in layer.listing(logical_dir).items():
+                if is_dir:
+                    continue
+                if suffixes and not name.lower().endswith(suffixes):
+                    continue
+                names.add(name)
+        prefix = f"{logical_dir}/" if logical_dir else ""
+        return [prefix + name for name in sorted(names)]
+
+    def walk(self, logical_dir: str, suffixes: Iterable[str] = ()) -> List[str]:
+        """递归列出目录下所有文件的逻辑路径"""
+        logical_dir = normalize(logical_dir)
+        suffixes = tuple(suffixes)
+        result = self.listdir(logical_dir, suffixes)
+        subdirs = set()
+        for layer in self.layers:
+            for name, is_dir in layer.listing(logical_dir).items():
+                if is_dir:
+                    subdirs.add(name)
+        prefix = f"{logical_dir}/" if logical_dir else ""
+        for name in sorted(subdirs):
+            result.extend(self.walk(prefix + name, suffixes))
+        return result
+
+    def invalidate(self, logical: Optional[str] = None) -> None:
+        """写文件后丢弃相关缓存"""
+        if logical is not None:
+            logical = normalize(logical)
+            self._resolved.pop(logical, None)
+        else:
+            self._resolved.clear()
+        for layer in self.layers:
+            layer.invalidate(logical)
+
+
+_DEFAULT_VFS: Optional[VirtualFileSystem] = None
+
+
+def get_vfs() -> VirtualFileSystem:
+    """进程内共享的默认 VFS 实例"""
+    global _DEFAULT_VFS
+    if _DEFAULT_VFS is None:
+        _DEFAULT_VFS = VirtualFileSystem.default()
+    return _DEFAULT_VFS
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools where",
+        description="显示逻辑路径由 VFS 的哪一层提供。",
+    )
+    parser.add_argument("paths", nargs="*", help="逻辑路径，如 in_game/map_data/definitions.txt")
+    parser.add_argument("--layers", action="store_true", help="列出当前的层叠顺序")
+    args = parser.parse_args(argv)
+
+    vfs = get_vfs()
+    if args.layers or not args.paths:
+        for index, layer in enumerate(vfs.layers, start=1):
+            print(f"{index}. {layer.name:<8} {layer.root}")
+
+    missing = 0
+    for raw in args.paths:
+        layer = vfs.resolve(raw)
+        if layer is None:
+            print(f"[缺失] {raw}")
+            missing += 1
+        else:
+            print(f"[{layer.name}] {layer.real_path(normalize(raw))}")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
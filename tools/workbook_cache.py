@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel 工作簿的列式缓存
+
+docs/ 下的 ming_pops.xlsx、wanli_pops.xlsx、eu5_1644_文档.xlsx 与人物三围表只有 xlsx 版本，
+openpyxl 每次都要解析整个工作簿的 XML。open_workbook() 在第一次读取时把每个工作表
+转换成按列存放的缓存，之后只读缓存：
+
+    from workbook_cache import open_workbook
+    sheet = open_workbook("docs/ming_pops.xlsx").active     # 或 ["工作表名"]
+    for row in sheet.rows():                                 # 与 iter_rows(values_only=True) 相同
+        ...
+    sheet.column(2)                                          # 单列的值
+
+- 缓存以 xlsx 的路径与内容的 SHA-1 为键，文件改动后自动重建，同一路径的旧缓存随之删除；
+- 每列按类型存放：整数 / 浮点数为定长数组加空值位图，文本、日期为字符串列表，
+  其余为混合列；列首至多 HEAD_ROWS 个表头单元格单独存放，不影响下方数据的类型；
+- 日期与时间统一写成 `年.月.日`（与 convert_characters.cast_scalar 一致），
+  因此缓存中不含 datetime；
+- 只有建缓存时需要 openpyxl，读缓存只用标准库。
+
+用法：
+    python -m tools workbooks                       # 为 docs/*.xlsx 建立（或校验）缓存
+    python -m tools workbooks docs/ming_pops.xlsx --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as _dt
+import hashlib
+import pickle
+import re
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from vfs import CACHE_DIR, MOD_ROOT, cache_path
+
+DOCS_DIR = MOD_ROOT / "docs"
+CACHE_VERSION = 1
+# 列首可以单独存放的表头单元格数（人物三围表的表头占两行）
+HEAD_ROWS = 5
+
+INT, FLOAT, TEXT, MIXED = "int", "float", "text", "mixed"
+_INT_RANGE = (-(2 ** 63), 2 ** 63 - 1)
+
+# (类型, 列首表头, 数据, 空值位图)；位图只用于 int / float 列
+Column = Tuple[str, List[Any], Any, Optional[bytes]]
+
+
+def format_date(value: Union[_dt.date, _dt.datetime]) -> str:
+    """日期统一写成 `年.月.日`"""
+    return f"{value.year}.{value.month}.{value.day}"
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, (_dt.datetime, _dt.date)):
+        return format_date(value)
+    if isinstance(value, (_dt.time, _dt.timedelta)):
+        return str(value)
+    return value
+
+
+def _kind(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return MIXED
+    if isinstance(value, int):
+        return INT if _INT_RANGE[0] <= value <= _INT_RANGE[1] else MIXED
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, str):
+        return TEXT
+    return MIXED
+
+
+def _column_kind(values: Sequence[Any]) -> str:
+    kinds = {_kind(value) for value in values}
+    kinds.discard(None)
+    if not kinds:
+        return TEXT
+    if len(kinds) == 1:
+        return kinds.pop()
+    return MIXED
+
+
+def encode_column(values: List[Any]) -> Column:
+    """选出最窄的类型；列首的文本单元格（表头）不参与数值列的类型判断"""
+    kind = _column_kind(values)
+    head: List[Any] = []
+    if kind == MIXED:
+        for split in range(1, min(HEAD_ROWS, len(values)) + 1):
+            if _kind(values[split - 1]) not in (None, TEXT):
+                break
+            rest = _column_kind(values[split:])
+            if rest in (INT, FLOAT):
+                head, values, kind = values[:split], values[split:], rest
+                break
+    if kind in (INT, FLOAT):
+        mask = bytes(value is not None for value in values)
+        data = array("q" if kind == INT else "d", (0 if value is None else value for value in values))
+        return kind, head, data.tobytes(), mask
+    return kind, head, values, None
+
+
+def decode_column(column: Column) -> List[Any]:
+    kind, head, data, mask = column
+    if kind not in (INT, FLOAT):
+        return head + data
+    numbers = array("q" if kind == INT else "d")
+    numbers.frombytes(data)
+    values = numbers.tolist()
+    if 0 in mask:
+        values = [value if present else None for value, present in zip(values, mask)]
+    return head + values
+
+
+class Sheet:
+    """一个工作表；列在第一次访问时解码"""
+
+    def __init__(self, name: str, nrows: int, columns: List[Column]):
+        self.name = name
+        self.nrows = nrows
+        self._columns = columns
+        self._decoded: Dict[int, List[Any]] = {}
+
+    def __repr__(self) -> str:
+        return f"Sheet({self.name}, {self.nrows} 行 × {self.ncols} 列)"
+
+    @property
+    def ncols(self) -> int:
+        return len(self._columns)
+
+    @property
+    def kinds(self) -> List[str]:
+        return [column[0] for column in self._columns]
+
+    def column(self, index: int) -> List[Any]:
+        values = self._decoded.get(index)
+        if values is None:
+            values = decode_column(self._columns[index])
+            self._decoded[index] = values
+        return values
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """逐行返回单元格的值，与 openpyxl 的 iter_rows(values_only=True) 相同（日期已规范化）"""
+        return zip(*(self.column(index) for index in range(self.ncols))) if self.ncols else iter(())
+
+
+class Workbook:
+    def __init__(self, path: Path, digest: str, sheets: List[Sheet], active: int):
+        self.path = path
+        self.digest = digest
+        self.sheets = sheets
+        self._active = active
+
+    def __repr__(self) -> str:
+        return f"Workbook({self.path.name}, {len(self.sheets)} 个工作表)"
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [sheet.name for sheet in self.sheets]
+
+    @property
+    def active(self) -> Sheet:
+        return self.sheets[self._active]
+
+    def __getitem__(self, name: str) -> Sheet:
+        for sheet in self.sheets:
+            if sheet.name == name:
+                return sheet
+        raise KeyError(f"{self.path.name} 中没有工作表 {name}（可用：{'、'.join(self.sheet_names)}）")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sheet_names
+
+
+# ---- 缓存 ----
+
+def _cache_prefix(path: Path) -> str:
+    """缓存文件名前缀，取自相对 mod 根目录的路径（根目录之外取绝对路径）；
+    附带该路径的短哈希，不同目录下同名的工作簿不会共用前缀而互删缓存"""
+    resolved = path.resolve()
+    try:
+        relative = resolved.relative_to(MOD_ROOT.resolve()).as_posix()
+    except ValueError:
+        relative = resolved.as_posix()
+    slug = re.sub(r"[^\w-]+", "_", relative.rsplit(".", 1)[0]).strip("_")
+    return f"workbook.{slug}.{hashlib.sha1(relative.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _cache_file(path: Path, digest: str) -> Path:
+    return cache_path(f"{_cache_prefix(path)}.{digest[:16]}.pickle")
+
+
+def _read_xlsx(path: Path) -> Tuple[List[Tuple[str, int, List[Column]]], int]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for worksheet in workbook.worksheets:
+            rows = [[_normalize(value) for value in row] for row in worksheet.iter_rows(values_only=True)]
+            width = max((len(row) for row in rows), default=0)
+            columns = [
+                encode_column([row[index] if index < len(row) else None for row in rows])
+                for index in range(width)
+            ]
+            sheets.append((worksheet.title, len(rows), columns))
+        return sheets, workbook.worksheets.index(workbook.active)
+    finally:
+        workbook.close()
+
+
+def open_workbook(path: Union[str, Path], rebuild: bool = False) -> Workbook:
+    """读取工作簿；缓存缺失、过期或 rebuild 时用 openpyxl 重建"""
+    path = Path(path)
+    data = path.read_bytes()
+    digest = hashlib.sha1(data).hexdigest()
+    cache = _cache_file(path, digest)
+    payload = None
+    if cache.exists() and not rebuild:
+        try:
+            with open(cache, "rb") as f:
+                payload = pickle.load(f)
+            if payload[0] != CACHE_VERSION or payload[1] != digest:
+                payload = None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, IndexError):
+            payload = None
+    if payload is None:
+        sheets, active = _read_xlsx(path)
+        payload = (CACHE_VERSION, digest, sheets, active)
+        with open(cache, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        for stale in CACHE_DIR.glob(_cache_prefix(path) + ".*.pickle"):
+            if stale != cache:
+                stale.unlink()
+    _version, _digest, sheets, active = payload
+    return Workbook(path, digest, [Sheet(name, nrows, columns) for name, nrows, columns in sheets], active)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="tools workbooks",
+        description="为 docs/ 下的 xlsx 建立按内容哈希校验的列式缓存，并显示各工作表的列类型。",
+    )
+    parser.add_argument("paths", nargs="*", type=Path, help="xlsx 文件（缺省为 docs/*.xlsx）")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有缓存，用 openpyxl 重新转换")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or sorted(DOCS_DIR.glob("*.xlsx"))
+    failed = 0
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            workbook = open_workbook(path, rebuild=args.rebuild)
+        except ImportError:
+            print("[错误] 缓存缺失或已过期，重建需要 openpyxl（pip install openpyxl）")
+            return 1
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[错误] {path}：{e}")
+            failed += 1
+            continue
+        elapsed = time.perf_counter() - started
+        print(f"{path.name}（{workbook.digest[:12]}，{elapsed * 1000:.1f} ms）")
+        for sheet in workbook.sheets:
+            counts: Dict[str, int] = {}
+            for kind in sheet.kinds:
+                counts[kind] = counts.get(kind, 0) + 1
+            summary = "，".join(f"{kind} {count}" for kind, count in counts.items())
+            print(f"  {sheet.name}：{sheet.nrows} 行 × {sheet.ncols} 列（{summary}）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())